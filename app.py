@@ -1,48 +1,39 @@
 import os
-import openai
 from dotenv import load_dotenv
 
-load_dotenv()
-openai.api_key = os.environ.get("OPENAI_API_KEY")
+load_dotenv()  # OPENAI_API_KEY 등은 engine_clients 가 첫 호출 때 환경변수에서 읽음
 
 
 import streamlit as st
-import pandas as pd
-from PIL import Image
-import io
-import base64
-import concurrent.futures
-from gpt_vision_ocr import extract_info_from_image
+import asyncio
+import importlib
+import shutil
+import threading
+import time
+import uuid
 
 st.set_page_config(page_title="Object Swatch OCR", layout="wide")
 
-# JS modal & style
-st.markdown("""
-    <style>
-    .modal {
-        display: none; position: fixed; z-index: 999;
-        padding-top: 60px; left: 0; top: 0;
-        width: 100%; height: 100%;
-        overflow: auto; background-color: rgba(0,0,0,0.8);
-    }
-    .modal-content {
-        margin: auto; display: block;
-        max-width: 90%;
-    }
-    .close {
-        position: absolute; top: 20px; right: 35px;
-        color: #fff; font-size: 40px; font-weight: bold;
-        cursor: pointer;
-    }
-    .thumb {
-        height: 35px; cursor: pointer;
-    }
-    </style>
-    <div id="imgModal" class="modal">
-        <span class="close" onclick="document.getElementById('imgModal').style.display='none'">&times;</span>
-        <img class="modal-content" id="modalImg">
-    </div>
-""", unsafe_allow_html=True)
+# 썸네일은 base64 로 페이지에 넣지 않고 static 폴더에 파일로 저장 후 URL 로 참조
+# (.streamlit/config.toml 의 enableStaticServing 필요)
+THUMB_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "thumbs")
+THUMB_TTL_SECONDS = 24 * 3600
+MAX_IN_FLIGHT = 32        # 동시에 분석 중인 이미지 수 (디코딩 / 인코딩 중 버퍼 총량은 prepared_image.MAX_IN_FLIGHT_BYTES 로 따로 제한)
+RENDER_INTERVAL = 0.5     # 결과 표 갱신 간격(초)
+REUSED_MARK = "이전 분석 재사용"  # 이전 업로드의 같은 라벨 → 그때의 엔진 결과(캐시) 재사용
+COLUMNS = ["썸네일", "파일명", "브랜드명", "품번", "중복"]
+# 업로드 화면에는 필요 없는 무거운 모듈 (엔진 파이프라인, pandas) → 첫 화면을 그린 뒤 백그라운드에서 로드
+PREWARM_MODULES = ["pandas", "engines", "image_dedup", "prepared_image", "telemetry"]
+
+# ✅ 프로세스당 1번: 사용자가 파일을 고르는 동안 엔진 모듈을 미리 import (Cloud Run 콜드 스타트 후 첫 분석 지연 단축)
+# 업로드가 먼저 들어오면 아래 import 가 같은 모듈 잠금에서 기다렸다가 이어서 사용
+@st.cache_resource
+def prewarm_modules():
+    thread = threading.Thread(target=lambda: [importlib.import_module(m) for m in PREWARM_MODULES],
+                              name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
 
 # 타이틀 및 로고
 st.image("object_logo.jpg", width=140)
@@ -50,75 +41,152 @@ st.title("📦 Object Swatch OCR")
 st.markdown("이미지를 업로드하면 브랜드명과 품번을 자동 인식하여 리스트로 출력합니다.")
 
 uploaded_files = st.file_uploader("이미지 업로드", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
+prewarm_modules()
+
+
+# ✅ 오래된 썸네일 폴더 정리
+def cleanup_thumbs():
+    if not os.path.isdir(THUMB_ROOT):
+        return
+    now = time.time()
+    for run_id in os.listdir(THUMB_ROOT):
+        run_dir = os.path.join(THUMB_ROOT, run_id)
+        if now - os.path.getmtime(run_dir) > THUMB_TTL_SECONDS:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def render_table(placeholder, rows):
+    import pandas as pd
+
+    placeholder.dataframe(
+        pd.DataFrame(rows, columns=COLUMNS),
+        column_config={"썸네일": st.column_config.ImageColumn("썸네일", width="small")},
+        hide_index=True,
+    )
+
 
 if uploaded_files:
+    import pandas as pd
+    from engines import extract_info_async
+    from gpt_vision_ocr import cached_tesseract_ocr_async
+    from image_dedup import cluster_duplicates, confirms_articles, get_seen_images, hash_files
+    from prepared_image import MemoryBudget, PreparedImage, estimate_image_bytes, open_image, run_prepare
+    from telemetry import collect
+
     st.subheader("⏳ 이미지 분석 중입니다...")
     results = []
     progress = st.progress(0)
+    table = st.empty()
 
-    def process_image(i_file):
-        image = Image.open(i_file).convert("RGB")
-        image.thumbnail((300, 300))
-        buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        img_data = base64.b64encode(buffered.getvalue()).decode("utf-8")
-        result = extract_info_from_image(image)
-        unique_id = i_file.name.replace(".", "").replace(" ", "").replace("/", "_")
+    cleanup_thumbs()
+    run_id = uuid.uuid4().hex
+    thumb_dir = os.path.join(THUMB_ROOT, run_id)
+    os.makedirs(thumb_dir, exist_ok=True)
+
+    # 🔹 OCR 전에 지각 해시로 근접 중복 후보를 묶음 (image_dedup.py)
+    # 후보는 대표 사진 결과가 나온 뒤, 대표의 품번이 자기 Tesseract 원문에도 보이면 GPT / Vision 없이 결과 복사
+    hashes = hash_files(uploaded_files)
+    representatives = cluster_duplicates(hashes)
+    seen_images = get_seen_images()
+
+    # 🔹 디코딩 → 썸네일 파일 저장 → 엔진별 인코딩 → 원본 픽셀 해제 (CPU 작업, run_prepare 전용 풀에서 실행)
+    # 업로드 파일은 한 번만 디코딩하고, 엔진 입력은 PreparedImage 에서 재사용
+    def prepare_upload(index, image, name):
+        prepared = PreparedImage(image, name=name)
+        with open(os.path.join(thumb_dir, f"{index}.png"), "wb") as f:
+            f.write(prepared.thumbnail_bytes)
+        prepared.encode_payloads()
+        return prepared
+
+    async def process_image(index, i_file, memory, rep_row=None):
+        # 🔹 헤더만 읽어 디코딩될 크기를 알아낸 뒤, 메모리 한도 안에서만 디코딩 / 인코딩 (한도가 차면 앞 이미지 인코딩까지 대기)
+        # API 응답을 기다리는 동안에는 인코딩 바이트와 Tesseract 이미지만 남음 → 한도는 동시 디코딩 수만 제한
+        image = open_image(i_file)
+        async with memory.hold(estimate_image_bytes(image.size)):
+            prepared = await run_prepare(prepare_upload, index, image, i_file.name)
+            del image  # 디코딩된 픽셀(= prepared.source) 참조를 여기서도 놓음
+        try:
+            return await analyze_image(index, i_file, prepared, rep_row)
+        finally:
+            prepared.release()
+
+    async def analyze_image(index, i_file, prepared, rep_row):
+        # 🔹 썸네일은 파일로 한 번만 저장하고 결과 행에는 URL 만 보관 (prepare_upload)
+        thumb_url = f"app/static/thumbs/{run_id}/{index}.png"
+
+        if rep_row is not None:
+            tesseract_text = await cached_tesseract_ocr_async(prepared)
+            if confirms_articles(rep_row["품번"].split(", "), tesseract_text):
+                return {**rep_row, "썸네일": thumb_url, "파일명": i_file.name, "중복": rep_row["파일명"]}
+
+        # 🔹 이전 업로드에서 본 라벨 후보면 그 이미지의 엔진 원문 캐시로 계산하고 Tesseract 로 확인
+        # (별칭은 조회 전용 → 캐시가 없거나 확인에 실패해도 이전 이미지의 캐시 항목은 바뀌지 않음)
+        result = None
+        previous = seen_images.find(hashes[index]) if seen_images and hashes[index] else None
+        if previous and previous != prepared.content_hash:
+            prepared.cache_alias = previous
+            result = await extract_info_async(prepared)
+            if not confirms_articles(result.get("article_numbers"), await cached_tesseract_ocr_async(prepared)):
+                prepared.cache_alias, result = None, None
+        if result is None:
+            result = await extract_info_async(prepared)
+            if seen_images and hashes[index] and result.get("company") != "[ERROR]":
+                seen_images.remember(prepared.content_hash, hashes[index])
         return {
-            "썸네일": f"""
-                <div>
-                    <img class='thumb' id='thumb-{unique_id}' src='data:image/png;base64,{img_data}'>
-                    <script>
-                        const thumbElem = document.getElementById("thumb-{unique_id}");
-                        if (thumbElem) {{
-                            thumbElem.addEventListener("click", () => {{
-                                const modal = document.getElementById("imgModal");
-                                const modalImg = document.getElementById("modalImg");
-                                modal.style.display = "block";
-                                modalImg.src = "data:image/png;base64,{img_data}";
-                            }});
-                        }}
-                    </script>
-                </div>
-            """,
+            "썸네일": thumb_url,
             "파일명": i_file.name,
             "브랜드명": result.get("company", "N/A"),
-            "품번": ", ".join(result.get("article_numbers", []))
+            "품번": ", ".join(result.get("article_numbers", [])),
+            "중복": REUSED_MARK if prepared.cache_alias else "",
         }
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        future_map = {executor.submit(process_image, f): f.name for f in uploaded_files}
-        for i, future in enumerate(concurrent.futures.as_completed(future_map)):
+    async def process_or_error(index, i_file, in_flight, memory, rep_task=None):
+        rep_row = None
+        if rep_task is not None:
+            rep_row = await rep_task  # 대표 결과를 기다린 뒤에 슬롯을 잡음
+            rep_row = rep_row if rep_row["브랜드명"] != "[ERROR]" else None
+        async with in_flight:
             try:
-                results.append(future.result())
+                return await process_image(index, i_file, memory, rep_row)
             except Exception as e:
-                results.append({
-                    "썸네일": "❌",
-                    "파일명": future_map[future],
+                return {
+                    "썸네일": None,
+                    "파일명": i_file.name,
                     "브랜드명": "[ERROR]",
-                    "품번": f"[ERROR] {str(e)}"
-                })
+                    "품번": f"[ERROR] {str(e)}",
+                    "중복": "",
+                }
+
+    # 🔹 asyncio 로 전체 업로드를 동시에 처리 (엔진별 동시 실행 수는 engine_clients 에서 제한)
+    # 결과는 끝나는 대로 표에 바로 추가
+    async def run_all():
+        in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+        memory = MemoryBudget()
+        rep_tasks = {i: asyncio.create_task(process_or_error(i, f, in_flight, memory))
+                     for i, f in enumerate(uploaded_files) if representatives[i] == i}
+        tasks = [rep_tasks[i] if rep == i else
+                 asyncio.create_task(process_or_error(i, f, in_flight, memory, rep_tasks[rep]))
+                 for i, (f, rep) in enumerate(zip(uploaded_files, representatives))]
+        last_render = 0.0
+        for i, task in enumerate(asyncio.as_completed(tasks)):
+            results.append(await task)
             progress.progress((i + 1) / len(uploaded_files))
+            if time.monotonic() - last_render >= RENDER_INTERVAL or i + 1 == len(tasks):
+                render_table(table, results)
+                last_render = time.monotonic()
+
+    # 🔹 이번 실행의 단계별 계측만 따로 집계 (telemetry.collect)
+    with collect() as run_metrics:
+        asyncio.run(run_all())
 
     st.success("✅ 분석 완료!")
-    st.markdown("아래 결과는 엑셀에 **복사 & 붙여넣기** 가능합니다.")
-
-    # HTML 테이블 생성
-    html = "<table style='border-collapse: collapse; width: 100%; font-size: 14px;'>"
-    html += "<thead><tr><th>썸네일</th><th>파일명</th><th>브랜드명</th><th>품번</th></tr></thead><tbody>"
-    for r in results:
-        html += f"<tr><td>{r['썸네일']}</td><td>{r['파일명']}</td><td>{r['브랜드명']}</td><td>{r['품번']}</td></tr>"
-    html += "</tbody></table>"
-
-    # 테이블 렌더링
-    st.markdown(f"""
-        <div style='width: 100%; max-width: 100%; overflow-x: auto; padding: 6px 0;'>
-        {html}
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown("표에서 셀을 선택해 엑셀에 **복사 & 붙여넣기** 하거나 CSV 로 내려받을 수 있습니다.")
 
     # CSV 다운로드
-    csv_df = pd.DataFrame([{k: r[k] for k in ["파일명", "브랜드명", "품번"]} for r in results])
+    csv_df = pd.DataFrame([{k: r[k] for k in ["파일명", "브랜드명", "품번", "중복"]} for r in results])
     csv = csv_df.to_csv(index=False).encode("utf-8-sig")
     st.download_button("📥 결과 CSV 다운로드", data=csv, file_name="swatch_ocr_results.csv", mime="text/csv")
 
+    # 단계별 처리 시간 / 전송량 / 토큰 / 캐시 적중 / 오류 (느린 배치의 원인 확인용)
+    with st.expander("⏱ 단계별 처리 시간"):
+        st.dataframe(pd.DataFrame(run_metrics.summary()), hide_index=True)
@@ -0,0 +1,112 @@
+# article_rules.py
+# ✅ 품번 후보 판정 규칙 엔진
+# - 규칙은 article_rules.json 에서 로드 (브랜드별 제외 패턴도 코드 수정 없이 추가)
+# - 규칙 그룹(invalid / accept / suspicious / excluded)을 각각 하나의 정규식으로 합쳐 미리 컴파일
+# - 후보 판정은 토큰당 정규식 1회 평가 (candidate_re: 부정/긍정 lookahead 조합, compile_candidate)
+import json
+import os
+import re
+from functools import lru_cache
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "article_rules.json")
+
+# OCR 원문에서 품번 후보 토큰 추출
+TOKEN_RE = re.compile(r"[A-Z0-9/\-]{3,}")
+
+
+def _alternation(patterns):
+    return "|".join(f"(?:{p})" for p in patterns) if patterns else "(?!)"
+
+
+# 최상위 | 가 있으면 ^ 가 일부 대안에만 걸리므로 고정 패턴으로 보지 않음
+def _is_anchored(pattern: str) -> bool:
+    if not pattern.startswith("^"):
+        return False
+    depth = 0
+    escaped = False
+    for ch in pattern:
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            return False
+    return True
+
+
+# ✅ 후보 판정 정규식: 거부 패턴(무효 / 의심 / 제외) + 허용 패턴 → 하나의 match 로 판정
+# ^ 로 고정된 패턴은 토큰 앞에서 한 번만, 나머지는 .*? 로 전체 위치에서 평가
+# 패턴 튜플(규칙 데이터) 기준으로 캐시 → 브랜드별 제외 패턴 조합도 1번만 컴파일
+@lru_cache(maxsize=256)
+def compile_candidate(reject: tuple, accept: tuple):
+    anchored = [p for p in reject if _is_anchored(p)]
+    floating = [p for p in reject if not _is_anchored(p)]
+    return re.compile(
+        f"(?!{_alternation(anchored)})(?!.*?(?:{_alternation(floating)}))(?=.*?(?:{_alternation(accept)}))",
+        re.DOTALL,
+    )
+
+
+class ArticleRuleSet:
+    def __init__(self, rules: dict):
+        self.rules = rules
+        stopwords = [re.escape(w.upper()) for w in rules.get("stopwords", [])]
+        invalid = [f"^(?:{'|'.join(stopwords)})$"] if stopwords else []
+        invalid += [r["pattern"] for r in rules.get("invalid", [])]
+        self._invalid = invalid
+        self._accept = [r["pattern"] for r in rules.get("accept", [])]
+        self._suspicious = [r["pattern"] for r in rules.get("suspicious", [])]
+        self._excluded = [r["pattern"] for r in rules.get("excluded", [])]
+
+        flags = re.DOTALL
+        self.invalid_re = re.compile(_alternation(self._invalid), flags)
+        self.accept_re = re.compile(_alternation(self._accept), flags)
+        self.suspicious_re = re.compile(_alternation(self._suspicious), flags)
+        # 유효 + 의심 아님 + 제외 아님 → 한 번의 match 로 판정
+        self._reject = tuple(self._invalid + self._suspicious + self._excluded)
+        self.candidate_re = compile_candidate(self._reject, tuple(self._accept))
+
+    def is_valid(self, article: str) -> bool:
+        return not self.invalid_re.search(article) and bool(self.accept_re.search(article))
+
+    def is_suspicious(self, article: str) -> bool:
+        return bool(self.suspicious_re.search(article))
+
+    # ✅ 브랜드별 제외 패턴까지 포함한 후보 판정 정규식
+    def candidate_re_for(self, company: str):
+        brand_patterns = self.rules.get("brand_excluded", {}).get(company)
+        if not brand_patterns:
+            return self.candidate_re
+        return compile_candidate(self._reject + tuple(brand_patterns), tuple(self._accept))
+
+    def is_candidate(self, article: str, company: str = None) -> bool:
+        matcher = self.candidate_re_for(company) if company else self.candidate_re
+        return matcher.match(article) is not None
+
+    # ✅ OCR 원문 → 중복 제거된 후보 토큰 (브랜드와 무관한 규칙으로 미리 걸러 잡음 토큰 제거)
+    # 중복 제거(dict.fromkeys) / 판정(filter) 모두 C 루프에서 처리 → 토큰당 Python 코드 실행 없음
+    def extract_candidates(self, text: str) -> list:
+        if not text:
+            return []
+        return list(filter(self.candidate_re.match, dict.fromkeys(TOKEN_RE.findall(text))))
+
+
+def load_rules(path=RULES_PATH) -> ArticleRuleSet:
+    with open(path, encoding="utf-8") as f:
+        return ArticleRuleSet(json.load(f))
+
+
+_rules = None
+
+
+# 빌드 시점 스냅샷(precomputed.py)이 article_rules.json 과 일치하면 그대로 사용
+def get_rules() -> ArticleRuleSet:
+    global _rules
+    if _rules is None:
+        from precomputed import load_snapshot
+        _rules = load_snapshot("article_rules", RULES_PATH, __file__) or load_rules()
+    return _rules
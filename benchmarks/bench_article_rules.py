@@ -0,0 +1,176 @@
+# bench_article_rules.py
+# ✅ 품번 후보 필터: 기존 방식(토큰마다 정규식 ~10회) vs article_rules 엔진(토큰당 1회) 처리량 비교
+#
+# 사용법:
+#   python benchmarks/bench_article_rules.py [ocr_dump_dir] [--repeat N]
+#
+# ocr_dump_dir: Google Vision / Tesseract 원문 텍스트 파일(*.txt) 폴더
+#               (없으면 스와치 라벨 형태의 합성 OCR 원문 사용)
+# 두 방식의 최종 결과가 모두 같은지도 함께 확인.
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from article_rules import get_rules  # noqa: E402
+from postprocess import extract_article_candidates, filter_scored_articles, score_articles  # noqa: E402
+
+
+# 🔹 기존 구현 (비교 기준)
+def legacy_is_valid_article(article: str, company=None) -> bool:
+    article = article.strip().upper()
+
+    if article in ["TEL", "FAX", "HTTP", "WWW", "ARTICLE", "COLOR", "COMPOSITION"]:
+        return False
+    if "OCA" in article and re.match(r"OCA\d{3,}", article):
+        return False
+    if company and article == company.upper():
+        return False
+    if re.fullmatch(r"\d{1,2}", article):
+        return False
+    if re.fullmatch(r"C\d{2,3}%?", article):
+        return False
+    if len(article) < 3:
+        return False
+    if not re.search(r"[A-Z0-9]", article):
+        return False
+    if article.startswith("HTTP") or ".COM" in article:
+        return False
+    if re.fullmatch(r"\d{3}", article):
+        return False
+
+    return bool(re.search(r"[A-Z0-9/\-]{3,}", article)) or bool(re.search(r"\d{3,}", article))
+
+
+def legacy_is_suspicious_article(article: str) -> bool:
+    a = article.upper()
+    if re.search(r"(.)\1{2,}", a):
+        return True
+    if re.fullmatch(r"\d{2,3}[A-Z]{2,}X+\d{3}", a):
+        return True
+    if len(a) > 20:
+        return True
+    return False
+
+
+def legacy_filter_scored_articles(scored_articles, company_name, max_return=5):
+    normalized_company = company_name.strip().upper().replace(" ", "")
+    final = []
+
+    for article, score in scored_articles:
+        article_upper = article.upper()
+
+        if not legacy_is_valid_article(article_upper, company_name):
+            continue
+        if legacy_is_suspicious_article(article_upper):
+            continue
+        if article_upper == normalized_company:
+            continue
+        if normalized_company in article_upper.replace(" ", ""):
+            continue
+        if re.fullmatch(r"(AB[\-/]EX)?00[13]", article_upper):
+            continue
+        if article_upper.startswith("000"):
+            continue
+
+        final.append(article_upper)
+        if len(final) >= max_return:
+            break
+
+    return final if final else ["N/A"]
+
+
+def legacy_pipeline(text, company):
+    tokens = re.findall(r"[A-Z0-9/\-]{3,}", text)
+    return legacy_filter_scored_articles(score_articles([], tokens, []), company)
+
+
+def engine_pipeline(text, company):
+    return filter_scored_articles(score_articles([], extract_article_candidates(text), []), company)
+
+
+# 🔹 합성 OCR 원문 (브랜드 / 연락처 / URL / 조성 / 컬러 코드 / 품번 / OCR 잡음)
+def synthetic_dumps(n=500, seed=7):
+    rng = random.Random(seed)
+    brands = ["HOKKOH", "YAGI", "OHARA INC.", "MATSUBARA CO., LTD.", "ALLBLUE", "VANCET", "KOMON KOBO"]
+    words = ["ARTICLE", "COLOR", "COMPOSITION", "COTTON", "POLYESTER", "WIDTH", "WEIGHT", "TEL", "FAX",
+             "HTTP://WWW.SWATCH.COM", "MADE IN JAPAN", "ITEM#", "NO.", "G/M2", "CM", "WWW"]
+    noise = ["000123", "AB-EX001", "OCA1234", "YGUUU003", "C45%", "100%", "12", "345", "---", "///",
+             "12ABXXX345", "ABCDEFGHIJKLMNOPQRSTUVW"]
+
+    def article():
+        prefix = "".join(rng.choice("ABCDEFGHJKMNPRSTUVWXYZ") for _ in range(rng.randint(1, 4)))
+        sep = rng.choice(["-", "", "/"])
+        return f"{prefix}{sep}{rng.randint(10, 99999)}"
+
+    dumps = []
+    for _ in range(n):
+        brand = rng.choice(brands)
+        lines = [brand]
+        for _ in range(rng.randint(15, 40)):
+            parts = [rng.choice(words + noise) if rng.random() < 0.7 else article()
+                     for _ in range(rng.randint(1, 6))]
+            lines.append(" ".join(parts))
+        dumps.append((brand, "\n".join(lines)))
+    return dumps
+
+
+def load_dumps(dump_dir):
+    dumps = []
+    for filename in sorted(os.listdir(dump_dir)):
+        if filename.lower().endswith(".txt"):
+            with open(os.path.join(dump_dir, filename), encoding="utf-8") as f:
+                dumps.append(("N/A", f.read().upper()))
+    return dumps
+
+
+def legacy_check(token):
+    return legacy_is_valid_article(token) and not legacy_is_suspicious_article(token)
+
+
+def bench(fn, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(*item)
+    return time.perf_counter() - start
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    repeat = 5
+    if "--repeat" in sys.argv:
+        repeat = int(sys.argv[sys.argv.index("--repeat") + 1])
+        args = [a for a in args if a != str(repeat)]
+
+    dumps = load_dumps(args[0]) if args else synthetic_dumps()
+    if not dumps:
+        print("no OCR dumps found")
+        return
+
+    mismatches = [(c, t) for c, t in dumps if legacy_pipeline(t, c) != engine_pipeline(t, c)]
+    tokens = [(token,) for _, t in dumps for token in re.findall(r"[A-Z0-9/\-]{3,}", t)]
+    n_tokens = len(tokens) * repeat
+    texts = [(t, c) for c, t in dumps]
+    match = get_rules().candidate_re.match
+
+    print(f"dumps: {len(dumps)}  tokens: {len(tokens)}  repeat: {repeat}")
+    print("per-token rule check")
+    legacy = bench(legacy_check, tokens, repeat)
+    engine = bench(match, tokens, repeat)
+    print(f"  {'legacy':<10}{n_tokens / legacy:>14,.0f} tokens/sec")
+    print(f"  {'rules':<10}{n_tokens / engine:>14,.0f} tokens/sec  (x{legacy / engine:.2f})")
+    print("OCR text -> final articles (tokenize + score + filter)")
+    legacy = bench(legacy_pipeline, texts, repeat)
+    engine = bench(engine_pipeline, texts, repeat)
+    print(f"  {'legacy':<10}{n_tokens / legacy:>14,.0f} tokens/sec")
+    print(f"  {'rules':<10}{n_tokens / engine:>14,.0f} tokens/sec  (x{legacy / engine:.2f})")
+    print(f"result mismatches: {len(mismatches)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# bench_cold_start.py
+# ✅ 콜드 스타트 import 시간 측정 + 예산 확인 (Cloud Run 인스턴스가 0 에서 뜰 때 사용자가 기다리는 시간)
+#
+# 사용법:
+#   python benchmarks/bench_cold_start.py [--repeat 5] [--top 15] [--budget page=900,analysis=900,first_use=50]
+#
+# 단계 (매번 새 파이썬 프로세스, 단계별 시간은 앞 단계 import 이후 추가로 걸린 시간):
+#   interpreter  빈 인터프리터 시작 (python -c pass)
+#   page         app.py 최상위 import (첫 화면을 그리기 전에 필요한 것, ast 로 app.py 에서 읽음)
+#   analysis     app.py 의 PREWARM_MODULES (업로드 후 분석에 필요한 엔진 파이프라인)
+#   first_use    브랜드 사전 / 품번 규칙 첫 로드 (precomputed.py 스냅샷이 있으면 스냅샷 사용)
+#
+# 확인 항목 (하나라도 어기면 종료 코드 1 → CI / Docker 빌드 단계에서 실행):
+#   - 단계별 시간 중앙값이 예산(ms) 이하
+#   - 단계가 끝났을 때 LAZY_MODULES 가 아직 로드되지 않았는지 (첫 사용 시 로드해야 하는 무거운 의존성)
+# -X importtime 결과에서 누적 시간이 큰 모듈 상위 N개도 출력
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+APP_PATH = os.path.join(ROOT, "app.py")
+STAGES = ("interpreter", "page", "analysis", "first_use")
+
+# 단계별 예산 (ms, 중앙값 기준) — python:3.10-slim / Cloud Run 1 vCPU 기준으로 여유를 둔 값
+COLD_START_BUDGET_MS = {"interpreter": 150, "page": 900, "analysis": 900, "first_use": 50}
+
+# 단계가 끝난 시점에 아직 로드되면 안 되는 모듈 (엔진 클라이언트 / OCR 바인딩은 첫 호출 때 로드)
+LAZY_MODULES = {
+    "page": ["pandas", "numpy", "openai", "httpx", "grpc", "google.cloud.vision", "pytesseract", "tesserocr",
+             "gpt_vision_ocr", "engines"],
+    "analysis": ["openai", "httpx", "grpc", "google.cloud.vision", "pytesseract", "tesserocr"],
+}
+
+# 자식 프로세스에서 실행: 단계별 import 후 경과 시간(ms)과 로드된 LAZY_MODULES 를 JSON 으로 출력
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+stages, loaded = {}, {}
+page, analysis, lazy = json.loads(sys.argv[1])
+for name, modules in (("page", page), ("analysis", analysis)):
+    t = time.perf_counter()
+    for module in modules:
+        __import__(module)
+    stages[name] = (time.perf_counter() - t) * 1000
+    loaded[name] = [m for m in lazy.get(name, []) if m in sys.modules]
+t = time.perf_counter()
+from brand_registry import get_registry
+from article_rules import get_rules
+get_registry(); get_rules()
+stages["first_use"] = (time.perf_counter() - t) * 1000
+print(json.dumps({"stages": stages, "loaded": loaded}))
+"""
+
+
+# ✅ app.py 에서 최상위 import 모듈과 PREWARM_MODULES 를 읽음 (app.py 를 실행하지 않음)
+def app_modules(path=APP_PATH):
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    page, prewarm = [], []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            page += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            page.append(node.module)
+        elif isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "PREWARM_MODULES" for t in node.targets):
+            prewarm = ast.literal_eval(node.value)
+    return page, prewarm
+
+
+def _run(args, env=None):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, env=env, check=True)
+
+
+def interpreter_ms(repeat):
+    import time
+
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        _run(["-c", "pass"])
+        samples.append((time.perf_counter() - t) * 1000)
+    return statistics.median(samples)
+
+
+def probe(page, analysis, repeat):
+    args = ["-c", PROBE, json.dumps([page, analysis, LAZY_MODULES])]
+    _run(args)  # 🔹 첫 실행은 .pyc 생성용 (Docker 빌드의 compileall 과 같은 상태로 맞춤)
+    runs = [json.loads(_run(args).stdout) for _ in range(repeat)]
+    stages = {name: statistics.median(r["stages"][name] for r in runs) for name in runs[0]["stages"]}
+    return stages, runs[-1]["loaded"]
+
+
+# ✅ -X importtime → 누적 시간이 큰 최상위 import 목록 [(ms, 모듈)]
+def import_profile(page, analysis, top):
+    code = ";".join(f"import {m}" for m in page + analysis)
+    stderr = _run(["-X", "importtime", "-c", code]).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith(" ") or name.startswith("  "):
+            continue  # 다른 모듈 안에서 import 된 하위 모듈은 부모 누적 시간에 포함
+        rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cold start import time / budget check")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget", default="", help="단계별 예산 ms 덮어쓰기 (예: page=1200,analysis=1500)")
+    parser.add_argument("--json", default=None, help="결과 저장 파일")
+    args = parser.parse_args()
+
+    budget = dict(COLD_START_BUDGET_MS)
+    for item in filter(None, args.budget.split(",")):
+        name, value = item.split("=")
+        budget[name.strip()] = float(value)
+
+    from precomputed import PRECOMPUTED_DIR
+
+    page, analysis = app_modules()
+    stages, loaded = probe(page, analysis, args.repeat)
+    stages = {"interpreter": interpreter_ms(args.repeat), **stages}
+
+    print(f"snapshots: {'yes' if os.path.isdir(PRECOMPUTED_DIR) else 'no (python precomputed.py)'}")
+    print(f"{'stage':<12}{'ms':>9}{'budget':>9}  lazy modules already loaded")
+    failures = []
+    for name in STAGES:
+        over = stages[name] > budget[name]
+        early = loaded.get(name, [])
+        print(f"{name:<12}{stages[name]:>9.1f}{budget[name]:>9.0f}  {', '.join(early) or '-'}{'  OVER BUDGET' if over else ''}")
+        if over:
+            failures.append(f"{name} {stages[name]:.0f}ms > {budget[name]:.0f}ms")
+        if early:
+            failures.append(f"{name} loaded {', '.join(early)}")
+
+    print(f"\ntop imports (cumulative ms)")
+    for ms, name in import_profile(page, analysis, args.top):
+        print(f"{ms:>9.1f}  {name}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"stages": stages, "budget": budget, "loaded": loaded, "failures": failures}, f, indent=1)
+    if failures:
+        print("\nFAIL: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# bench_gpt_tiling.py
+# ✅ GPT-4o 묶음 요청(gpt_tiling) 묶음 크기별 이미지당 비용 / 지연 시간 비교
+#
+# 사용법:
+#   python benchmarks/bench_gpt_tiling.py [fixtures_dir] [--sizes 1,2,4,8] [--live]
+#
+# fixtures_dir (기본: benchmarks/fixtures, 없으면 합성 라벨 이미지 사용)
+#   - 스와치 이미지 (*.jpg, *.jpeg, *.png)
+#   - labels.json (선택): {"파일명": {"company": "HOKKOH", "article_numbers": ["TXAB-H062"]}}
+#
+# 기본은 오프라인으로 요청 토큰 / 전송 바이트 추정치만 비교 (묶음 크기 1 = 기존 단일 호출).
+# --live 를 주면 실제로 호출해서 이미지당 지연 시간, 실제 사용 토큰, 묶음 실패(단일 호출 fallback) 비율,
+# labels.json 기준 GPT 품번 정확도도 출력 (API 비용 발생, 캐시 비활성화).
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# gpt-4o 요금 (USD / 1M tokens)
+PRICE_INPUT = 2.50
+PRICE_OUTPUT = 10.00
+EST_OUTPUT_TOKENS_PER_IMAGE = 40  # {"company": ..., "article_numbers": [...]} 한 건 분량
+
+
+def load_images(fixtures_dir):
+    from PIL import Image, ImageDraw
+
+    from prepared_image import PreparedImage
+
+    if os.path.isdir(fixtures_dir):
+        files = sorted(f for f in os.listdir(fixtures_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+        labels = {}
+        labels_path = os.path.join(fixtures_dir, "labels.json")
+        if os.path.exists(labels_path):
+            with open(labels_path, encoding="utf-8") as f:
+                labels = json.load(f)
+        if files:
+            return [PreparedImage.open(os.path.join(fixtures_dir, f), name=f) for f in files], labels
+
+    # 🔹 합성 라벨 사진 (작은 스와치 라벨 크기)
+    images, labels = [], {}
+    for i in range(16):
+        name = f"synthetic_{i:02d}.png"
+        image = Image.new("RGB", (640, 420), (235, 228, 214))
+        draw = ImageDraw.Draw(image)
+        draw.text((30, 40), "HOKKOH", fill="black")
+        draw.text((30, 90), f"ITEM NO. TXAB-H{i:03d}", fill="black")
+        draw.text((30, 140), "COMPOSITION: COTTON 100%", fill="black")
+        images.append(PreparedImage(image, name=name))
+        labels[name] = {"company": "HOKKOH", "article_numbers": [f"TXAB-H{i:03d}"]}
+    return images, labels
+
+
+def single_request_tokens(image):
+    from gpt_vision_ocr import GPT_MAX_TOKENS, GPT_PROMPT_TEXT, _gpt_request_tokens
+
+    return _gpt_request_tokens(image, GPT_PROMPT_TEXT, GPT_MAX_TOKENS) - GPT_MAX_TOKENS
+
+
+def request_bytes(body):
+    return len(json.dumps(body).encode("utf-8"))
+
+
+def offline_row(images, size, mode):
+    from gpt_tiling import tiled_request
+    from gpt_vision_ocr import GPT_PROMPT_TEXT, gpt_request_body
+
+    input_tokens = payload = 0
+    for start in range(0, len(images), size):
+        group = images[start:start + size]
+        if len(group) == 1:
+            input_tokens += single_request_tokens(group[0])
+            payload += request_bytes(gpt_request_body(group[0], GPT_PROMPT_TEXT))
+        else:
+            body, tokens = tiled_request(group, mode)
+            input_tokens += tokens - body["max_tokens"]
+            payload += request_bytes(body)
+    n = len(images)
+    cost = (input_tokens * PRICE_INPUT + n * EST_OUTPUT_TOKENS_PER_IMAGE * PRICE_OUTPUT) / 1e6
+    return {"in_tok": input_tokens / n, "kb": payload / n / 1024, "cost": cost / n * 1000,
+            "requests": -(-n // size)}
+
+
+def live_row(images, labels, size, mode):
+    from engine_clients import get_openai_client
+    from gpt_tiling import split_tiled_response, tiled_request
+    from gpt_vision_ocr import GPT_PROMPT_TEXT, gpt_request_body
+    from postprocess import parse_gpt_response
+
+    usage = {"prompt": 0, "completion": 0}
+    fallbacks = tp = pred = gold = 0
+    start = time.perf_counter()
+    for offset in range(0, len(images), size):
+        group = images[offset:offset + size]
+        texts = None
+        if len(group) > 1:
+            body, _ = tiled_request(group, mode)
+            response = get_openai_client().chat.completions.create(**body)
+            usage["prompt"] += response.usage.prompt_tokens
+            usage["completion"] += response.usage.completion_tokens
+            texts = split_tiled_response(response.choices[0].message.content or "", len(group))
+            fallbacks += texts is None
+        if texts is None:
+            texts = []
+            for image in group:
+                response = get_openai_client().chat.completions.create(**gpt_request_body(image, GPT_PROMPT_TEXT))
+                usage["prompt"] += response.usage.prompt_tokens
+                usage["completion"] += response.usage.completion_tokens
+                texts.append(response.choices[0].message.content.strip())
+        for image, text in zip(group, texts):
+            if image.name not in labels:
+                continue
+            _, articles, _ = parse_gpt_response(text)
+            predicted = {a for a in articles if a != "N/A"}
+            expected = {a.upper() for a in labels[image.name].get("article_numbers", [])}
+            tp, pred, gold = tp + len(predicted & expected), pred + len(predicted), gold + len(expected)
+    elapsed = time.perf_counter() - start
+    n = len(images)
+    cost = (usage["prompt"] * PRICE_INPUT + usage["completion"] * PRICE_OUTPUT) / 1e6
+    return {"ms": elapsed / n * 1000, "in_tok": usage["prompt"] / n, "out_tok": usage["completion"] / n,
+            "cost": cost / n * 1000, "fallback": fallbacks, "precision": tp / pred if pred else 0.0,
+            "recall": tp / gold if gold else 0.0}
+
+
+def main():
+    args = sys.argv[1:]
+    live = "--live" in args
+    sizes = [1, 2, 4, 8]
+    if "--sizes" in args:
+        sizes = [int(s) for s in args[args.index("--sizes") + 1].split(",")]
+        del args[args.index("--sizes"):args.index("--sizes") + 2]
+    positional = [a for a in args if not a.startswith("--")]
+    fixtures_dir = positional[0] if positional else os.path.join(ROOT, "benchmarks", "fixtures")
+
+    if live:
+        os.environ["OCR_CACHE_PATH"] = ""
+
+    from gpt_tiling import TILE_MODES
+
+    images, labels = load_images(fixtures_dir)
+    print(f"images: {len(images)} (estimated cost assumes {EST_OUTPUT_TOKENS_PER_IMAGE} output tokens/image)")
+    print(f"{'mode':<7}{'size':>5}{'requests':>10}{'in tok/img':>12}{'KB/img':>9}{'$/1k img':>10}")
+    for mode in TILE_MODES:
+        for size in sizes:
+            row = offline_row(images, size, mode)
+            print(f"{mode:<7}{size:>5}{row['requests']:>10}{row['in_tok']:>12.0f}{row['kb']:>9.1f}{row['cost']:>10.3f}")
+
+    if live:
+        print(f"\nlive ({sum(1 for i in images if i.name in labels)} labeled)")
+        print(f"{'mode':<7}{'size':>5}{'ms/img':>9}{'in tok/img':>12}{'out tok/img':>13}{'$/1k img':>10}"
+              f"{'fallback':>10}{'prec':>7}{'recall':>8}")
+        for mode in TILE_MODES:
+            for size in sizes:
+                row = live_row(images, labels, size, mode)
+                print(f"{mode:<7}{size:>5}{row['ms']:>9.0f}{row['in_tok']:>12.0f}{row['out_tok']:>13.0f}"
+                      f"{row['cost']:>10.3f}{row['fallback']:>10}{row['precision']:>7.3f}{row['recall']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# bench_image_policy.py
+# ✅ 엔진별 해상도/포맷 정책(ENGINE_IMAGE_POLICY) vs 기존 방식(1600px PNG 공통) 비교
+#
+# 사용법:
+#   python benchmarks/bench_image_policy.py [fixtures_dir] [--live]
+#
+# fixtures_dir (기본: benchmarks/fixtures, 없으면 여러 크기의 합성 라벨 사진을 임시 폴더에 생성)
+#   - 스와치 이미지 (*.jpg, *.jpeg, *.png)
+#   - labels.json (선택): {"파일명": {"company": "HOKKOH", "article_numbers": ["TXAB-H062"]}}
+#
+# 기본은 오프라인으로 전송 바이트 / GPT 이미지 토큰 추정치를 비교하고,
+# 정책별로 엔진에 실제로 보내는 이미지(인코딩 후)를 로컬 Tesseract 로 읽어 labels.json 기준 가독성 차이를 출력
+# (GPT / Vision 의 정확도 자체는 아니지만 축소 / JPEG 압축으로 품번 글자가 뭉개지는지 보는 대용 지표, Tesseract 가 없으면 생략).
+# --live 를 주면 실제 엔진을 호출해 labels.json 기준 정확도 차이도 출력 (API 비용 발생, 캐시 비활성화).
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 기존 동작: 모든 엔진이 1600px 로 줄인 같은 이미지를 PNG(무손실)로 받음
+LEGACY_IMAGE_POLICY = {
+    "gpt": {"max_side": 1600, "format": "PNG"},
+    "vision": {"max_side": 1600, "format": "PNG"},
+    "tesseract": {"max_side": 1600},
+}
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# 합성 fixture 크기 / 포맷 (스캔한 작은 라벨 ~ 폰 사진 4:3 / 카메라 3:2 / 16:9)
+SYNTHETIC_SIZES = [((640, 420), "PNG"), ((1600, 1200), "JPEG"), ((3024, 4032), "JPEG"), ((4032, 3024), "JPEG"),
+                   ((6000, 4000), "JPEG"), ((3840, 2160), "JPEG")]
+OCR_ENGINES = ("gpt", "vision")
+
+
+def load_fixtures(fixtures_dir):
+    files = sorted(f for f in os.listdir(fixtures_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    labels_path = os.path.join(fixtures_dir, "labels.json")
+    labels = {}
+    if os.path.exists(labels_path):
+        with open(labels_path, encoding="utf-8") as f:
+            labels = json.load(f)
+    return files, labels
+
+
+# ✅ 합성 fixture: 크기별 라벨 사진 + labels.json (전송 바이트 / 토큰 비교용)
+def write_synthetic_fixtures(directory):
+    from PIL import Image, ImageDraw, ImageFont
+
+    labels = {}
+    for i, (size, fmt) in enumerate(SYNTHETIC_SIZES * 2):
+        article = f"TXAB-H{100 + i:03d}"
+        image = Image.new("RGB", size, (235, 228, 214))
+        draw = ImageDraw.Draw(image)
+        font = ImageFont.load_default(size=max(size) // 24)
+        for row, line in enumerate(["HOKKOH", f"ITEM NO. {article}", "COMPOSITION: COTTON 100%"]):
+            draw.text((size[0] // 16, size[1] // 8 + row * max(size) // 12), line, fill="black", font=font)
+        name = f"synthetic_{i:02d}.{'png' if fmt == 'PNG' else 'jpg'}"
+        image.save(os.path.join(directory, name), format=fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+        labels[name] = {"company": "HOKKOH", "article_numbers": [article]}
+    with open(os.path.join(directory, "labels.json"), "w", encoding="utf-8") as f:
+        json.dump(labels, f, ensure_ascii=False, indent=1)
+
+
+def _normalize(text):
+    return re.sub(r"[^A-Z0-9]", "", (text or "").upper())
+
+
+# ✅ 엔진이 받는 인코딩 이미지를 Tesseract 로 읽어 labels 의 품번 / 브랜드가 보이는지 (가독성 대용 지표)
+def legibility(prepared, label) -> dict:
+    from PIL import Image
+    from tesseract_pool import ocr_regions
+
+    encoded = {"gpt": prepared.gpt_image_bytes, "vision": prepared.vision_bytes}
+    seen = {}
+    for engine in OCR_ENGINES:
+        text = _normalize(ocr_regions(Image.open(io.BytesIO(encoded[engine])).convert("RGB"))[0])
+        articles = label.get("article_numbers", [])
+        seen[engine] = {"articles": sum(1 for a in articles if _normalize(a) in text), "gold": len(articles),
+                        "brand": int(_normalize(label.get("company")) in text)}
+    return seen
+
+
+def article_hits(result, label):
+    predicted = {a for a in result.get("article_numbers", []) if a != "N/A"}
+    expected = {a.upper() for a in label.get("article_numbers", [])}
+    return len(predicted & expected), len(predicted), len(expected)
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    live = "--live" in sys.argv
+    fixtures_dir = args[0] if args else os.path.join(ROOT, "benchmarks", "fixtures")
+
+    if live:
+        os.environ["OCR_CACHE_PATH"] = ""  # 정책 간 비교를 위해 캐시 사용 안 함
+
+    synthetic_dir = None
+    if not os.path.isdir(fixtures_dir) or not load_fixtures(fixtures_dir)[0]:
+        synthetic_dir = fixtures_dir = tempfile.mkdtemp(prefix="bench_image_policy_")
+        print(f"no fixtures, using synthetic images in {fixtures_dir}")
+        write_synthetic_fixtures(fixtures_dir)
+    try:
+        report(fixtures_dir, live)
+    finally:
+        if synthetic_dir:
+            shutil.rmtree(synthetic_dir, ignore_errors=True)
+
+
+def report(fixtures_dir, live):
+    from prepared_image import ENGINE_IMAGE_POLICY, PreparedImage
+
+    files, labels = load_fixtures(fixtures_dir)
+
+    policies = {"legacy": LEGACY_IMAGE_POLICY, "per_engine": ENGINE_IMAGE_POLICY}
+    totals = {name: {"gpt_bytes": 0, "gpt_tokens": 0, "vision_bytes": 0, "tesseract_pixels": 0,
+                     "brand_ok": 0, "tp": 0, "pred": 0, "gold": 0} for name in policies}
+    readable = {name: {engine: {"articles": 0, "gold": 0, "brand": 0} for engine in OCR_ENGINES} for name in policies}
+    ocr_error = None
+
+    for filename in files:
+        path = os.path.join(fixtures_dir, filename)
+        for name, policy in policies.items():
+            prepared = PreparedImage.open(path, name=filename, policy=policy)
+            stats = prepared.payload_stats()
+            for key in ("gpt_bytes", "gpt_tokens", "vision_bytes", "tesseract_pixels"):
+                totals[name][key] += stats[key]
+
+            if filename in labels and ocr_error is None:
+                try:
+                    seen = legibility(prepared, labels[filename])
+                except Exception as e:  # Tesseract 미설치 등
+                    ocr_error = e
+                else:
+                    for engine, counts in seen.items():
+                        for key, value in counts.items():
+                            readable[name][engine][key] += value
+
+            if live and filename in labels:
+                from gpt_vision_ocr import extract_info_from_image
+                result = extract_info_from_image(prepared)
+                label = labels[filename]
+                totals[name]["brand_ok"] += int(result.get("company", "").upper() == label.get("company", "").upper())
+                tp, pred, gold = article_hits(result, label)
+                totals[name]["tp"] += tp
+                totals[name]["pred"] += pred
+                totals[name]["gold"] += gold
+
+    n = len(files)
+    print(f"images: {n}")
+    print(f"{'policy':<12}{'gpt KB/img':>12}{'gpt tok/img':>13}{'vision KB/img':>15}{'tess MPx/img':>14}")
+    for name, t in totals.items():
+        print(f"{name:<12}{t['gpt_bytes'] / n / 1024:>12.1f}{t['gpt_tokens'] / n:>13.0f}"
+              f"{t['vision_bytes'] / n / 1024:>15.1f}{t['tesseract_pixels'] / n / 1e6:>14.2f}")
+
+    labeled = sum(1 for f in files if f in labels)
+    if ocr_error is not None:
+        print(f"\noffline accuracy skipped: Tesseract OCR unavailable ({ocr_error})")
+    elif labeled:
+        print(f"\noffline accuracy on {labeled} labeled images (Tesseract on the encoded engine image)")
+        print(f"{'policy':<12}" + "".join(f"{engine + ' art':>12}{engine + ' brand':>14}" for engine in OCR_ENGINES))
+        for name, engines in readable.items():
+            print(f"{name:<12}" + "".join(f"{c['articles'] / max(c['gold'], 1):>12.3f}{c['brand'] / labeled:>14.3f}"
+                                          for c in engines.values()))
+        for engine in OCR_ENGINES:
+            base, new = readable["legacy"][engine], readable["per_engine"][engine]
+            print(f"{engine} article delta: {(new['articles'] - base['articles']) / max(base['gold'], 1):+.3f}  "
+                  f"brand delta: {(new['brand'] - base['brand']) / labeled:+.3f}")
+
+    if live:
+        print(f"\naccuracy on {labeled} labeled images")
+        for name, t in totals.items():
+            precision = t["tp"] / t["pred"] if t["pred"] else 0.0
+            recall = t["tp"] / t["gold"] if t["gold"] else 0.0
+            brand = t["brand_ok"] / labeled if labeled else 0.0
+            print(f"{name:<12} brand={brand:.3f} article_precision={precision:.3f} article_recall={recall:.3f}")
+        base, new = totals["legacy"], totals["per_engine"]
+        if base["gold"]:
+            print(f"recall delta: {(new['tp'] - base['tp']) / base['gold']:+.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# bench_memory.py
+# ✅ 대량 업로드 처리 중 최대 메모리(peak RSS) 측정 + 상한 확인 (API 호출 없음)
+#
+# 사용법:
+#   python benchmarks/bench_memory.py [--count 64] [--megapixels 12,48] [--latency 0.5]
+#          [--max-budget-mb 256] [--max-rss-mb 350] [--json result.json]
+#
+# - 합성 스와치 JPEG (라벨 글자 모양 사각형 + 그라데이션)을 --megapixels 크기로 번갈아 만들어 --count 장 업로드를 흉내냄
+#   (Streamlit UploadedFile 처럼 파일 바이트는 메모리에 있음, 같은 크기는 바이트를 공유 → 디코딩 버퍼만 비교)
+#   이미지는 부모 프로세스에서 만들어 임시 폴더에 저장 (생성용 버퍼가 측정 프로세스의 peak 에 섞이지 않게)
+# - app.py 와 같은 흐름으로 처리: 썸네일 저장 → 엔진별 이미지 / 인코딩 생성 → 응답 지연(--latency) → 해제
+#   엔진 호출 자체는 하지 않음 (응답 원문은 메모리에 거의 영향 없음)
+# - 모드별로 새 프로세스에서 실행하고 peak RSS (VmHWM) 와 처리량 (images/s) 측정
+#     legacy   원본 해상도 디코딩, 동시 이미지 수(MAX_IN_FLIGHT)만 제한, 결과가 나올 때까지 버퍼 유지
+#     bounded  JPEG draft 디코딩 + 디코딩 / 인코딩 동안만 MemoryBudget 역압 (estimate_image_bytes)
+#              → encode_payloads() 로 픽셀 해제 후 응답 대기 (동시 대기 수는 MAX_IN_FLIGHT)
+# - bounded 의 peak RSS 가 --max-rss-mb 를 넘으면 종료 코드 1 (CI 에서 실행)
+import argparse
+import ast
+import asyncio
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("legacy", "bounded")
+MAX_RSS_MB = 350  # 기본 상한 (bounded: MAX_IN_FLIGHT_BYTES 256MB + 응답 대기 이미지 / 인터프리터 / 업로드 바이트 여유)
+
+
+# ✅ 합성 스와치 사진 (JPEG 바이트)
+def synthetic_jpeg(megapixels: float, seed: int) -> bytes:
+    import random
+
+    from PIL import Image, ImageDraw
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    rng = random.Random(seed)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    unit = width // 60
+    for row in range(6):
+        y = height // 3 + row * unit * 2
+        for col in range(rng.randint(8, 30)):
+            x = width // 8 + col * unit
+            draw.rectangle((x, y, x + unit * 2 // 3, y + unit), fill=(rng.randint(0, 60),) * 3)
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=90)
+    return buffered.getvalue()
+
+
+class Upload(io.BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+# ✅ app.py 의 MAX_IN_FLIGHT (app.py 는 Streamlit 스크립트라 import 하지 않고 ast 로 읽음)
+def app_max_in_flight() -> int:
+    with open(os.path.join(ROOT, "app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "MAX_IN_FLIGHT" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise ValueError("MAX_IN_FLIGHT not found in app.py")
+
+
+# 🔹 Linux 는 /proc 의 VmHWM (exec 이후 peak), 그 외는 ru_maxrss (fork 한 부모의 peak 가 섞일 수 있음)
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+# 🔹 엔진이 각자 스레드에서 만드는 이미지 / 인코딩 (실제 파이프라인과 같은 PreparedImage 경로)
+def _engine_payloads(prepared):
+    prepared.gpt_image_url
+    prepared.vision_bytes
+    prepared.tesseract_image
+
+
+async def run_mode(mode, uploads, latency, thumb_dir, budget_mb=None):
+    from PIL import Image
+    from prepared_image import MemoryBudget, PreparedImage, estimate_image_bytes, open_image, run_prepare
+
+    in_flight = asyncio.Semaphore(app_max_in_flight())
+    memory = MemoryBudget(int(budget_mb * 1024 * 1024)) if budget_mb else MemoryBudget()
+    peak = {"images": 0, "budget": 0}
+    live = set()
+
+    async def analyze(index, prepared):
+        with open(os.path.join(thumb_dir, f"{index}.png"), "wb") as f:
+            f.write(prepared.thumbnail_bytes)
+        await asyncio.to_thread(_engine_payloads, prepared)
+        await asyncio.sleep(latency)
+        return prepared.content_hash
+
+    # 🔹 app.prepare_upload 와 같은 순서: 썸네일 저장 → 엔진별 인코딩 → 픽셀 해제 (예산 안에서, 스레드에서 실행)
+    def prepare(index, image, name):
+        prepared = PreparedImage(image, name=name)
+        with open(os.path.join(thumb_dir, f"{index}.png"), "wb") as f:
+            f.write(prepared.thumbnail_bytes)
+        prepared.encode_payloads()
+        return prepared
+
+    async def process(index, upload):
+        async with in_flight:
+            if mode == "legacy":
+                prepared = PreparedImage(Image.open(upload), name=upload.name)
+                live.add(index)
+                peak["images"] = max(peak["images"], len(live))
+                try:
+                    return await analyze(index, prepared)
+                finally:
+                    live.discard(index)
+            image = open_image(upload)
+            async with memory.hold(estimate_image_bytes(image.size)):
+                live.add(index)
+                peak["images"] = max(peak["images"], len(live))
+                peak["budget"] = max(peak["budget"], memory.used)
+                prepared = await run_prepare(prepare, index, image, upload.name)
+                del image
+            try:
+                await asyncio.sleep(latency)
+                return prepared.content_hash
+            finally:
+                live.discard(index)
+                prepared.release()
+
+    await asyncio.gather(*(process(i, u) for i, u in enumerate(uploads)))
+    return peak
+
+
+def child(args):
+    import tempfile
+
+    samples = []
+    for path in sorted(os.listdir(args.samples)):
+        with open(os.path.join(args.samples, path), "rb") as f:
+            samples.append(f.read())
+    uploads = [Upload(samples[i % len(samples)], f"swatch_{i:04d}.jpg") for i in range(args.count)]
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as thumb_dir:
+        peak = asyncio.run(run_mode(args.child, uploads, args.latency, thumb_dir, args.max_budget_mb))
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        "mode": args.child,
+        "seconds": seconds,
+        "images_per_sec": args.count / seconds,
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_images": peak["images"],
+        "peak_budget_mb": peak["budget"] / (1024 * 1024),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="peak RSS of the upload pipeline on a large synthetic batch")
+    parser.add_argument("--count", type=int, default=64, help="업로드 이미지 수")
+    parser.add_argument("--megapixels", default="12,48", help="합성 이미지 크기 (MP, 번갈아 사용)")
+    parser.add_argument("--latency", type=float, default=0.5, help="이미지당 엔진 응답 대기 시간 (초)")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--max-budget-mb", type=float, default=None,
+                        help="MemoryBudget 한도 (기본: prepared_image.MAX_IN_FLIGHT_BYTES)")
+    parser.add_argument("--max-rss-mb", type=float, default=MAX_RSS_MB, help="bounded 모드 peak RSS 상한")
+    parser.add_argument("--json", default=None, help="결과 저장 파일")
+    parser.add_argument("--child", choices=MODES, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--samples", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args)
+
+    import tempfile
+
+    runs = []
+    with tempfile.TemporaryDirectory() as samples:
+        for i, megapixels in enumerate(args.megapixels.split(",")):
+            with open(os.path.join(samples, f"{i:02d}.jpg"), "wb") as f:
+                f.write(synthetic_jpeg(float(megapixels), seed=i))
+        for mode in args.modes.split(","):
+            argv = [sys.executable, os.path.abspath(__file__), "--child", mode, "--samples", samples,
+                    "--count", str(args.count), "--latency", str(args.latency)]
+            if args.max_budget_mb:
+                argv += ["--max-budget-mb", str(args.max_budget_mb)]
+            runs.append(json.loads(subprocess.run(argv, cwd=ROOT, capture_output=True, text=True,
+                                                  check=True).stdout))
+
+    print(f"{args.count} images ({args.megapixels} MP), engine latency {args.latency}s")
+    print(f"{'mode':<10}{'peak MB':>10}{'start MB':>10}{'images':>8}{'budget MB':>11}{'sec':>8}{'img/s':>8}")
+    for r in runs:
+        budget = f"{r['peak_budget_mb']:.0f}" if r["mode"] == "bounded" else "-"
+        print(f"{r['mode']:<10}{r['peak_rss_mb']:>10.0f}{r['baseline_rss_mb']:>10.0f}{r['peak_images']:>8}"
+              f"{budget:>11}{r['seconds']:>8.1f}{r['images_per_sec']:>8.1f}")
+
+    failures = [f"{r['mode']} peak {r['peak_rss_mb']:.0f}MB > {args.max_rss_mb:.0f}MB"
+                for r in runs if r["mode"] == "bounded" and r["peak_rss_mb"] > args.max_rss_mb]
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"runs": runs, "max_rss_mb": args.max_rss_mb, "failures": failures}, f, indent=1)
+    if failures:
+        print("\nFAIL: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
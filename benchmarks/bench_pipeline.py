@@ -0,0 +1,401 @@
+# bench_pipeline.py
+# ✅ 녹화된 엔진 응답으로 전체 파이프라인 처리량 / 지연 시간 / 단계별 CPU / 정확도 측정 (API 호출 없음)
+#
+# 사용법:
+#   python benchmarks/bench_pipeline.py [fixtures_dir] [--pipelines gpt_vision_ocr,ocr_gcv_gpt,cascade]
+#          [--concurrency 16] [--repeat 3] [--warm] [--latency openai=800,vision=250] [--jitter 0.3]
+#          [--error-rate openai=0.02,vision=0.01] [--rate-limit openai=0.05] [--retry-after-ms 500] [--seed 0]
+#          [--live-tesseract] [--keep-rate-limits]
+#          [--json result.json] [--compare baseline.json]
+#   python benchmarks/bench_pipeline.py <fixtures_dir> --record     # 실제 API 로 응답 녹화 (API 비용 발생)
+#
+# fixtures_dir (기본: benchmarks/fixtures, 없으면 합성 라벨 이미지 + 녹화 응답을 임시 폴더에 생성)
+#   - 스와치 이미지 (*.jpg, *.jpeg, *.png)
+#   - labels.json: {"파일명": {"company": "HOKKOH", "article_numbers": ["TXAB-H062"]}}
+#   - recorded/<파일명>.json: 엔진 원문 (형식은 standin_engines.py 참고, --record 로 생성)
+#
+# - OpenAI / Google Vision 은 standin_engines.py 서버(별도 프로세스)가 녹화 응답으로 대신 응답
+#   → 실제 클라이언트 / request_scheduler / vision_batcher / OCR 캐시 경로를 그대로 거침
+#   --latency / --error-rate / --rate-limit 으로 응답 지연과 오류(재시도 / circuit breaker / Retry-After)를 주입
+# - Tesseract 는 녹화 원문이 있으면 OCR 캐시에 미리 넣어 재생 (--live-tesseract 면 실제 실행)
+# - 실행(pass)마다 OCR 캐시를 비우고 시작 (cold), --warm 이면 캐시가 찬 상태로 한 번 더 실행
+# - CPU: 벤치마크 프로세스 전체 CPU 시간 + telemetry span 의 단계별 CPU 시간
+#   (Tesseract 프로세스 풀 / 가짜 서버의 CPU 는 포함하지 않음)
+# - --json 으로 결과(커밋 해시 포함)를 저장하고 --compare 로 이전 결과와 비교
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+PIPELINES = ("gpt_vision_ocr", "ocr_gcv_gpt", "cascade")
+# 벤치마크 이름 → engines.py 파이프라인 (이름은 이전 커밋 결과와 --compare 하기 위해 유지)
+ENGINE_PIPELINES = {"gpt_vision_ocr": "vision", "ocr_gcv_gpt": "text", "cascade": "cascade"}
+UNLIMITED_RATE = "1000000000"
+SYNTHETIC_COUNT = 24
+
+# 합성 라벨: (이미지에 찍힐 브랜드 글자, labels.json 의 정식 브랜드명, 품번 형식)
+SYNTHETIC_BRANDS = [
+    ("HOKKOH", "HOKKOH", "TXAB-H{:03d}"),
+    ("ALLBLUE", "ALLBLUE Inc.", "AB-EX{:03d}"),
+    ("OHARA", "Ohara Inc.", "MFA-{:04d}"),
+]
+
+
+def load_fixtures(fixtures_dir):
+    files = sorted(f for f in os.listdir(fixtures_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    labels = {}
+    labels_path = os.path.join(fixtures_dir, "labels.json")
+    if os.path.exists(labels_path):
+        with open(labels_path, encoding="utf-8") as f:
+            labels = json.load(f)
+    return files, labels
+
+
+# ✅ 합성 fixture: 라벨 이미지 + labels.json + 녹화 응답
+# GPT / Tesseract 녹화에는 일부러 누락 / 오독을 섞어 정확도 지표가 의미 있게 나오도록 함
+def write_synthetic_fixtures(directory, count=SYNTHETIC_COUNT):
+    from PIL import Image, ImageDraw, ImageFont
+
+    font = ImageFont.load_default(size=28)
+    labels = {}
+    os.makedirs(os.path.join(directory, "recorded"))
+    for i in range(count):
+        brand_text, company, pattern = SYNTHETIC_BRANDS[i % len(SYNTHETIC_BRANDS)]
+        article = pattern.format(100 + i)
+        lines = [brand_text, f"ITEM NO. {article}", "TEL 03-1234-5678", "COMPOSITION: COTTON 100%"]
+        image = Image.new("RGB", (720, 420), (235, 228, 214))
+        draw = ImageDraw.Draw(image)
+        words = []
+        for row, line in enumerate(lines):
+            x, y = 40, 50 + row * 80
+            for word in line.split(" "):
+                left, top, right, bottom = draw.textbbox((x, y), word, font=font)
+                draw.text((x, y), word, fill="black", font=font)
+                words.append([word, left, top, right, bottom])
+                x = right + 14
+        name = f"synthetic_{i:02d}.png"
+        image.save(os.path.join(directory, name))
+        labels[name] = {"company": company, "article_numbers": [article]}
+
+        gpt_articles = [article]
+        if i % 7 == 3:
+            gpt_articles = []  # GPT 누락
+        elif i % 11 == 5:
+            gpt_articles = [article.replace("1", "I", 1)]  # GPT 오독
+        tesseract_lines = lines if i % 5 != 2 else [lines[0]] + lines[2:]  # Tesseract 품번 줄 누락
+        recording = {
+            "gpt_vision_ocr": json.dumps({"company": brand_text, "article_numbers": gpt_articles}),
+            "google_vision_layout": json.dumps({"text": "\n".join(lines), "words": words, "size": list(image.size)}),
+            "tesseract": "\n".join(tesseract_lines),
+        }
+        with open(os.path.join(directory, "recorded", name + ".json"), "w", encoding="utf-8") as f:
+            json.dump(recording, f, ensure_ascii=False)
+    with open(os.path.join(directory, "labels.json"), "w", encoding="utf-8") as f:
+        json.dump(labels, f, ensure_ascii=False, indent=1)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ✅ 가짜 엔진 서버 프로세스 시작 (준비될 때까지 대기) + 클라이언트 환경변수 설정
+def start_standin(fixtures_dir, args):
+    openai_port, vision_port = _free_port(), _free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "standin_engines.py"), fixtures_dir,
+         "--openai-port", str(openai_port), "--vision-port", str(vision_port), "--latency", args.latency,
+         "--jitter", str(args.jitter), "--error-rate", args.error_rate, "--rate-limit", args.rate_limit,
+         "--retry-after-ms", str(args.retry_after_ms), "--seed", str(args.seed)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    line = process.stdout.readline()  # "ready ..." (실패하면 프로세스가 종료되어 빈 줄)
+    if not line.startswith("ready"):
+        process.kill()
+        raise RuntimeError(f"stand-in server failed to start: {line!r}")
+    os.environ.update({
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "OPENAI_API_KEY": "standin",
+        "VISION_API_ENDPOINT": f"127.0.0.1:{vision_port}",
+    })
+    return process
+
+
+def _open(fixtures_dir, name):
+    from prepared_image import PreparedImage
+
+    with open(os.path.join(fixtures_dir, name), "rb") as f:
+        return PreparedImage.open(io.BytesIO(f.read()), name=name)
+
+
+# ✅ 이미지 전체를 concurrency 개씩 동시에 처리 → ({파일명: 결과}, {파일명: 초})
+def run_pass(fixtures_dir, files, pipeline, concurrency):
+    from engines import extract_info_async
+
+    results, latencies = {}, {}
+
+    async def one(name, slots):
+        async with slots:
+            start = time.perf_counter()
+            results[name] = await extract_info_async(_open(fixtures_dir, name), ENGINE_PIPELINES[pipeline])
+            latencies[name] = time.perf_counter() - start
+
+    async def run_all():
+        slots = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(one(name, slots) for name in files))
+
+    asyncio.run(run_all())
+    return results, latencies
+
+
+# 🔹 녹화된 Tesseract 원문 → OCR 캐시에 넣을 (content_hash, model, text) 목록 (cold 실행마다 다시 넣어 재생)
+def recorded_tesseract(fixtures_dir, files):
+    from gpt_vision_ocr import tesseract_cache_model
+
+    entries = []
+    for name in files:
+        path = os.path.join(fixtures_dir, "recorded", name + ".json")
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            text = json.load(f).get("tesseract")
+        if text is not None:
+            image = _open(fixtures_dir, name)
+            entries.append((image.content_hash, tesseract_cache_model(image), text))
+    return entries
+
+
+def _is_error(result):
+    return result.get("company") == "[ERROR]"
+
+
+# ✅ labels.json 기준 품번 / 브랜드 precision, recall
+def accuracy(results, labels) -> dict:
+    from brand_registry import compact
+
+    counts = dict.fromkeys(("tp", "pred", "gold", "brand_tp", "brand_pred", "brand_gold"), 0)
+    for name, label in labels.items():
+        if name not in results or _is_error(results[name]):
+            counts["gold"] += len(label.get("article_numbers", []))
+            counts["brand_gold"] += label.get("company", "N/A") != "N/A"
+            continue
+        result = results[name]
+        predicted = {compact(a) for a in result.get("article_numbers", []) if a and a != "N/A"}
+        expected = {compact(a) for a in label.get("article_numbers", [])}
+        counts["tp"] += len(predicted & expected)
+        counts["pred"] += len(predicted)
+        counts["gold"] += len(expected)
+        company, expected_company = result.get("company", "N/A"), label.get("company", "N/A")
+        counts["brand_pred"] += company != "N/A"
+        counts["brand_gold"] += expected_company != "N/A"
+        counts["brand_tp"] += company != "N/A" and compact(company) == compact(expected_company)
+
+    def ratio(a, b):
+        return round(counts[a] / counts[b], 4) if counts[b] else None
+
+    return {"article_precision": ratio("tp", "pred"), "article_recall": ratio("tp", "gold"),
+            "brand_precision": ratio("brand_tp", "brand_pred"), "brand_recall": ratio("brand_tp", "brand_gold")}
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+# ✅ 파이프라인 1개 × (cold [, warm]) 실행 결과
+def bench_pipeline(fixtures_dir, files, labels, pipeline, args, tesseract_entries):
+    from ocr_cache import get_cache
+    from telemetry import collect
+
+    runs = {}
+    for phase in ("cold", "warm") if args.warm else ("cold",):
+        latencies, walls, cpus, passes = [], [], [], []
+        with collect() as metrics:
+            for _ in range(args.repeat):
+                if phase == "cold":
+                    get_cache().clear()
+                    for content_hash, model, text in tesseract_entries:
+                        get_cache().set(content_hash, "tesseract", text, model=model)
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                results, pass_latencies = run_pass(fixtures_dir, files, pipeline, args.concurrency)
+                walls.append(time.perf_counter() - wall_start)
+                cpus.append(time.process_time() - cpu_start)
+                latencies += pass_latencies.values()
+                passes.append(results)
+        wall = statistics.median(walls)
+        runs[phase] = {
+            "images": len(files),
+            "wall_s": round(wall, 3),
+            "images_per_s": round(len(files) / wall, 2) if wall else None,
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+            "cpu_s": round(statistics.median(cpus), 3),
+            "errors": sum(_is_error(r) for r in passes[-1].values()),
+            **accuracy(passes[-1], labels),
+            "stages": [row for row in metrics.summary() if row["p50_ms"] is not None],
+        }
+    return runs
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _fmt(value, spec):
+    if value is None:
+        return "-".rjust(int(spec.split(".")[0].lstrip("+")))
+    return format(value, spec)
+
+
+def print_report(report):
+    print(f"commit {report['commit']}  images {report['images']}  concurrency {report['config']['concurrency']}"
+          f"  latency {report['config']['latency'] or '-'}  errors {report['config']['error_rate'] or '-'}")
+    print(f"{'pipeline':<16}{'pass':<6}{'img/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'cpu s':>8}{'err':>5}"
+          f"{'art P':>7}{'art R':>7}{'brand P':>9}{'brand R':>9}")
+    for pipeline, runs in report["runs"].items():
+        for phase, r in runs.items():
+            print(f"{pipeline:<16}{phase:<6}{_fmt(r['images_per_s'], '8.2f')}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+                  f"{r['cpu_s']:>8.2f}{r['errors']:>5}{_fmt(r['article_precision'], '7.3f')}"
+                  f"{_fmt(r['article_recall'], '7.3f')}{_fmt(r['brand_precision'], '9.3f')}"
+                  f"{_fmt(r['brand_recall'], '9.3f')}")
+    for pipeline, runs in report["runs"].items():
+        for phase, r in runs.items():
+            print(f"\n{pipeline} / {phase} stages")
+            print(f"  {'stage':<24}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'cpu ms':>9}{'errors':>8}{'cache hit':>10}")
+            for s in r["stages"]:
+                print(f"  {s['stage']:<24}{s['count']:>7}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['cpu_ms']:>9.1f}"
+                      f"{s['errors']:>8}{_fmt(s['cache_hit_rate'], '10.2f')}")
+
+
+# ✅ 이전 결과(--json)와 비교: 같은 파이프라인 / pass 의 변화량
+def print_comparison(report, baseline):
+    print(f"\ncompared with {baseline.get('commit')}")
+    print(f"{'pipeline':<16}{'pass':<6}{'img/s':>10}{'p95 ms':>10}{'cpu s':>9}{'art P':>8}{'art R':>8}")
+    for pipeline, runs in report["runs"].items():
+        for phase, r in runs.items():
+            base = baseline.get("runs", {}).get(pipeline, {}).get(phase)
+            if not base:
+                continue
+
+            def delta(key, spec):
+                if r.get(key) is None or base.get(key) is None:
+                    return _fmt(None, spec)
+                return format(r[key] - base[key], spec)
+
+            print(f"{pipeline:<16}{phase:<6}{delta('images_per_s', '+10.2f')}{delta('p95_ms', '+10.1f')}"
+                  f"{delta('cpu_s', '+9.2f')}{delta('article_precision', '+8.3f')}{delta('article_recall', '+8.3f')}")
+
+
+# ✅ --record: 실제 API 로 두 파이프라인을 실행하고 OCR 캐시에 쌓인 엔진 원문을 녹화 파일로 저장
+def record(fixtures_dir, files, concurrency):
+    from layout_ocr import loads_layout
+    from ocr_cache import get_cache, text_hash
+
+    for pipeline in ("gpt_vision_ocr", "ocr_gcv_gpt"):
+        run_pass(fixtures_dir, files, pipeline, concurrency)
+    os.makedirs(os.path.join(fixtures_dir, "recorded"), exist_ok=True)
+    cache = get_cache()
+    for name in files:
+        recording = {row["engine"]: row["text"] for row in cache.raw_texts(_open(fixtures_dir, name).content_hash)}
+        layout = loads_layout(recording.get("google_vision_layout"))
+        for row in cache.raw_texts(text_hash(layout["text"])) if layout["text"] else []:
+            recording[row["engine"]] = row["text"]
+        with open(os.path.join(fixtures_dir, "recorded", name + ".json"), "w", encoding="utf-8") as f:
+            json.dump(recording, f, ensure_ascii=False, indent=1)
+    print(f"recorded {len(files)} fixtures → {os.path.join(fixtures_dir, 'recorded')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offline pipeline benchmark with recorded engine responses")
+    parser.add_argument("fixtures_dir", nargs="?", default=os.path.join(ROOT, "benchmarks", "fixtures"))
+    parser.add_argument("--pipelines", default=",".join(PIPELINES))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=1, help="pass 반복 횟수 (중앙값 사용)")
+    parser.add_argument("--warm", action="store_true", help="캐시가 찬 상태로 한 번 더 실행")
+    parser.add_argument("--latency", default="", help="엔진별 평균 응답 지연 ms (예: openai=800,vision=250)")
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--error-rate", default="", help="엔진별 오류 비율 (예: openai=0.02,vision=0.01)")
+    parser.add_argument("--rate-limit", default="", help="엔진별 429 비율 (예: openai=0.05)")
+    parser.add_argument("--retry-after-ms", type=float, default=500, help="429 응답의 retry-after-ms")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--live-tesseract", action="store_true", help="녹화 원문 대신 Tesseract 실제 실행")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="OPENAI_RPM 등 설정된 호출 한도 유지")
+    parser.add_argument("--json", default=None, help="결과 저장 파일")
+    parser.add_argument("--compare", default=None, help="비교할 이전 결과 파일 (--json 으로 저장한 것)")
+    parser.add_argument("--record", action="store_true", help="실제 API 로 fixture 응답 녹화 (API 비용 발생)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    # 🔹 모듈 import 전에 환경변수 설정 (OCR 캐시 경로 / 호출 한도는 import 시점에 읽음)
+    os.environ["OCR_CACHE_PATH"] = os.path.join(work_dir, "ocr_cache.sqlite3")
+    os.environ.pop("OCR_TRACE_PATH", None)
+    fixtures_dir = args.fixtures_dir
+    if not os.path.isdir(fixtures_dir) or not load_fixtures(fixtures_dir)[0]:
+        if args.record:
+            parser.error(f"no fixture images in {fixtures_dir}")
+        fixtures_dir = os.path.join(work_dir, "fixtures")
+        write_synthetic_fixtures(fixtures_dir)
+    files, labels = load_fixtures(fixtures_dir)
+
+    server = None
+    try:
+        if args.record:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            record(fixtures_dir, files, args.concurrency)
+            return
+        if not args.keep_rate_limits:
+            for key in ("OPENAI_RPM", "OPENAI_TPM", "VISION_RPM"):
+                os.environ[key] = UNLIMITED_RATE
+        server = start_standin(fixtures_dir, args)
+
+        report = {
+            "commit": _git_commit(),
+            "fixtures": os.path.abspath(args.fixtures_dir) if fixtures_dir == args.fixtures_dir else "synthetic",
+            "images": len(files),
+            "config": {k: getattr(args, k) for k in ("concurrency", "repeat", "latency", "jitter", "error_rate",
+                                                     "rate_limit", "retry_after_ms", "seed", "live_tesseract",
+                                                     "keep_rate_limits")},
+            "runs": {},
+        }
+        tesseract_entries = [] if args.live_tesseract else recorded_tesseract(fixtures_dir, files)
+        for pipeline in args.pipelines.split(","):
+            report["runs"][pipeline] = bench_pipeline(fixtures_dir, files, labels, pipeline, args,
+                                                      tesseract_entries)
+        print_report(report)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=1)
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as f:
+                print_comparison(report, json.load(f))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# check_gpt_batch.py
+# ✅ GPT Batch API 모드 (gpt_batch.py) 전체 경로 확인: 가짜 OpenAI 서버 (standin_engines.py) 상대로 실행 (API 호출 없음)
+#
+# 사용법:
+#   python benchmarks/check_gpt_batch.py
+#
+# - 합성 라벨 이미지 + 녹화 응답 (bench_pipeline.write_synthetic_fixtures) 과 녹화 없는 이미지 1장을 임시 폴더에 생성
+# - OpenAIBatchTransport (실제 openai 클라이언트 / request_scheduler) 로
+#   제출 → (중단 가정) 상태 파일에서 이어서 polling → 결과 수집 → OCR 캐시 저장 → parse_gpt_response 확인
+#     - 배치 크기를 줄여 배치 2개로 나누고, 2번째 배치는 expired (앞 절반만 결과)
+#     - 녹화 없는 이미지는 오류 줄 (status 400)
+#     - 다시 실행하면 캐시에 없는 요청만 새 배치로 제출
+# - 하나라도 다르면 종료 코드 1
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+IMAGE_COUNT = 8
+BATCH_SIZE = 5  # 녹화 없는 이미지 포함 9줄 → 배치 2개 (5 + 4)
+UNRECORDED = "00_unrecorded.png"  # 정렬 순서상 첫 배치에 들어감
+
+
+def _write_unrecorded(directory):
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (720, 420), (200, 214, 235))
+    ImageDraw.Draw(image).text((40, 50), "NO RECORDING 000", fill="black")
+    image.save(os.path.join(directory, UNRECORDED))
+
+
+def _no_sources():
+    raise AssertionError("resumed run must not rebuild batch requests")
+    yield
+
+
+def check(work_dir) -> list:
+    fixtures_dir = os.path.join(work_dir, "fixtures")
+    os.makedirs(fixtures_dir)
+    os.environ["OCR_CACHE_PATH"] = os.path.join(work_dir, "ocr_cache.sqlite")
+    os.environ["OPENAI_API_KEY"] = "standin"
+
+    from bench_pipeline import write_synthetic_fixtures
+    from standin_engines import StandinEngines, serve_openai
+
+    write_synthetic_fixtures(fixtures_dir, count=IMAGE_COUNT)
+    _write_unrecorded(fixtures_dir)
+    engines = StandinEngines(fixtures_dir, batch_polls=2, expire_every=2)
+    server = serve_openai(engines)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+
+    import gpt_batch
+    from gpt_vision_ocr import PROMPT_VERSION, gpt_cache_model
+    from ocr_cache import get_cache
+    from postprocess import parse_gpt_response
+    from prepared_image import PreparedImage
+    from swatch_ocr import iter_sources
+
+    gpt_batch.BATCH_MAX_REQUESTS = BATCH_SIZE
+    transport = gpt_batch.OpenAIBatchTransport()
+    state_path = os.path.join(work_dir, "result.csv.gpt_batch.json")
+    failures = []
+
+    def expect(label, actual, expected):
+        ok = actual == expected
+        print(f"{'ok ' if ok else 'FAIL'} {label}: {actual}")
+        if not ok:
+            failures.append(f"{label}: {actual} != {expected}")
+
+    # 1) 제출만 하고 중단된 상황 → 상태 파일에서 이어서 (소스를 다시 읽지 않음)
+    state = gpt_batch.submit_batches(iter_sources(fixtures_dir), transport, state_path)
+    expect("submitted batches", len(state["batches"]), 2)
+    expect("state file written", os.path.exists(state_path), True)
+    counts = gpt_batch.run_gpt_batch(_no_sources(), state_path, transport, poll_interval=0.01)
+    expect("resume created no new batches", len(engines.batches), 2)
+    expect("batch statuses", [b["status"] for b in engines.batches.values()], ["completed", "expired"])
+    # 1번 배치: 오류 줄 1 + 4장 / 2번 배치(expired): 2장 + batch_expired 2줄
+    expect("collected counts", counts, {"stored": IMAGE_COUNT - 2, "failed": 3})
+    expect("state file removed", os.path.exists(state_path), False)
+
+    # 2) 캐시된 GPT 원문 → parse_gpt_response (녹화 응답과 같은 결과)
+    cache = get_cache()
+    cached = []
+    for name, read in iter_sources(fixtures_dir):
+        image = PreparedImage.open(os.path.join(fixtures_dir, name), name=name)
+        text = cache.get(image.content_hash, "gpt_vision_ocr", PROMPT_VERSION, gpt_cache_model(image))
+        if text is None:
+            continue
+        cached.append(name)
+        recorded = json.loads(engines.recordings[name]["gpt_vision_ocr"])
+        company, articles, used_fallback = parse_gpt_response(text)
+        expect(f"parse {name}", (company, articles, used_fallback),
+               (recorded["company"], [a.upper() for a in recorded["article_numbers"]], False))
+    expect("cached images", len(cached), IMAGE_COUNT - 2)
+    expect("unrecorded image not cached", UNRECORDED in cached, False)
+
+    # 3) 다시 실행: 캐시에 없는 요청 (오류 줄 1 + expired 2) 만 새 배치로
+    counts = gpt_batch.run_gpt_batch(iter_sources(fixtures_dir), state_path, transport, poll_interval=0.01)
+    latest = list(engines.batches.values())[-1]
+    expect("rerun batches", len(engines.batches), 3)
+    expect("rerun requests", latest["request_counts"]["total"], 3)
+    expect("rerun counts", counts, {"stored": 2, "failed": 1})
+    server.shutdown()
+    return failures
+
+
+def main():
+    work_dir = tempfile.mkdtemp(prefix="check_gpt_batch_")
+    try:
+        failures = check(work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if failures:
+        print("\nFAIL: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
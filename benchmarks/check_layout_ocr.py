@@ -0,0 +1,82 @@
+# check_layout_ocr.py
+# ✅ layout_ocr (Vision 단어 위치 기반 품번 추출) 확인: 녹화된 Vision 응답 JSON → 기대 품번 (API 호출 없음)
+#
+# 사용법:
+#   python benchmarks/check_layout_ocr.py [fixtures_dir]
+#   python benchmarks/check_layout_ocr.py --record image.jpg name.json   # 실제 Vision 응답 녹화 (API 비용 발생)
+#
+# fixtures_dir (기본: benchmarks/layout_fixtures)
+#   - <이름>.json: AnnotateImageResponse 의 JSON 형식 ({"textAnnotations": [...]}, --record 로 생성)
+#   - expected.json: {"cases": [{"file", "size", "canvas_size", "company", "articles"}]}
+#     같은 응답을 브랜드 템플릿 영역 안 / 영역 없이 / 기본 anchor 로 각각 확인 (anchor 없는 라벨은 빈 목록)
+#
+# - 녹화 JSON 을 dict 그대로 넣는 경로와 AnnotateImageResponse 객체로 변환해 넣는 경로가 같은 레이아웃을 만드는지 확인
+#   (google-cloud-vision 이 없으면 dict 경로만)
+# - 하나라도 다르면 종료 코드 1
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "layout_fixtures")
+
+
+def _response_object(raw: str):
+    try:
+        from google.cloud import vision
+    except ImportError:
+        return None
+    return vision.AnnotateImageResponse.from_json(raw, ignore_unknown_fields=True)
+
+
+# ✅ 이미지 → Vision 응답 JSON 저장 (PreparedImage 의 Vision 이미지 기준, 크기도 함께 출력)
+def record(image_path, output_path):
+    from google.cloud import vision
+
+    from engine_clients import get_vision_client
+    from prepared_image import PreparedImage
+
+    prepared = PreparedImage.open(image_path)
+    response = get_vision_client().text_detection(image=vision.Image(content=prepared.vision_bytes))
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(vision.AnnotateImageResponse.to_json(response, indent=1))
+    print(f"{output_path}: size={list(prepared.engine_size('vision'))} canvas_size={list(prepared.size)}")
+
+
+def check(fixtures_dir) -> list:
+    from layout_ocr import dumps_layout, extract_anchored_articles, layout_from_response
+
+    with open(os.path.join(fixtures_dir, "expected.json"), encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+    failures = []
+    for case in cases:
+        with open(os.path.join(fixtures_dir, case["file"]), encoding="utf-8") as f:
+            raw = f.read()
+        layout = layout_from_response(json.loads(raw), case["size"])
+        response = _response_object(raw)
+        if response is not None and dumps_layout(layout_from_response(response, case["size"])) != dumps_layout(layout):
+            failures.append(f"{case['file']}: AnnotateImageResponse layout differs from JSON layout")
+        articles = extract_anchored_articles(layout, case["company"], case["canvas_size"])
+        ok = articles == case["articles"]
+        print(f"{'ok ' if ok else 'FAIL'} {case['file']:<20} company={case['company']} "
+              f"canvas={case['canvas_size']} -> {articles}")
+        if not ok:
+            failures.append(f"{case['file']} ({case['company']}, {case['canvas_size']}): "
+                            f"{articles} != {case['articles']}")
+    return failures
+
+
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ["--record"]:
+        return record(*args[1:3])
+    failures = check(args[0] if args else FIXTURES_DIR)
+    if failures:
+        print("\nFAIL: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
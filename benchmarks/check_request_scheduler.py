@@ -0,0 +1,127 @@
+# check_request_scheduler.py
+# ✅ request_scheduler 의 429 처리 확인: 가짜 OpenAI 서버 (standin_engines.py) 가 Retry-After 헤더와 함께 429 응답 (API 호출 없음)
+#
+# 사용법:
+#   python benchmarks/check_request_scheduler.py
+#
+# - 실제 openai 클라이언트 (max_retries=0) → scheduled_call / scheduled_call_async 경로
+# - 헤더 형식별로 첫 요청을 429 로 응답하고, 그 사이 들어온 다른 요청도 버킷 pause 가 끝날 때까지 보류되는지,
+#   재시도가 성공하는지 확인
+#     retry-after-ms (+ retry-after 올림) / retry-after 초 / retry-after HTTP-date
+# - Retry-After 가 없는 429 는 백오프로만 재시도하고 버킷을 멈추지 않는지 확인
+# - 하나라도 다르면 종료 코드 1
+import asyncio
+import email.utils
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SLACK = 0.02  # 서버 도착 시각과 클라이언트 pause 계산 사이의 여유 (초)
+
+
+def check(work_dir) -> list:
+    fixtures_dir = os.path.join(work_dir, "fixtures")
+    os.makedirs(fixtures_dir)
+    os.environ["OCR_CACHE_PATH"] = ""
+    os.environ["OPENAI_API_KEY"] = "standin"
+
+    from bench_pipeline import write_synthetic_fixtures
+    from standin_engines import StandinEngines, serve_openai
+
+    write_synthetic_fixtures(fixtures_dir, count=1)
+    engines = StandinEngines(fixtures_dir)
+    server = serve_openai(engines)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+
+    from engine_clients import get_async_openai_client, get_openai_client
+    from request_scheduler import get_scheduler, reset_schedulers, scheduled_call, scheduled_call_async
+
+    prompt = engines.by_text[0][0]  # 녹화된 Vision 원문 → 가짜 서버가 텍스트 요청으로 매칭
+    body = {"model": "gpt-4o", "messages": [{"role": "user", "content": prompt}], "max_tokens": 50}
+    failures = []
+
+    def expect(label, ok, detail):
+        print(f"{'ok ' if ok else 'FAIL'} {label}: {detail}")
+        if not ok:
+            failures.append(f"{label}: {detail}")
+
+    def call():
+        return scheduled_call("openai", lambda: get_openai_client().chat.completions.create(**body), tokens=100)
+
+    # 🔹 첫 요청이 429 를 받은 뒤 두 번째 요청을 보냄 → 두 요청 모두 pause 이후에 서버에 도착해야 함
+    def run_sync():
+        results = []
+        first = threading.Thread(target=lambda: results.append(call()))
+        first.start()
+        while get_scheduler("openai").stats["failures"] == 0 and first.is_alive():
+            time.sleep(0.005)
+        results.append(call())
+        first.join()
+        return results
+
+    async def run_async():
+        async def one():
+            client = get_async_openai_client()
+            return await scheduled_call_async("openai", lambda: client.chat.completions.create(**body), tokens=100)
+
+        first = asyncio.create_task(one())
+        while get_scheduler("openai").stats["failures"] == 0 and not first.done():
+            await asyncio.sleep(0.005)
+        second = await one()
+        return [await first, second]
+
+    # (이름, 429 헤더 (주입 직전에 생성), 최소 pause 초, 실행 방식)
+    cases = [
+        ("retry-after-ms", lambda: {"retry-after-ms": "400", "retry-after": "1"}, 0.4, run_sync),
+        ("retry-after seconds", lambda: {"retry-after": "1"}, 1.0, run_sync),
+        ("retry-after HTTP-date", lambda: {"retry-after": email.utils.formatdate(time.time() + 2, usegmt=True)},
+         0.5, run_sync),
+        ("retry-after-ms (async)", lambda: {"retry-after-ms": "300"}, 0.3, lambda: asyncio.run(run_async())),
+    ]
+    for label, headers, min_pause, runner in cases:
+        reset_schedulers()
+        engines.request_times["openai"].clear()
+        engines.throttle("openai", headers())
+        results = runner()
+        scheduler = get_scheduler("openai")
+        arrivals = engines.request_times["openai"]
+        paused_until = max(bucket.paused_until for bucket in scheduler.buckets.values())
+        ok_results = all(r.choices[0].message.content for r in results)
+        expect(f"{label}: retried and succeeded", ok_results and scheduler.stats["retries"] == 1
+               and len(arrivals) == 3, f"requests={len(arrivals)} stats={scheduler.stats}")
+        expect(f"{label}: bucket paused", paused_until - arrivals[0] >= min_pause - SLACK,
+               f"pause {paused_until - arrivals[0]:.2f}s (>= {min_pause}s)")
+        expect(f"{label}: no request during pause", min(arrivals[1:]) >= paused_until - SLACK,
+               f"next requests at +{min(arrivals[1:]) - arrivals[0]:.2f}s")
+
+    # 🔹 Retry-After 가 없는 429 는 지수 백오프로만 재시도하고 버킷은 멈추지 않음
+    reset_schedulers()
+    engines.throttle("openai", {})
+    result = call()
+    scheduler = get_scheduler("openai")
+    paused_until = max(bucket.paused_until for bucket in scheduler.buckets.values())
+    expect("429 without Retry-After: backoff only", bool(result.choices[0].message.content) and paused_until == 0.0
+           and scheduler.stats["retries"] == 1, f"paused_until={paused_until} stats={scheduler.stats}")
+    server.shutdown()
+    return failures
+
+
+def main():
+    work_dir = tempfile.mkdtemp(prefix="check_request_scheduler_")
+    try:
+        failures = check(work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if failures:
+        print("\nFAIL: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+# standin_engines.py
+# ✅ 녹화된 엔진 응답을 돌려주는 로컬 가짜 OpenAI / Google Vision 서버 (bench_pipeline.py 용)
+#
+# 사용법:
+#   python benchmarks/standin_engines.py <fixtures_dir> --openai-port 8000 --vision-port 50051
+#                                        [--latency openai=800,vision=250] [--jitter 0.3]
+#                                        [--error-rate openai=0.02,vision=0.01,batch=0.1] [--seed 0]
+#                                        [--batch-polls 2] [--expire-every 0]
+#                                        [--rate-limit openai=0.05,vision=0.02] [--retry-after-ms 500]
+#
+# - OpenAI: POST /v1/chat/completions (stream=True 면 SSE 청크) → OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+# - OpenAI Batch API (gpt_batch.py): POST /v1/files, POST /v1/batches, GET /v1/batches/{id}, GET /v1/files/{id}/content
+#   배치는 --batch-polls 번째 조회에서 끝나고, 그때 요청 줄마다 녹화 응답으로 결과 / 오류 파일을 만듦
+#   녹화가 없는 이미지 / batch 오류 비율에 걸린 요청은 오류 파일로, --expire-every N 이면 N 번째 배치마다 expired
+#   (앞 절반만 결과 파일, 나머지는 batch_expired 오류)
+# - Vision: gRPC BatchAnnotateImages → VISION_API_ENDPOINT=127.0.0.1:<port> (engine_clients 의 기존 설정)
+# - 요청 이미지는 PreparedImage 로 같은 방식으로 인코딩한 fixture 와 바이트 해시로 매칭
+#   (ocr_gcv_gpt 의 텍스트 요청은 프롬프트에 들어 있는 Vision 원문으로 매칭)
+# - latency: 엔진별 평균 응답 지연(ms), jitter 비율만큼 균등 분포로 흔들림
+# - error-rate: 엔진별 오류 비율 (OpenAI 503 / Vision UNAVAILABLE → request_scheduler 재시도 경로 확인,
+#   batch 는 배치 결과의 요청 줄 단위 500 오류)
+# - rate-limit: 엔진별 429 비율 (OpenAI 429 + retry-after-ms / retry-after 헤더, Vision RESOURCE_EXHAUSTED)
+#   → request_scheduler 의 Retry-After 대기(버킷 pause) 경로 확인. throttle() 로 다음 요청에 정해진 헤더로 429 주입
+#
+# fixtures_dir/recorded/<이미지 파일명>.json (OCR 캐시 원문과 같은 형식)
+#   {"gpt_vision_ocr": "{\"company\": ..., \"article_numbers\": [...]}",
+#    "google_vision_layout": "{\"text\": ..., \"words\": [[단어, x0, y0, x1, y1], ...], \"size\": [w, h]}",
+#    "gcv_text_gpt": "... (선택, 없으면 gpt_vision_ocr 사용)", "tesseract": "... (선택)"}
+#   google_vision_layout 대신 Vision REST 응답 JSON 을 "vision" 에 넣어도 됨
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent import futures
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+VISION_SERVICE = "google.cloud.vision.v1.ImageAnnotator"
+SSE_PIECES = 4  # 스트리밍 응답을 나눠 보낼 청크 수
+
+
+def _sha(data) -> str:
+    return hashlib.sha256(data if isinstance(data, bytes) else data.encode("utf-8")).hexdigest()
+
+
+def parse_engine_values(text, cast=float) -> dict:
+    values = {}
+    for item in (text or "").split(","):
+        if item.strip():
+            name, value = item.split("=")
+            values[name.strip()] = cast(value)
+    return values
+
+
+def load_recordings(fixtures_dir) -> dict:
+    recorded_dir = os.path.join(fixtures_dir, "recorded")
+    recordings = {}
+    for name in sorted(os.listdir(fixtures_dir)):
+        path = os.path.join(recorded_dir, name + ".json")
+        if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                recordings[name] = json.load(f)
+    return recordings
+
+
+# ✅ 녹화 1건 → Vision AnnotateImageResponse
+def vision_response(recording):
+    from google.cloud import vision
+
+    if "vision" in recording:
+        return vision.AnnotateImageResponse.from_json(json.dumps(recording["vision"]), ignore_unknown_fields=True)
+    layout = json.loads(recording.get("google_vision_layout") or '{"text": "", "words": [], "size": [1, 1]}')
+    if not layout["text"]:
+        return vision.AnnotateImageResponse()
+
+    def box(x0, y0, x1, y1):
+        return vision.BoundingPoly(vertices=[vision.Vertex(x=round(x), y=round(y))
+                                             for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))])
+
+    width, height = layout["size"]
+    annotations = [vision.EntityAnnotation(description=layout["text"], bounding_poly=box(0, 0, width, height))]
+    annotations += [vision.EntityAnnotation(description=w[0], bounding_poly=box(*w[1:5])) for w in layout["words"]]
+    return vision.AnnotateImageResponse(text_annotations=annotations)
+
+
+# 🔹 OpenAI 429 헤더 형식 (ms 단위 + 초 단위 올림)
+def _retry_after_headers(ms) -> dict:
+    return {"retry-after-ms": str(int(ms)), "retry-after": str(max(1, math.ceil(ms / 1000)))}
+
+
+# ✅ chat.completions 응답 본문 (동기 호출 / 배치 결과 줄 공용)
+def completion(body, text) -> dict:
+    prompt_tokens = len(json.dumps(body)) // 4
+    return {
+        "id": "chatcmpl-standin", "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model", ""),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                  "total_tokens": prompt_tokens + len(text) // 4},
+    }
+
+
+class StandinEngines:
+    def __init__(self, fixtures_dir, latency=None, jitter=0.3, error_rate=None, seed=0, batch_polls=2,
+                 expire_every=0, rate_limit=None, retry_after_ms=500):
+        from prepared_image import PreparedImage
+
+        self.recordings = load_recordings(fixtures_dir)
+        self.latency = latency or {}
+        self.jitter = jitter
+        self.error_rate = error_rate or {}
+        self.rate_limit = rate_limit or {}
+        self.retry_after_ms = retry_after_ms
+        self._throttled = {}  # 엔진 → 다음 요청들에 보낼 429 헤더 목록 (throttle)
+        self.request_times = {"openai": [], "vision": []}  # 요청 도착 시각 (time.monotonic)
+        self.batch_polls = batch_polls
+        self.expire_every = expire_every
+        self.files, self.batches = {}, {}  # Batch API 상태 (id → 바이트 / 배치 객체)
+        self._ids = itertools.count(1)
+        self._batch_lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.by_gpt_url, self.by_vision_bytes, self.by_text = {}, {}, []
+        for name, recording in self.recordings.items():
+            image = PreparedImage.open(os.path.join(fixtures_dir, name), name=name)
+            self.by_gpt_url[_sha(image.gpt_image_url)] = name
+            self.by_vision_bytes[_sha(image.vision_bytes)] = name
+            text = vision_response(recording).text_annotations
+            if text and text[0].description:
+                self.by_text.append((text[0].description, name))
+        self.by_text.sort(key=lambda item: -len(item[0]))  # 긴 원문부터 (포함 관계 오매칭 방지)
+
+    def _random(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    # 🔹 지연 후 오류 주입 여부
+    def delay_and_fail(self, engine) -> bool:
+        latency = self.latency.get(engine, 0.0) / 1000.0
+        if latency:
+            time.sleep(latency * (1 + self.jitter * (2 * self._random() - 1)))
+        return self._random() < self.error_rate.get(engine, 0.0)
+
+    # ✅ 다음 요청 1건을 429 로 응답 (headers=None 이면 retry_after_ms 기준 retry-after-ms + retry-after, {} 면 헤더 없음)
+    def throttle(self, engine, headers=None):
+        with self._rng_lock:
+            self._throttled.setdefault(engine, []).append(
+                _retry_after_headers(self.retry_after_ms) if headers is None else headers)
+
+    # 🔹 요청 도착 기록 + 429 여부 (429 면 응답 헤더, 아니면 None)
+    def rate_limited(self, engine):
+        with self._rng_lock:
+            self.request_times[engine].append(time.monotonic())
+            queued = self._throttled.get(engine)
+            if queued:
+                return queued.pop(0)
+        if self._random() < self.rate_limit.get(engine, 0.0):
+            return _retry_after_headers(self.retry_after_ms)
+        return None
+
+    # ✅ chat.completions 요청 → 응답 원문 (매칭 실패면 None)
+    def gpt_reply(self, body):
+        content = body["messages"][-1]["content"]
+        if isinstance(content, str):
+            for text, name in self.by_text:
+                if text in content:
+                    recording = self.recordings[name]
+                    return recording.get("gcv_text_gpt") or recording.get("gpt_vision_ocr")
+            return None
+        names = [self.by_gpt_url.get(_sha(part["image_url"]["url"]))
+                 for part in content if part.get("type") == "image_url"]
+        if not names or None in names:
+            return None
+        if len(names) == 1:
+            return self.recordings[names[0]].get("gpt_vision_ocr")
+        # gpt_tiling 묶음 요청
+        results = [{"index": i, **json.loads(self.recordings[name]["gpt_vision_ocr"])}
+                   for i, name in enumerate(names, 1)]
+        return json.dumps({"results": results}, ensure_ascii=False)
+
+    # ✅ Batch API: 파일 업로드 → file 객체
+    def upload_file(self, data: bytes, filename: str, purpose: str) -> dict:
+        with self._batch_lock:
+            file_id = f"file-standin-{next(self._ids)}"
+            self.files[file_id] = data
+        return {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose}
+
+    # ✅ Batch API: 배치 생성 → batch 객체 (validating)
+    def create_batch(self, body) -> dict:
+        with self._batch_lock:
+            if body.get("input_file_id") not in self.files:
+                return None
+            batch = {"id": f"batch_standin_{len(self.batches) + 1}", "object": "batch",
+                     "endpoint": body.get("endpoint"), "input_file_id": body["input_file_id"],
+                     "completion_window": body.get("completion_window"), "status": "validating",
+                     "created_at": int(time.time()), "metadata": body.get("metadata"),
+                     "output_file_id": None, "error_file_id": None, "polls": 0,
+                     "request_counts": {"total": self.files[body["input_file_id"]].count(b"\n"),
+                                        "completed": 0, "failed": 0}}
+            self.batches[batch["id"]] = batch
+        return self._public(batch)
+
+    # ✅ Batch API: 상태 조회 (batch_polls 번째 조회에서 결과 / 오류 파일 생성)
+    def retrieve_batch(self, batch_id):
+        with self._batch_lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return None
+            batch["polls"] += 1
+            if batch["status"] in ("validating", "in_progress"):
+                if batch["polls"] < self.batch_polls:
+                    batch["status"] = "in_progress"
+                else:
+                    self._finish_batch(batch)
+            return self._public(batch)
+
+    def _public(self, batch) -> dict:
+        return {k: v for k, v in batch.items() if k != "polls"}
+
+    def _finish_batch(self, batch):
+        lines = [json.loads(line) for line in self.files[batch["input_file_id"]].decode("utf-8").splitlines()
+                 if line.strip()]
+        expired = bool(self.expire_every) and int(batch["id"].rsplit("_", 1)[1]) % self.expire_every == 0
+        done = len(lines) // 2 if expired else len(lines)
+        output, errors = [], []
+        for i, line in enumerate(lines):
+            row = {"id": f"batch_req_{i}", "custom_id": line["custom_id"], "response": None, "error": None}
+            text = self.gpt_reply(line["body"]) if i < done else None
+            if i >= done:
+                row["error"] = {"code": "batch_expired",
+                                "message": "This request could not be executed before the completion window expired."}
+            elif text is None or self._random() < self.error_rate.get("batch", 0.0):
+                message = "no recording for this request" if text is None else "injected error"
+                status = 400 if text is None else 500
+                row["response"] = {"status_code": status, "request_id": f"req_{i}",
+                                   "body": {"error": {"message": message, "type": "invalid_request_error"
+                                                      if text is None else "server_error"}}}
+            else:
+                row["response"] = {"status_code": 200, "request_id": f"req_{i}", "body": completion(line["body"], text)}
+            (errors if row["error"] or row["response"]["status_code"] != 200 else output).append(row)
+
+        def store(rows):
+            if not rows:
+                return None
+            file_id = f"file-standin-{next(self._ids)}"
+            self.files[file_id] = "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")
+            return file_id
+
+        batch.update(status="expired" if expired else "completed", output_file_id=store(output),
+                     error_file_id=store(errors),
+                     request_counts={"total": len(lines), "completed": len(output), "failed": len(errors)})
+
+    # ✅ Vision BatchAnnotateImages
+    def annotate(self, request, context):
+        import grpc
+        from google.cloud import vision
+
+        if self.rate_limited("vision") is not None:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "injected rate limit")
+        if self.delay_and_fail("vision"):
+            context.abort(grpc.StatusCode.UNAVAILABLE, "injected error")
+        responses = []
+        for item in request.requests:
+            name = self.by_vision_bytes.get(_sha(item.image.content))
+            if name is None:
+                responses.append(vision.AnnotateImageResponse(error={"code": 5, "message": "unknown image"}))
+            else:
+                responses.append(vision_response(self.recordings[name]))
+        return vision.BatchAnnotateImagesResponse(responses=responses)
+
+
+def _openai_handler(engines):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, payload, headers=None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.endswith("/files"):
+                return self._upload(raw)
+            body = json.loads(raw or b"{}")
+            if self.path.endswith("/batches"):
+                batch = engines.create_batch(body)
+                if batch is None:
+                    return self._json(400, {"error": {"message": "unknown input_file_id"}})
+                return self._json(200, batch)
+            if not self.path.endswith("/chat/completions"):
+                return self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+            retry_after = engines.rate_limited("openai")
+            if retry_after is not None:
+                return self._json(429, {"error": {"message": "injected rate limit", "type": "requests",
+                                                  "code": "rate_limit_exceeded"}}, retry_after)
+            if engines.delay_and_fail("openai"):
+                return self._json(503, {"error": {"message": "injected error", "type": "server_error"}})
+            text = engines.gpt_reply(body)
+            if text is None:
+                return self._json(400, {"error": {"message": "no recording for this request"}})
+            if body.get("stream"):
+                return self._stream(body, text)
+            self._json(200, completion(body, text))
+
+        # 🔹 multipart/form-data (file, purpose)
+        def _upload(self, raw):
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw)
+            fields = {part.get_param("name", header="content-disposition"): part
+                      for part in message.iter_parts()}
+            if "file" not in fields:
+                return self._json(400, {"error": {"message": "missing file"}})
+            self._json(200, engines.upload_file(fields["file"].get_payload(decode=True),
+                                                fields["file"].get_filename() or "upload.jsonl",
+                                                fields["purpose"].get_content().strip() if "purpose" in fields
+                                                else "batch"))
+
+        def do_GET(self):
+            parts = self.path.split("?")[0].rstrip("/").split("/")
+            if len(parts) >= 3 and parts[-2] == "batches":
+                batch = engines.retrieve_batch(parts[-1])
+                if batch is not None:
+                    return self._json(200, batch)
+            elif len(parts) >= 4 and parts[-3] == "files" and parts[-1] == "content":
+                data = engines.files.get(parts[-2])
+                if data is not None:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    return self.wfile.write(data)
+            self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        def _stream(self, body, text):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            step = max(1, -(-len(text) // SSE_PIECES))
+            pieces = [{"content": text[i:i + step]} for i in range(0, len(text), step)]
+            for delta in pieces + [{}]:
+                chunk = {"id": "chatcmpl-standin", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": body.get("model", ""),
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None if delta else "stop"}]}
+                self._chunk(f"data: {json.dumps(chunk)}\n\n")
+            self._chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, text):
+            data = text.encode("utf-8")
+            try:
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # 클라이언트가 JSON 객체를 받고 먼저 닫은 경우
+
+    return Handler
+
+
+# ✅ OpenAI 가짜 서버만 시작 (Vision 이 필요 없는 확인용, port 0 이면 빈 포트 → server.server_port)
+def serve_openai(engines, port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), _openai_handler(engines))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ✅ 두 서버 시작 → (openai_server, vision_server)
+def serve(engines, openai_port, vision_port):
+    import grpc
+    from google.cloud import vision
+
+    openai_server = serve_openai(engines, openai_port)
+
+    vision_server = grpc.server(futures.ThreadPoolExecutor(max_workers=16))
+    vision_server.add_generic_rpc_handlers([grpc.method_handlers_generic_handler(VISION_SERVICE, {
+        "BatchAnnotateImages": grpc.unary_unary_rpc_method_handler(
+            engines.annotate,
+            request_deserializer=vision.BatchAnnotateImagesRequest.deserialize,
+            response_serializer=vision.BatchAnnotateImagesResponse.serialize,
+        ),
+    })])
+    vision_server.add_insecure_port(f"127.0.0.1:{vision_port}")
+    vision_server.start()
+    return openai_server, vision_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="recorded OpenAI / Google Vision stand-in server")
+    parser.add_argument("fixtures_dir")
+    parser.add_argument("--openai-port", type=int, default=8000)
+    parser.add_argument("--vision-port", type=int, default=50051)
+    parser.add_argument("--latency", default="", help="엔진별 평균 지연 ms (예: openai=800,vision=250)")
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--error-rate", default="", help="엔진별 오류 비율 (예: openai=0.02)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rate-limit", default="", help="엔진별 429 비율 (예: openai=0.05)")
+    parser.add_argument("--retry-after-ms", type=float, default=500, help="429 응답의 retry-after-ms")
+    parser.add_argument("--batch-polls", type=int, default=2, help="배치가 끝나는 상태 조회 횟수")
+    parser.add_argument("--expire-every", type=int, default=0, help="N 번째 배치마다 expired (0 이면 없음)")
+    args = parser.parse_args()
+
+    engines = StandinEngines(args.fixtures_dir, parse_engine_values(args.latency), args.jitter,
+                             parse_engine_values(args.error_rate), args.seed, args.batch_polls, args.expire_every,
+                             parse_engine_values(args.rate_limit), args.retry_after_ms)
+    servers = serve(engines, args.openai_port, args.vision_port)  # gRPC 서버는 참조가 없어지면 종료되므로 보관
+    print(f"ready {len(engines.recordings)} recordings", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# brand_registry.py
+# ✅ 공용 브랜드 사전 (postprocess / ocr_gcv_gpt / extract_article 에서 함께 사용)
+# - 브랜드 목록은 brands.json 에서 로드 (정식 명칭 + OCR 오타 표기)
+# - 정확히 포함된 표기: Aho-Corasick 오토마톤으로 텍스트를 한 번만 훑어서 찾음
+#   텍스트와 표기 모두 단어 단위로 정규화(" HOKKOH CO LTD ") → 단어 경계에서만 매칭 (TOHKH, THKH123 의 HKH 제외)
+# - 오타 표기: bigram 역색인으로 후보를 좁힌 뒤 편집 거리 확인 (정확 매칭이 없을 때만)
+import json
+import os
+import re
+from collections import Counter, defaultdict, deque
+
+BRANDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "brands.json")
+
+# 이보다 짧은 표기는 오타 매칭 안 함: 5~6자 표기에 거리 1을 허용하면 일반 단어가 걸림
+# (CHARA / OHANA / OMARA → OHARA, KOMONO → KOMON) → 짧은 브랜드는 정확 매칭만
+FUZZY_MIN_LENGTH = 7
+
+WORD_RE = re.compile(r"[A-Z0-9]+")
+
+
+# 표기 길이별 허용 편집 거리
+def fuzzy_radius(length: int) -> int:
+    if length < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if length < 9 else 2
+
+
+def compact(text: str) -> str:
+    return "".join(WORD_RE.findall(text.upper()))
+
+
+# 🔹 단어 경계 매칭용 정규화: 단어 사이 공백 1개 + 양끝 공백
+def _bounded(text: str) -> str:
+    return " " + " ".join(WORD_RE.findall(text.upper())) + " "
+
+
+def levenshtein(a: str, b: str) -> int:
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _bigrams(text: str) -> set:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+# ✅ 편집 거리 근접 검색용 bigram 역색인
+# 편집 1번은 bigram 을 최대 2개까지만 깨뜨리므로, 거리 k 이내인 표기는
+# 검색어 bigram 중 최소 (개수 - 2k) 개를 공유 → 이 조건으로 후보를 먼저 거름
+class NgramIndex:
+    def __init__(self):
+        self._keys = []
+        self._postings = defaultdict(list)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key: str, value):
+        idx = len(self._keys)
+        self._keys.append((key, value))
+        for gram in _bigrams(key):
+            self._postings[gram].append(idx)
+
+    # radius 이내 항목을 (거리, key, value) 로 반환 (가까운 순)
+    def search(self, query: str, radius: int) -> list:
+        grams = _bigrams(query)
+        need = len(grams) - 2 * radius
+        if need > 0:
+            counts = Counter()
+            for gram in grams:
+                counts.update(self._postings.get(gram, ()))
+            candidates = [i for i, c in counts.items() if c >= need]
+        else:
+            candidates = range(len(self._keys))
+
+        found = []
+        for i in candidates:
+            key, value = self._keys[i]
+            if abs(len(key) - len(query)) > radius:
+                continue
+            d = levenshtein(query, key)
+            if d <= radius:
+                found.append((d, key, value))
+        found.sort(key=lambda x: x[0])
+        return found
+
+
+class AhoCorasick:
+    def __init__(self, patterns: dict):
+        # patterns: {패턴 문자열: 값}
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for pattern, value in patterns.items():
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(value)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    # ✅ 텍스트에 포함된 모든 패턴의 값 (한 번의 순회)
+    def find_all(self, text: str) -> list:
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        found = []
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.extend(out[node])
+        return found
+
+
+class BrandRegistry:
+    def __init__(self, brands: list):
+        self.brands = brands
+        self._by_name = {brand["name"]: brand for brand in brands}
+        aliases = {}
+        self._fuzzy = NgramIndex()
+        self._max_words = 1
+        for priority, brand in enumerate(brands):
+            for alias in [brand["name"], *brand.get("aliases", [])]:
+                aliases.setdefault(_bounded(alias), priority)
+                key = compact(alias)
+                if len(key) >= FUZZY_MIN_LENGTH:
+                    self._fuzzy.add(key, priority)
+                    self._max_words = max(self._max_words, len(WORD_RE.findall(alias.upper())))
+        self._exact = AhoCorasick(aliases)
+
+    def _names(self, priorities) -> list:
+        return [self.brands[p]["name"] for p in sorted(set(priorities))]
+
+    # 🔹 텍스트에 단어 단위로 포함된 브랜드 (우선순위 순)
+    def find_exact(self, text: str) -> list:
+        return self._names(self._exact.find_all(_bounded(text)))
+
+    # 🔹 오타 포함 브랜드: 단어 1~N개 묶음을 붙여 쓴 형태로 근접 검색
+    def find_fuzzy(self, text: str) -> list:
+        words = WORD_RE.findall(text.upper())
+        seen = set()
+        best = {}  # 브랜드 우선순위 → 가장 가까운 거리
+        for i in range(len(words)):
+            window = ""
+            for word in words[i:i + self._max_words]:
+                window += word
+                if window in seen or len(window) < FUZZY_MIN_LENGTH:
+                    continue
+                seen.add(window)
+                # 허용 거리는 사전 표기 길이 기준 (검색어보다 최대 2자 긴 표기까지 고려)
+                for d, key, priority in self._fuzzy.search(window, fuzzy_radius(len(window) + 2)):
+                    if d <= fuzzy_radius(len(key)) and d < best.get(priority, d + 1):
+                        best[priority] = d
+        return [self.brands[p]["name"] for p in sorted(best, key=lambda p: (best[p], p))]
+
+    def find(self, text: str, fuzzy=True) -> list:
+        found = self.find_exact(text)
+        if not found and fuzzy:
+            found = self.find_fuzzy(text)
+        return found
+
+    # ✅ 브랜드별 레이아웃 템플릿 (라벨 표기 / 품번 영역 / 품번 형식, layout_ocr.py 에서 사용)
+    def layout_template(self, company: str) -> dict:
+        brand = self._by_name.get(company) or self._by_name.get(self.normalize(company))
+        return (brand or {}).get("layout", {})
+
+    # ✅ 브랜드명 1개 → 정식 명칭 (사전에 없으면 None)
+    def normalize(self, name: str):
+        found = self.find(name or "")
+        return found[0] if found else None
+
+
+def load_registry(path=BRANDS_PATH) -> BrandRegistry:
+    with open(path, encoding="utf-8") as f:
+        return BrandRegistry(json.load(f)["brands"])
+
+
+_registry = None
+
+
+# 빌드 시점 스냅샷(precomputed.py)이 brands.json 과 일치하면 그대로 사용
+def get_registry() -> BrandRegistry:
+    global _registry
+    if _registry is None:
+        from precomputed import load_snapshot
+        _registry = load_snapshot("brands", BRANDS_PATH, __file__) or load_registry()
+    return _registry
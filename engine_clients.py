@@ -0,0 +1,166 @@
+# engine_clients.py
+# ✅ OCR 엔진 클라이언트 레지스트리 (Google Vision / OpenAI)
+# - 처음 사용할 때 한 번만 생성 (import 시점에 인증/채널 생성 X)
+# - 여러 스레드가 같은 클라이언트(연결 풀, keep-alive)를 공유
+# - 엔진별 동시 요청 수 제한
+# - 환경변수 또는 register_client_factory() 로 로컬 가짜 서버에 연결해 테스트 가능
+#     VISION_API_ENDPOINT=localhost:50051 (gRPC, 인증 없음)
+#     OPENAI_BASE_URL=http://localhost:8000/v1
+import asyncio
+import os
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+# 엔진별 최대 동시 요청 수 (각 엔진의 rate limit 에 맞춰 조정)
+ENGINE_CONCURRENCY = {
+    "vision": int(os.environ.get("VISION_MAX_CONCURRENCY", 8)),
+    "openai": int(os.environ.get("OPENAI_MAX_CONCURRENCY", 8)),
+    "tesseract": int(os.environ.get("TESSERACT_MAX_CONCURRENCY", os.cpu_count() or 2)),
+}
+
+# OpenAI HTTP 연결 풀 설정
+OPENAI_POOL = {"max_connections": 20, "max_keepalive_connections": 10, "keepalive_expiry": 60.0}
+OPENAI_TIMEOUT = 60.0
+
+# gRPC keep-alive 설정
+VISION_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+]
+
+
+def _create_vision_client():
+    from google.cloud import vision
+    from google.cloud.vision_v1.services.image_annotator.transports import ImageAnnotatorGrpcTransport
+
+    endpoint = os.environ.get("VISION_API_ENDPOINT")
+    if endpoint:
+        # 🔹 로컬 가짜 gRPC 서버 (TLS / 인증 없음)
+        import grpc
+        channel = grpc.insecure_channel(endpoint, options=VISION_CHANNEL_OPTIONS)
+        return vision.ImageAnnotatorClient(transport=ImageAnnotatorGrpcTransport(channel=channel))
+
+    channel = ImageAnnotatorGrpcTransport.create_channel(options=VISION_CHANNEL_OPTIONS)
+    return vision.ImageAnnotatorClient(transport=ImageAnnotatorGrpcTransport(channel=channel))
+
+
+def _create_openai_client():
+    import httpx
+    import openai
+
+    limits = httpx.Limits(**OPENAI_POOL)
+    return openai.OpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        base_url=os.environ.get("OPENAI_BASE_URL") or None,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=0,  # 재시도는 request_scheduler 가 담당
+        http_client=httpx.Client(limits=limits, timeout=OPENAI_TIMEOUT),
+    )
+
+
+def _create_async_openai_client():
+    import httpx
+    import openai
+
+    limits = httpx.Limits(**OPENAI_POOL)
+    return openai.AsyncOpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        base_url=os.environ.get("OPENAI_BASE_URL") or None,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=0,
+        http_client=httpx.AsyncClient(limits=limits, timeout=OPENAI_TIMEOUT),
+    )
+
+
+_factories = {
+    "vision": _create_vision_client,
+    "openai": _create_openai_client,
+}
+_async_factories = {
+    "openai": _create_async_openai_client,
+}
+_clients = {}
+_semaphores = {}
+_lock = threading.Lock()
+
+# async 클라이언트/세마포어는 이벤트 루프에 묶이므로 루프별로 보관
+_async_clients = weakref.WeakKeyDictionary()
+_async_semaphores = weakref.WeakKeyDictionary()
+
+
+# ✅ 테스트/로컬 환경에서 클라이언트 생성 방식 교체 (예: 가짜 클라이언트 주입)
+def register_client_factory(name: str, factory, is_async=False):
+    with _lock:
+        if is_async:
+            _async_factories[name] = factory
+            for clients in _async_clients.values():
+                clients.pop(name, None)
+        else:
+            _factories[name] = factory
+            _clients.pop(name, None)
+
+
+# ✅ 생성된 클라이언트 폐기 (다음 get_client 때 다시 생성)
+def reset_clients():
+    with _lock:
+        _clients.clear()
+        _semaphores.clear()
+        _async_clients.clear()
+        _async_semaphores.clear()
+
+
+def get_client(name: str):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _factories[name]()
+                _clients[name] = client
+    return client
+
+
+def get_vision_client():
+    return get_client("vision")
+
+
+def get_openai_client():
+    return get_client("openai")
+
+
+# ✅ 엔진별 동시 요청 수 제한
+@contextmanager
+def engine_slot(name: str):
+    with _lock:
+        semaphore = _semaphores.get(name)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(ENGINE_CONCURRENCY.get(name, 4))
+            _semaphores[name] = semaphore
+    with semaphore:
+        yield
+
+
+# ✅ 현재 이벤트 루프용 async 클라이언트
+def get_async_client(name: str):
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    if name not in clients:
+        clients[name] = _async_factories[name]()
+    return clients[name]
+
+
+def get_async_openai_client():
+    return get_async_client("openai")
+
+
+# ✅ engine_slot 의 asyncio 버전 (스레드 대신 코루틴 수천 개가 대기 가능)
+@asynccontextmanager
+async def async_engine_slot(name: str):
+    loop = asyncio.get_running_loop()
+    semaphores = _async_semaphores.setdefault(loop, {})
+    if name not in semaphores:
+        semaphores[name] = asyncio.Semaphore(ENGINE_CONCURRENCY.get(name, 4))
+    async with semaphores[name]:
+        yield
@@ -0,0 +1,97 @@
+# engine_fanout.py
+# ✅ 이미지 1장에 대해 독립적인 OCR 엔진(GPT / Google Vision / Tesseract)을 동시에 실행 (engines.py 파이프라인 단계 단위)
+import asyncio
+import concurrent.futures
+import contextvars
+import time
+
+from telemetry import record
+
+# ✅ 기본 정책
+# - timeouts: 엔진별 최대 대기 시간(초)
+# - required: 반드시 기다려야 하는 엔진
+# - grace_ms: required 엔진이 끝난 뒤 나머지 엔진을 추가로 기다리는 시간(ms)
+#   (예: GPT + Google 이 끝났는데 Tesseract 가 1.5초 안에 안 끝나면 그대로 진행)
+FANOUT_POLICY = {
+    "timeouts": {"gpt": 60.0, "google": 20.0, "tesseract": 20.0, "gpt_text": 60.0},
+    "required": ["gpt", "google"],
+    "grace_ms": 1500,
+}
+
+# 여러 Streamlit 워커가 공유하는 엔진 실행 풀
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="ocr-engine")
+
+
+# 🔹 결과에서 빠진 엔진 (타임아웃 포함) 을 엔진별 오류로 기록
+def _record_errors(errors):
+    for name, e in errors.items():
+        record(f"fanout.{name}", error=type(e).__name__, error_message=str(e)[:200])
+
+
+# ✅ tasks: {엔진명: 인자 없는 callable} → (results, errors)
+# 시간 내에 끝나지 않았거나 실패한 엔진은 results 에서 빠지고 errors 에 예외로 기록됨
+def run_engines(tasks: dict, policy: dict = None):
+    policy = {**FANOUT_POLICY, **(policy or {})}
+    timeouts = policy["timeouts"]
+    required = set(policy["required"]) & set(tasks)
+
+    start = time.monotonic()
+    # 요청 우선순위 등 컨텍스트 변수를 엔진 스레드로 전달
+    futures = {name: _executor.submit(contextvars.copy_context().run, fn) for name, fn in tasks.items()}
+    deadlines = {name: start + timeouts.get(name, 30.0) for name in tasks}
+
+    # 🔹 required 엔진은 각자의 타임아웃까지 기다림
+    for name in required:
+        remaining = deadlines[name] - time.monotonic()
+        concurrent.futures.wait([futures[name]], timeout=max(remaining, 0))
+
+    # 🔹 나머지 엔진은 grace 시간(또는 자체 타임아웃) 안에 끝난 것만 사용
+    grace_deadline = time.monotonic() + policy["grace_ms"] / 1000.0
+    for name in set(tasks) - required:
+        remaining = min(deadlines[name], grace_deadline) - time.monotonic()
+        concurrent.futures.wait([futures[name]], timeout=max(remaining, 0))
+
+    results, errors = {}, {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            errors[name] = TimeoutError(f"{name} OCR timed out")
+            continue
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors[name] = e
+    _record_errors(errors)
+    return results, errors
+
+
+# ✅ run_engines 의 asyncio 버전: tasks = {엔진명: 인자 없는 coroutine 함수}
+async def run_engines_async(tasks: dict, policy: dict = None):
+    policy = {**FANOUT_POLICY, **(policy or {})}
+    timeouts = policy["timeouts"]
+    required = set(policy["required"]) & set(tasks)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    pending = {name: asyncio.ensure_future(fn()) for name, fn in tasks.items()}
+    deadlines = {name: start + timeouts.get(name, 30.0) for name in tasks}
+
+    for name in required:
+        await asyncio.wait([pending[name]], timeout=max(deadlines[name] - loop.time(), 0))
+
+    grace_deadline = loop.time() + policy["grace_ms"] / 1000.0
+    for name in set(tasks) - required:
+        remaining = min(deadlines[name], grace_deadline) - loop.time()
+        await asyncio.wait([pending[name]], timeout=max(remaining, 0))
+
+    results, errors = {}, {}
+    for name, task in pending.items():
+        if not task.done() or task.cancelled():
+            task.cancel()
+            errors[name] = TimeoutError(f"{name} OCR timed out")
+        elif task.exception() is not None:
+            errors[name] = task.exception()
+        else:
+            results[name] = task.result()
+    _record_errors(errors)
+    return results, errors
@@ -0,0 +1,404 @@
+# engines.py
+# ✅ OCR 엔진 레지스트리 + 선언형 파이프라인
+# - 엔진: ocr(image, results) → EngineResult (원문 text, 요청 토큰 추정 tokens, 단어 위치 boxes, 소요 시간 ms)
+#   results 는 앞 단계 엔진 결과 (예: gpt_text 는 google 원문을 입력으로 사용)
+# - 엔진 원문은 모두 OCR 캐시 경유 (캐시 키는 기존과 동일), API 클라이언트는 engine_clients 에서 첫 호출 때 생성
+# - 파이프라인(PIPELINES): 단계 목록. 단계마다 동시에 실행할 엔진(engine_fanout) + 결과 통합 방식(fuse)
+#     score  GPT 품번 + 엔진별 후보 + Vision 라벨 옆 품번 → score_articles → 최종 필터 (항상 결과 반환)
+#     rules  GPT 없이 브랜드 사전 + 정규식(extract_article) → 점수가 기준 이상일 때만 결과, 아니면 다음 단계
+#     no_text  Vision 원문이 비어 있으면 GPT 호출 없이 N/A 결과로 종료, 아니면 다음 단계
+#   브랜드 정규화 / 품번 검증은 모든 파이프라인이 postprocess(brands.json / article_rules.json) 하나를 사용
+# - 요청별 파이프라인 선택(select_pipeline): 이미지당 토큰 / 지연 목표를 만족하는 것 중 ROUTING_POLICY 우선순위
+#   지연 추정은 telemetry 에 쌓인 엔진별 p50 (표본이 적으면 엔진 기본값)
+import time
+from abc import ABC, abstractmethod
+
+from engine_fanout import run_engines, run_engines_async
+from extract_article import extract_article_and_brand
+from gpt_vision_ocr import (GPT_MAX_TOKENS, GPT_PROMPT_TEXT, PROMPT_VERSION, _gpt_request_tokens,
+                            cached_tesseract_ocr, cached_tesseract_ocr_async, fuse_engine_results,
+                            google_vision_layout, google_vision_layout_async, gpt_cache_model, gpt_vision_ocr,
+                            gpt_vision_ocr_async)
+from layout_ocr import extract_anchored_articles, loads_layout
+from ocr_cache import cached_call, cached_call_async
+from ocr_gcv_gpt import gpt_text_ocr, gpt_text_ocr_async, gpt_text_request_tokens
+from postprocess import filter_scored_articles, score_articles
+from prepared_image import as_prepared
+from telemetry import get_metrics, mark_error, traced
+
+# ✅ 파이프라인 정의
+# - engines: 단계 안에서 동시에 실행할 엔진 (이미 결과가 있는 엔진은 건너뜀)
+# - required: 기다릴 엔진 (없으면 engine_fanout 의 FANOUT_POLICY / 호출자 fanout_policy)
+# - fuse: 단계가 끝난 뒤 결과 통합 (없으면 다음 단계로), tier: 결과에 기록할 종료 단계 이름
+# - sources: score 에 품번 후보를 내는 엔진 (없으면 결과가 있는 엔진 전부)
+# - critical: 실패하면 이미지 전체를 [ERROR] 로 처리할 엔진
+PIPELINES = {
+    # GPT-4o 이미지 + Vision + Tesseract 동시 실행 → 통합 스코어링 (정확도 우선, 이미지 토큰 비용)
+    "vision": {
+        "stages": [{"engines": ["gpt", "google", "tesseract"], "fuse": "score"}],
+        "critical": ["gpt"],
+    },
+    # Vision 원문 → GPT-4o 텍스트 분석 (이미지 토큰 없음, Vision 과 GPT 가 순서대로 실행)
+    "text": {
+        "stages": [
+            {"engines": ["google"], "required": ["google"], "fuse": "no_text"},
+            # Vision 원문의 후보 토큰은 이미 GPT 입력이므로 GPT 가 고른 품번만 점수화 (잡음 토큰 제외)
+            {"engines": ["gpt_text"], "required": ["gpt_text"], "fuse": "score", "sources": ["gpt_text"]},
+        ],
+        "critical": ["google", "gpt_text"],
+    },
+    # 저렴한 엔진부터 실행하고 브랜드 + 품번이 확실하면 거기서 종료
+    "cascade": {
+        "stages": [
+            {"engines": ["tesseract"], "required": ["tesseract"], "fuse": "rules", "tier": "tesseract"},
+            {"engines": ["google"], "required": ["google"], "fuse": "rules", "tier": "vision"},
+            {"engines": ["gpt"], "required": ["gpt"], "fuse": "score", "tier": "gpt"},
+        ],
+        "critical": ["gpt"],
+    },
+}
+DEFAULT_PIPELINE = "vision"
+
+# ✅ cascade 모드 정책 (rules 단계 종료 기준)
+# - thresholds: 단계(tier)별로 종료하기 위한 최상위 품번 점수(score_articles) 하한
+#     tesseract 단독 최대 5점 (Tesseract 2 + 길이/구분자/영문 각 1)
+#     vision 단계는 Google 3 + Tesseract 2 → 두 엔진이 일치하면 6점 이상
+# - 두 단계 모두 브랜드 사전에 있는 브랜드가 보여야 종료 (없으면 GPT 까지 진행)
+CASCADE_POLICY = {
+    "thresholds": {"tesseract": 5, "vision": 6},
+}
+
+# ✅ 요청별 파이프라인 선택 정책
+# - candidates: 목표를 만족하는 것 중 앞쪽 파이프라인 사용 (정확도 순), 만족하는 것이 없으면 토큰이 가장 적은 것
+# - vision_text_chars: text 경로 토큰 추정에 쓰는 Vision 원문 길이 (라벨 1장 평균)
+# - min_samples: 계측 p50 을 지연 추정에 쓰기 위한 최소 표본 수
+ROUTING_POLICY = {
+    "candidates": ["vision", "text"],
+    "vision_text_chars": 400,
+    "min_samples": 20,
+}
+
+
+# ✅ 엔진 1회 실행 결과
+# boxes: [[단어, x0, y0, x1, y1], ...] (size 좌표계, 단어 위치를 주는 엔진만)
+# tokens: 이 요청의 LLM 토큰 추정치 (TPM 한도 계산과 같은 값, LLM 이 아닌 엔진은 0)
+class EngineResult:
+    def __init__(self, engine: str, text: str = "", tokens: int = 0, boxes=None, size=None, ms: float = 0.0):
+        self.engine = engine
+        self.text = text or ""
+        self.tokens = tokens
+        self.boxes = boxes or []
+        self.size = size
+        self.ms = ms
+
+    # layout_ocr 형식 {"text", "words", "size"}
+    def layout(self) -> dict:
+        return {"text": self.text, "words": self.boxes, "size": list(self.size or (1, 1))}
+
+    def __repr__(self):
+        return f"EngineResult({self.engine!r}, {len(self.text)} chars, tokens={self.tokens}, {self.ms:.1f}ms)"
+
+
+# ✅ 엔진 인터페이스 (ocr / ocr_async 를 모두 구현해야 인스턴스 생성 가능)
+class Engine(ABC):
+    name = ""
+    stage = ""            # OCR 캐시 / telemetry 단계 이름 (지연 추정에 사용)
+    default_ms = 1000.0   # 계측 표본이 부족할 때 쓰는 지연 추정치
+
+    @abstractmethod
+    def ocr(self, image, results) -> EngineResult:
+        ...
+
+    @abstractmethod
+    async def ocr_async(self, image, results) -> EngineResult:
+        ...
+
+    # 🔹 요청 1건의 토큰 추정 (파이프라인 선택용, LLM 이 아닌 엔진은 0)
+    def estimate_tokens(self, image) -> int:
+        return 0
+
+
+class TesseractEngine(Engine):
+    name = "tesseract"
+    stage = "tesseract"
+    default_ms = 1500.0
+
+    def ocr(self, image, results):
+        return EngineResult(self.name, cached_tesseract_ocr(image))
+
+    async def ocr_async(self, image, results):
+        return EngineResult(self.name, await cached_tesseract_ocr_async(image))
+
+
+# 🔹 Google Vision text_detection + 단어 위치 (다른 워커 요청과 묶어서 전송, vision_batcher)
+class VisionLayoutEngine(Engine):
+    name = "google"
+    stage = "google_vision_layout"
+    default_ms = 800.0
+
+    def _model(self, image):
+        return f"text_detection|{image.policy_key('vision')}"
+
+    def _result(self, raw):
+        layout = loads_layout(raw)
+        return EngineResult(self.name, layout["text"], boxes=layout["words"], size=layout["size"])
+
+    def ocr(self, image, results):
+        return self._result(cached_call(image.content_hash, self.stage, lambda: google_vision_layout(image),
+                                        model=self._model(image), alias=image.cache_alias))
+
+    async def ocr_async(self, image, results):
+        return self._result(await cached_call_async(image.content_hash, self.stage,
+                                                    lambda: google_vision_layout_async(image),
+                                                    model=self._model(image), alias=image.cache_alias))
+
+
+# 🔹 GPT-4o 이미지 입력 (응답 원문: ARTICLE_SCHEMA JSON)
+class GPTVisionEngine(Engine):
+    name = "gpt"
+    stage = "gpt_vision_ocr"
+    default_ms = 4000.0
+
+    def estimate_tokens(self, image):
+        return _gpt_request_tokens(image, GPT_PROMPT_TEXT, GPT_MAX_TOKENS)
+
+    def ocr(self, image, results):
+        text = cached_call(image.content_hash, self.stage, lambda: gpt_vision_ocr(image, GPT_PROMPT_TEXT),
+                           PROMPT_VERSION, gpt_cache_model(image), alias=image.cache_alias)
+        return EngineResult(self.name, text, tokens=self.estimate_tokens(image))
+
+    async def ocr_async(self, image, results):
+        text = await cached_call_async(image.content_hash, self.stage,
+                                       lambda: gpt_vision_ocr_async(image, GPT_PROMPT_TEXT),
+                                       PROMPT_VERSION, gpt_cache_model(image), alias=image.cache_alias)
+        return EngineResult(self.name, text, tokens=self.estimate_tokens(image))
+
+
+# 🔹 Vision 원문 → GPT-4o 텍스트 입력 (google 결과 필요, 읽힌 글자가 없으면 호출 생략)
+class GPTTextEngine(Engine):
+    name = "gpt_text"
+    stage = "gcv_text_gpt"
+    default_ms = 2000.0
+
+    def estimate_tokens(self, image):
+        return gpt_text_request_tokens("x" * ROUTING_POLICY["vision_text_chars"])
+
+    def ocr(self, image, results):
+        raw_text = results["google"].text
+        if not raw_text.strip():
+            return EngineResult(self.name)
+        return EngineResult(self.name, gpt_text_ocr(raw_text), tokens=gpt_text_request_tokens(raw_text))
+
+    async def ocr_async(self, image, results):
+        raw_text = results["google"].text
+        if not raw_text.strip():
+            return EngineResult(self.name)
+        return EngineResult(self.name, await gpt_text_ocr_async(raw_text), tokens=gpt_text_request_tokens(raw_text))
+
+
+_engines = {engine.name: engine for engine in (TesseractEngine(), VisionLayoutEngine(), GPTVisionEngine(),
+                                                 GPTTextEngine())}
+
+
+# ✅ 엔진 추가 / 교체 (예: 다른 OCR 서비스, 테스트용 가짜 엔진) → PIPELINES 에서 이름으로 사용
+def register_engine(engine: Engine):
+    _engines[engine.name] = engine
+
+
+def get_engine(name: str) -> Engine:
+    return _engines[name]
+
+
+# ✅ 엔진 1개 실행 (소요 시간 기록)
+def run_engine(name: str, image, results=None) -> EngineResult:
+    start = time.perf_counter()
+    result = get_engine(name).ocr(as_prepared(image), results or {})
+    result.ms = (time.perf_counter() - start) * 1000
+    return result
+
+
+async def run_engine_async(name: str, image, results=None) -> EngineResult:
+    start = time.perf_counter()
+    result = await get_engine(name).ocr_async(as_prepared(image), results or {})
+    result.ms = (time.perf_counter() - start) * 1000
+    return result
+
+
+# ✅ 결과 통합: (image, results, stage, policy) → 결과 dict 또는 None (다음 단계로)
+def _fuse_score(image, results, stage, policy):
+    sources = stage.get("sources") or list(results)
+    gpt = results.get("gpt") or results.get("gpt_text")
+    google = results.get("google") if "google" in sources else None
+    tesseract = results.get("tesseract") if "tesseract" in sources else None
+    return fuse_engine_results(
+        gpt.text if gpt else None,
+        google.layout() if google else loads_layout(None),
+        tesseract.text if tesseract else "",
+        image.size,
+    )
+
+
+def _merge_brands(*brand_lists):
+    merged = []
+    for brands in brand_lists:
+        merged += [b for b in brands if b not in merged]
+    return merged
+
+
+# 🔹 브랜드가 확인되고 최상위 품번 점수가 threshold 이상일 때만 결과 (Vision 결과가 있으면 Tesseract 와 교차 확인)
+def _fuse_rules(image, results, stage, policy):
+    google, tesseract = results.get("google"), results.get("tesseract")
+    google_info = extract_article_and_brand(google.text.upper()) if google else {"brands": [], "articles": None}
+    tesseract_info = extract_article_and_brand(tesseract.text.upper()) if tesseract else {"brands": [], "articles": None}
+    brands = _merge_brands(google_info["brands"], tesseract_info["brands"])
+    if not brands:
+        return None
+    company = brands[0]
+    layout_articles = extract_anchored_articles(google.layout(), company, image.size) if google else None
+    scored = score_articles([], google_info["articles"], tesseract_info["articles"], layout_articles)
+    filtered = filter_scored_articles(scored, company)
+    if filtered == ["N/A"] or dict(scored)[filtered[0]] < policy["thresholds"][stage["tier"]]:
+        return None
+    return {"company": company, "article_numbers": filtered, "used_fallback": False}
+
+
+# 🔹 Vision 이 글자를 못 찾으면 빈 원문으로 GPT 를 부르거나 fallback 파싱으로 넘기지 않고 N/A (기존 ocr_gcv_gpt 와 같음)
+def _fuse_no_text(image, results, stage, policy):
+    google = results.get("google")
+    if google and google.text.strip():
+        return None
+    return {"company": "N/A", "article_numbers": ["N/A"], "used_fallback": False}
+
+
+FUSIONS = {
+    "score": _fuse_score,
+    "rules": _fuse_rules,
+    "no_text": _fuse_no_text,
+}
+
+
+def _stage_tasks(image, stage, results, run):
+    return {name: (lambda name=name: run(name, image, results)) for name in stage["engines"] if name not in results}
+
+
+def _stage_policy(stage, fanout_policy):
+    return {**(fanout_policy or {}), **({"required": stage["required"]} if "required" in stage else {})}
+
+
+# 🔹 단계 결과 처리: critical 엔진 실패는 예외, fuse 결과가 있으면 (tier 를 붙여) 반환
+def _finish_stage(image, spec, stage, results, errors, policy):
+    for name in spec.get("critical", []):
+        if name in errors:
+            raise errors[name]
+    if "fuse" not in stage:
+        return None
+    result = FUSIONS[stage["fuse"]](image, results, stage, policy)
+    if result is not None and stage.get("tier"):
+        result["tier"] = stage["tier"]
+    return result
+
+
+# gpt_text: 이미 받은 GPT 원문 (gpt_tiling 묶음 요청 등) → 주어지면 gpt 엔진 호출 생략
+def _initial_results(gpt_text):
+    return {} if gpt_text is None else {"gpt": EngineResult("gpt", gpt_text)}
+
+
+# ✅ 파이프라인 실행 → {"company", "article_numbers", "used_fallback", "pipeline"[, "tier"]}
+def run_pipeline(image, pipeline: str = DEFAULT_PIPELINE, fanout_policy=None, cascade_policy=None,
+                 gpt_text=None) -> dict:
+    image = as_prepared(image)
+    spec = PIPELINES[pipeline]
+    policy = {**CASCADE_POLICY, **(cascade_policy or {})}
+    results = _initial_results(gpt_text)
+    for stage in spec["stages"]:
+        tasks = _stage_tasks(image, stage, results, run_engine)
+        done, errors = run_engines(tasks, _stage_policy(stage, fanout_policy)) if tasks else ({}, {})
+        results.update(done)
+        result = _finish_stage(image, spec, stage, results, errors, policy)
+        if result is not None:
+            return {**result, "pipeline": pipeline}
+    raise ValueError(f"pipeline {pipeline!r} ended without a fuse stage")
+
+
+async def run_pipeline_async(image, pipeline: str = DEFAULT_PIPELINE, fanout_policy=None, cascade_policy=None,
+                             gpt_text=None) -> dict:
+    image = as_prepared(image)
+    spec = PIPELINES[pipeline]
+    policy = {**CASCADE_POLICY, **(cascade_policy or {})}
+    results = _initial_results(gpt_text)
+    for stage in spec["stages"]:
+        tasks = _stage_tasks(image, stage, results, run_engine_async)
+        done, errors = await run_engines_async(tasks, _stage_policy(stage, fanout_policy)) if tasks else ({}, {})
+        results.update(done)
+        result = _finish_stage(image, spec, stage, results, errors, policy)
+        if result is not None:
+            return {**result, "pipeline": pipeline}
+    raise ValueError(f"pipeline {pipeline!r} ended without a fuse stage")
+
+
+# ✅ 엔진별 지연 추정 (ms): telemetry 단계별 p50, 표본이 적으면 엔진 기본값
+def engine_latencies() -> dict:
+    observed = {row["stage"]: row for row in get_metrics().summary()}
+    latencies = {}
+    for name, engine in _engines.items():
+        row = observed.get(engine.stage)
+        if row and row["p50_ms"] is not None and row["count"] >= ROUTING_POLICY["min_samples"]:
+            latencies[name] = row["p50_ms"]
+        else:
+            latencies[name] = engine.default_ms
+    return latencies
+
+
+# 🔹 파이프라인 1건 예상 (요청 토큰, 지연 ms): 단계 안은 동시 실행(최대값), 단계끼리는 순서대로(합)
+# 조기 종료하는 파이프라인(cascade)은 모든 단계를 실행하는 최악의 경우
+def estimate_pipeline(image, pipeline: str, latencies=None):
+    latencies = latencies or engine_latencies()
+    tokens, ms = 0, 0.0
+    for stage in PIPELINES[pipeline]["stages"]:
+        tokens += sum(get_engine(name).estimate_tokens(image) for name in stage["engines"])
+        ms += max(latencies[name] for name in stage["engines"])
+    return tokens, ms
+
+
+# ✅ 요청별 파이프라인 선택
+# targets: {"max_tokens": 이미지당 요청 토큰 상한, "max_latency_ms": 이미지당 지연 상한} (없으면 DEFAULT_PIPELINE)
+def select_pipeline(image, targets: dict = None) -> str:
+    if not targets:
+        return DEFAULT_PIPELINE
+    image = as_prepared(image)
+    latencies = engine_latencies()
+    estimates = {name: estimate_pipeline(image, name, latencies) for name in ROUTING_POLICY["candidates"]}
+    for name, (tokens, ms) in estimates.items():
+        if tokens <= targets.get("max_tokens", float("inf")) and ms <= targets.get("max_latency_ms", float("inf")):
+            return name
+    return min(estimates, key=lambda name: estimates[name][0])
+
+
+def _error_result(e):
+    return {"company": "[ERROR]", "article_numbers": [f"[ERROR] {str(e)}"], "used_fallback": True}
+
+
+# ✅ 이미지 1장 → 결과 (pipeline 이 없으면 targets 로 선택, 실패하면 [ERROR] 결과)
+@traced("extract")
+def extract_info(image, pipeline: str = None, targets: dict = None, fanout_policy=None, cascade_policy=None,
+                 gpt_text=None) -> dict:
+    try:
+        image = as_prepared(image)
+        return run_pipeline(image, pipeline or select_pipeline(image, targets), fanout_policy, cascade_policy,
+                            gpt_text)
+    except Exception as e:
+        mark_error(e)
+        return _error_result(e)
+
+
+# ✅ extract_info 의 asyncio 버전 (스레드 없이 수백 장을 동시에 처리)
+@traced("extract")
+async def extract_info_async(image, pipeline: str = None, targets: dict = None, fanout_policy=None,
+                             cascade_policy=None, gpt_text=None) -> dict:
+    try:
+        image = as_prepared(image)
+        return await run_pipeline_async(image, pipeline or select_pipeline(image, targets), fanout_policy,
+                                        cascade_policy, gpt_text)
+    except Exception as e:
+        mark_error(e)
+        return _error_result(e)
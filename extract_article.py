@@ -1,20 +1,6 @@
 import re
 
-# 사전에 수집한 브랜드명 (대소문자 무관 매칭)
-KNOWN_BRANDS = {
-    "KOMON KOBO",
-    "ALLBLUE Inc.",
-    "MATSUBARA CO.,LTD.",
-    "COSMO TEXTILE",
-    "AGUNINO",
-    "HKK",
-    "HK TEXTILE",
-    "UNI TEXTILE",
-    "OHARAYA",
-    "ROCK'N ROLL",
-    "JAPAN BLUE",
-    "TAKISADA KOREA",
-}
+from brand_registry import get_registry
 
 # 불필요 키워드 제거용
 EXCLUDE_KEYWORDS = {
@@ -26,13 +12,9 @@ EXCLUDE_KEYWORDS = {
     "C/", "C#", "CODE", "E-MAIL", "INFO", "MM", "CM", "M", "G/M", "GSM", "MADE IN", "㈱"
 }
 
-# 브랜드명 추출 함수
+# 브랜드명 추출 함수 (공용 브랜드 사전: brands.json, 오타 포함)
 def extract_brands(text: str):
-    found_brands = []
-    for brand in KNOWN_BRANDS:
-        if brand.lower() in text.lower():
-            found_brands.append(brand)
-    return found_brands
+    return get_registry().find(text)
 
 # 아티클 번호 추출 함수
 def extract_article_numbers(text: str):
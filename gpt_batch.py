@@ -0,0 +1,236 @@
+# gpt_batch.py
+# ✅ OpenAI Batch API 모드 (야간 대량 처리용: 요금 50% 할인, 동기 호출과 별도 한도라 낮 시간 화면 요청에 영향 없음)
+# - 이미지별 GPT-4o 요청을 JSONL 배치 파일로 묶어 업로드 → 배치 생성 → 끝날 때까지 polling
+# - 결과를 custom_id(이미지 content_hash) 로 매칭해서 OCR 캐시에 GPT 원문으로 저장
+#   → 이어서 실행하는 일반 파이프라인이 캐시된 원문으로 parse_gpt_response → score_articles 수행 (GPT 동기 호출 없음)
+# - 실패/만료된 요청은 캐시에 없으므로 일반 파이프라인에서 동기 호출로 처리됨
+# - 전송은 BatchTransport 로 분리 (OPENAI_BASE_URL 로 로컬 가짜 서버 연결 또는 다른 구현으로 교체)
+# - 제출한 배치 id 는 상태 파일에 기록 → 중간에 죽어도 다시 실행하면 재제출 없이 이어서 polling
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+
+from engine_clients import get_openai_client
+from gpt_vision_ocr import GPT_PROMPT_TEXT, PROMPT_VERSION, gpt_cache_model, gpt_request_body
+from ocr_cache import get_cache
+from prepared_image import PreparedImage
+from request_scheduler import scheduled_call
+from telemetry import record
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+BATCH_MAX_REQUESTS = 50000               # 배치 1개당 요청 수 한도
+BATCH_MAX_BYTES = 190 * 1024 * 1024      # 업로드 파일 한도(200MB)보다 약간 작게
+POLL_INTERVAL = 60.0
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+# ✅ 배치 전송 인터페이스 (파일 업로드 / 배치 생성 / 상태 조회 / 결과 다운로드)
+class BatchTransport(ABC):
+    @abstractmethod
+    def upload(self, path: str) -> str:
+        ...
+
+    @abstractmethod
+    def create(self, input_file_id: str, metadata: dict = None) -> str:
+        ...
+
+    # {"id", "status", "output_file_id", "error_file_id", "request_counts", ...}
+    @abstractmethod
+    def retrieve(self, batch_id: str) -> dict:
+        ...
+
+    @abstractmethod
+    def download(self, file_id: str) -> bytes:
+        ...
+
+
+# ✅ OpenAI Files / Batches API (engine_clients 의 공용 클라이언트, 재시도는 request_scheduler)
+class OpenAIBatchTransport(BatchTransport):
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client or get_openai_client()
+
+    def upload(self, path):
+        def call():
+            with open(path, "rb") as f:
+                return self.client.files.create(file=f, purpose="batch")
+        return scheduled_call("openai", call, attrs={"op": "files.create", "bytes": os.path.getsize(path)}).id
+
+    def create(self, input_file_id, metadata=None):
+        return scheduled_call("openai", lambda: self.client.batches.create(
+            input_file_id=input_file_id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+            metadata=metadata or None,
+        ), attrs={"op": "batches.create"}).id
+
+    def retrieve(self, batch_id):
+        return scheduled_call("openai", lambda: self.client.batches.retrieve(batch_id),
+                              attrs={"op": "batches.retrieve"}).model_dump()
+
+    def download(self, file_id):
+        return scheduled_call("openai", lambda: self.client.files.content(file_id),
+                              attrs={"op": "files.content"}).read()
+
+
+# ✅ 이미지 1장 → 배치 JSONL 한 줄 (본문은 동기 호출과 동일)
+def batch_request_line(image: PreparedImage, prompt_text: str = GPT_PROMPT_TEXT) -> dict:
+    return {
+        "custom_id": image.content_hash,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": gpt_request_body(image, prompt_text),
+    }
+
+
+# ✅ 요청 줄 → 한도에 맞게 나눈 JSONL 파일 경로 목록 (파일에 바로 기록, 메모리에 모으지 않음)
+def write_batch_files(lines, directory: str) -> list:
+    paths = []
+    f = None
+    count = size = 0
+    for line in lines:
+        data = (json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        if f is None or count >= BATCH_MAX_REQUESTS or size + len(data) > BATCH_MAX_BYTES:
+            if f:
+                f.close()
+            paths.append(os.path.join(directory, f"gpt_batch_{len(paths):03d}.jsonl"))
+            f = open(paths[-1], "wb")
+            count = size = 0
+        f.write(data)
+        count += 1
+        size += len(data)
+    if f:
+        f.close()
+    return paths
+
+
+# ✅ 배치 결과 파일 → (custom_id, GPT 원문 또는 None, 오류)
+def parse_batch_output(raw: bytes):
+    for line in raw.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        response = row.get("response") or {}
+        body = response.get("body") or {}
+        if row.get("error") or response.get("status_code") != 200:
+            error = row.get("error") or body.get("error")
+            code = error.get("code") if isinstance(error, dict) else None
+            record("openai.batch", error=code or f"status_{response.get('status_code')}")
+            yield row["custom_id"], None, error
+            continue
+        usage = body.get("usage") or {}
+        record("openai.batch", prompt_tokens=usage.get("prompt_tokens", 0),
+               completion_tokens=usage.get("completion_tokens", 0))
+        yield row["custom_id"], body["choices"][0]["message"]["content"].strip(), None
+
+
+def _log(message):
+    print(f"[gpt-batch] {message}", file=sys.stderr)
+
+
+def _save_state(state, state_path):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, state_path)
+
+
+# 🔹 GPT 원문이 아직 캐시에 없는 이미지만 요청 줄로 (같은 이미지는 1번만)
+def _pending_lines(sources, cache, prompt_text, state):
+    seen = set()
+    for key, read in sources:
+        try:
+            image = PreparedImage.open(io.BytesIO(read()), name=key)
+        except Exception as e:
+            _log(f"skip {key}: {e}")  # 일반 파이프라인에서 [ERROR] 로 기록됨
+            continue
+        model = gpt_cache_model(image)
+        state.setdefault("cache_model", model)
+        if image.content_hash in seen or cache.get(image.content_hash, "gpt_vision_ocr", PROMPT_VERSION, model):
+            continue
+        seen.add(image.content_hash)
+        yield batch_request_line(image, prompt_text)
+
+
+# ✅ 요청 파일 작성 → 업로드 → 배치 생성 (상태 파일에 배치 id 기록)
+def submit_batches(sources, transport: BatchTransport, state_path: str, prompt_text: str = GPT_PROMPT_TEXT) -> dict:
+    state = {"prompt_version": PROMPT_VERSION, "batches": []}
+    work_dir = tempfile.mkdtemp(prefix="gpt_batch_")
+    try:
+        paths = write_batch_files(_pending_lines(sources, get_cache(), prompt_text, state), work_dir)
+        for path in paths:
+            input_file_id = transport.upload(path)
+            batch_id = transport.create(input_file_id, {"source": "swatch_ocr", "prompt_version": PROMPT_VERSION})
+            state["batches"].append({"id": batch_id, "input_file_id": input_file_id, "status": "validating"})
+            _save_state(state, state_path)
+            _log(f"submitted {batch_id} ({os.path.basename(path)})")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return state
+
+
+# ✅ 모든 배치가 끝날 때까지 polling
+def wait_for_batches(state: dict, transport: BatchTransport, state_path: str, poll_interval: float = POLL_INTERVAL):
+    while True:
+        for entry in state["batches"]:
+            if entry["status"] in TERMINAL_STATUSES:
+                continue
+            batch = transport.retrieve(entry["id"])
+            entry.update(status=batch["status"], output_file_id=batch.get("output_file_id"),
+                         error_file_id=batch.get("error_file_id"))
+            counts = batch.get("request_counts") or {}
+            _log(f"{entry['id']}: {entry['status']} ({counts.get('completed', 0)}/{counts.get('total', 0)})")
+        _save_state(state, state_path)
+        if all(entry["status"] in TERMINAL_STATUSES for entry in state["batches"]):
+            return state
+        time.sleep(poll_interval)
+
+
+# ✅ 결과 다운로드 → custom_id 별 GPT 원문을 OCR 캐시에 저장
+# 만료(expired)/취소된 배치도 끝난 요청의 결과 파일은 있으므로 함께 수집
+def collect_results(state: dict, transport: BatchTransport) -> dict:
+    cache = get_cache()
+    counts = {"stored": 0, "failed": 0}
+    for entry in state["batches"]:
+        if entry.get("output_file_id"):
+            for custom_id, text, error in parse_batch_output(transport.download(entry["output_file_id"])):
+                if text is None:
+                    counts["failed"] += 1
+                    continue
+                cache.set(custom_id, "gpt_vision_ocr", text, state["prompt_version"], state["cache_model"])
+                counts["stored"] += 1
+        if entry.get("error_file_id"):
+            counts["failed"] += sum(1 for _ in parse_batch_output(transport.download(entry["error_file_id"])))
+    return counts
+
+
+# ✅ 소스 전체의 GPT 결과를 Batch API 로 미리 받아 캐시에 채움
+# sources: (파일 키, 바이트를 읽는 함수) 목록 (swatch_ocr.iter_sources 형식)
+def run_gpt_batch(sources, state_path: str, transport: BatchTransport = None,
+                  poll_interval: float = POLL_INTERVAL, prompt_text: str = GPT_PROMPT_TEXT) -> dict:
+    if get_cache() is None:
+        raise RuntimeError("GPT batch mode needs the OCR cache (OCR_CACHE_PATH is empty)")
+    transport = transport or OpenAIBatchTransport()
+
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        _log(f"resuming {len(state['batches'])} batch(es) from {state_path}")
+    else:
+        state = submit_batches(sources, transport, state_path, prompt_text)
+    if not state["batches"]:
+        return {"stored": 0, "failed": 0}
+
+    wait_for_batches(state, transport, state_path, poll_interval)
+    counts = collect_results(state, transport)
+    os.remove(state_path)
+    return counts
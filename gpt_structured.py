@@ -0,0 +1,131 @@
+# gpt_structured.py
+# ✅ GPT 응답 형식 고정 (structured outputs / JSON schema) + 스트리밍 JSON 수신
+# - response_format 에 strict JSON schema 를 지정 → 응답은 항상 스키마에 맞는 JSON 객체 하나
+#   (앞뒤 설명 문장 / 코드 블록 없음 → 정규식 fallback 파서 불필요)
+# - 스트리밍으로 받으면서 최상위 객체가 닫히는 순간 바로 반환하고 연결 종료 (꼬리 지연 제거)
+# - 객체가 닫히기 전에 스트림이 끝나면(max_tokens 초과 / content filter / 연결 끊김) IncompleteJSONError
+#   → 잘린 JSON 이 OCR 캐시에 저장되지 않고, fan-out 은 이번 호출에서 GPT 결과만 빼고 진행
+from telemetry import record
+
+# 스와치 1장 결과: 브랜드 + 품번 목록 (보이는 품번이 없으면 빈 배열)
+ARTICLE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "company": {"type": "string"},
+        "article_numbers": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["company", "article_numbers"],
+    "additionalProperties": False,
+}
+
+
+def json_schema_format(name: str, schema: dict) -> dict:
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+ARTICLE_RESPONSE_FORMAT = json_schema_format("swatch_articles", ARTICLE_SCHEMA)
+
+
+class IncompleteJSONError(RuntimeError):
+    pass
+
+
+# ✅ 조각(chunk) 단위로 받은 텍스트에서 첫 번째 최상위 JSON 객체가 닫히는 시점 감지
+class JSONObjectStream:
+    def __init__(self):
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    # 객체가 닫혔으면 객체 문자열, 아니면 None
+    def feed(self, chunk: str):
+        if self.done:
+            return self.text
+        for i, ch in enumerate(chunk):
+            if self._depth == 0 and ch != "{":
+                continue  # 객체 시작 전 공백
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(chunk[:i + 1] if self._parts else chunk[chunk.index("{"):i + 1])
+                    self.done = True
+                    return self.text
+        if self._depth:
+            self._parts.append(chunk if self._parts else chunk[chunk.index("{"):])
+        return None
+
+
+def _delta_text(chunk) -> str:
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+
+def _finish_reason(chunk, current):
+    return (chunk.choices[0].finish_reason if chunk.choices else None) or current
+
+
+def _incomplete(parser, finish_reason):
+    return IncompleteJSONError(f"GPT stream ended before the JSON object closed "
+                               f"(finish_reason={finish_reason}, {len(parser.text)} chars)")
+
+
+# 🔹 스트림 계측: 응답 토큰은 원문 길이로 추정 (객체가 닫히면 usage 청크 전에 연결을 닫으므로)
+#    서버가 usage 를 먼저 보낸 경우에만 실제 값 기록
+def _record_stream(parser, usage, finish_reason=None):
+    fields = {"closed_early": parser.done, "completion_tokens_est": len(parser.text) // 4}
+    if not parser.done:
+        fields["finish_reason"] = finish_reason
+    if usage is not None:
+        fields.update(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+    record("openai.stream", **fields)
+
+
+# ✅ chat.completions(stream=True) 응답 → 객체가 닫히자마자 반환 (나머지 스트림은 닫음)
+def read_json_stream(stream) -> str:
+    parser = JSONObjectStream()
+    usage = finish_reason = None
+    try:
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            finish_reason = _finish_reason(chunk, finish_reason)
+            text = parser.feed(_delta_text(chunk))
+            if text is not None:
+                return text
+    finally:
+        stream.close()
+        _record_stream(parser, usage, finish_reason)
+    raise _incomplete(parser, finish_reason)
+
+
+async def read_json_stream_async(stream) -> str:
+    parser = JSONObjectStream()
+    usage = finish_reason = None
+    try:
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            finish_reason = _finish_reason(chunk, finish_reason)
+            text = parser.feed(_delta_text(chunk))
+            if text is not None:
+                return text
+    finally:
+        await stream.close()
+        _record_stream(parser, usage, finish_reason)
+    raise _incomplete(parser, finish_reason)
@@ -0,0 +1,225 @@
+# gpt_tiling.py
+# ✅ 스와치 여러 장을 GPT-4o 요청 1건으로 묶어 처리 (작은 라벨 사진용)
+# - parts: 메시지 1개에 이미지 N장을 순서대로 첨부 (이미지 토큰은 같고 프롬프트/요청 오버헤드만 1회)
+# - grid:  N장을 번호를 붙인 격자 1장으로 합성 (작은 이미지는 이미지 토큰도 절약, 대신 장당 해상도 감소)
+# - 응답은 {"results": [이미지 번호(index)별 결과]} (JSON schema 고정) → 이미지별 {"company", "article_numbers"} 원문으로 분리
+#   → 이후는 단일 호출과 같은 parse_gpt_response → score_articles 경로
+# - 응답이 잘렸거나 번호가 빠짐/중복이면 해당 묶음은 None 반환 → 호출자가 이미지별 단일 호출로 처리
+import asyncio
+import base64
+import io
+import json
+import math
+
+from PIL import Image, ImageDraw, ImageFont
+
+from engine_clients import get_async_openai_client, get_openai_client
+from gpt_structured import ARTICLE_SCHEMA, json_schema_format, read_json_stream, read_json_stream_async
+from gpt_vision_ocr import GPT_MODEL, gpt_cache_model
+from ocr_cache import get_cache
+from prepared_image import as_prepared, estimate_gpt_image_tokens, run_prepare
+from request_scheduler import scheduled_call, scheduled_call_async
+from telemetry import request_bytes
+
+TILE_MODES = ("parts", "grid")
+DEFAULT_TILE_MODE = "parts"
+TILE_PROMPT_VERSION = "tiled-v2"   # 프롬프트 / 응답 형식 변경 시 올려야 캐시가 무효화됨
+TILE_MAX_TOKENS_PER_IMAGE = 100    # 이미지 1장 결과 + index 필드
+GRID_CELL = 512                    # grid 칸 크기 (GPT-4o 타일 1개)
+GRID_LABEL_SIZE = 40
+GRID_JPEG_QUALITY = 85
+
+TILE_LAYOUT_TEXT = {
+    "parts": "You are given {n} separate swatch images, each preceded by its label \"Image <index>\".",
+    "grid": ("You are given one image containing {n} swatches in a grid. Each cell has its index "
+             "in a white box at the top-left corner, numbered left to right, top to bottom starting at 1."),
+}
+
+TILED_PROMPT_TEXT = (
+    "You are an OCR engine, not a reasoning AI.\n"
+    "{layout}\n"
+    "For each swatch, extract exactly what is clearly visible on that swatch only.\n"
+    "Return only:\n"
+    "- company (brand name)\n"
+    "- article_numbers (e.g. AB-EX123, 19023, MFA-7678)\n\n"
+    "STRICT RULES:\n"
+    "- Do not infer or guess, and never copy values between swatches.\n"
+    "- If partially shown, skip.\n"
+    "- If no brand is visible, use 'N/A' for company; if no article number is visible, use an empty list.\n"
+    "- Return exactly {n} results, one per index."
+)
+
+TILED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                **ARTICLE_SCHEMA,
+                "properties": {"index": {"type": "integer"}, **ARTICLE_SCHEMA["properties"]},
+                "required": ["index", *ARTICLE_SCHEMA["required"]],
+            },
+        },
+    },
+    "required": ["results"],
+    "additionalProperties": False,
+}
+TILED_RESPONSE_FORMAT = json_schema_format("swatch_articles_tiled", TILED_SCHEMA)
+
+
+def tiled_prompt(n: int, mode: str) -> str:
+    return TILED_PROMPT_TEXT.format(n=n, layout=TILE_LAYOUT_TEXT[mode].format(n=n))
+
+
+# ✅ 이미지 N장 → 번호를 붙인 격자 이미지 (열 = ceil(sqrt(N)))
+def compose_grid(images, cell: int = GRID_CELL) -> Image.Image:
+    cols = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / cols)
+    grid = Image.new("RGB", (cols * cell, rows * cell), "white")
+    draw = ImageDraw.Draw(grid)
+    font = ImageFont.load_default(size=GRID_LABEL_SIZE * 3 // 4)
+    for i, image in enumerate(images):
+        tile = as_prepared(image).engine_image("gpt").copy()
+        # 🔹 번호 칸이 스와치를 가리지 않도록 위쪽 띠를 비워 둠
+        tile.thumbnail((cell - 4, cell - GRID_LABEL_SIZE - 4), Image.Resampling.LANCZOS)
+        x, y = (i % cols) * cell, (i // cols) * cell
+        body_height = cell - GRID_LABEL_SIZE
+        grid.paste(tile, (x + (cell - tile.width) // 2, y + GRID_LABEL_SIZE + (body_height - tile.height) // 2))
+        draw.rectangle([x, y, x + cell - 1, y + cell - 1], outline="gray", width=2)
+        draw.rectangle([x, y, x + GRID_LABEL_SIZE * 3 // 2, y + GRID_LABEL_SIZE], fill="white", outline="black")
+        draw.text((x + 6, y + 4), str(i + 1), fill="black", font=font)
+    return grid
+
+
+# ✅ 묶음 요청 본문 + TPM 한도 계산용 토큰 추정
+def tiled_request(images, mode: str = DEFAULT_TILE_MODE):
+    images = [as_prepared(image) for image in images]
+    prompt_text = tiled_prompt(len(images), mode)
+    content = [{"type": "text", "text": prompt_text}]
+    if mode == "grid":
+        grid = compose_grid(images)
+        buffered = io.BytesIO()
+        grid.save(buffered, format="JPEG", quality=GRID_JPEG_QUALITY)
+        url = "data:image/jpeg;base64," + base64.b64encode(buffered.getvalue()).decode("utf-8")
+        content.append({"type": "image_url", "image_url": {"url": url}})
+        image_tokens = estimate_gpt_image_tokens(*grid.size)
+    else:
+        image_tokens = 0
+        for i, image in enumerate(images, 1):
+            content.append({"type": "text", "text": f"Image {i}"})
+            content.append({"type": "image_url", "image_url": {"url": image.gpt_image_url}})
+            image_tokens += estimate_gpt_image_tokens(*image.engine_size("gpt"))
+    max_tokens = TILE_MAX_TOKENS_PER_IMAGE * len(images)
+    body = {
+        "model": GPT_MODEL,
+        "messages": [{"role": "system", "content": "You are a helpful assistant."},
+                     {"role": "user", "content": content}],
+        "max_tokens": max_tokens,
+        "response_format": TILED_RESPONSE_FORMAT,
+    }
+    return body, image_tokens + len(prompt_text) // 4 + max_tokens
+
+
+# ✅ 묶음 응답 → 이미지별 GPT 원문 목록 (형식이 어긋나면 None)
+def split_tiled_response(result_text: str, n: int):
+    try:
+        data = json.loads(result_text)
+    except (TypeError, ValueError):
+        return None
+    data = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(data, list) or len(data) != n:
+        return None
+
+    by_index = {}
+    for item in data:
+        if not isinstance(item, dict):
+            return None
+        index = item.get("index")
+        articles = item.get("article_numbers", [])
+        if not isinstance(index, int) or index in by_index or not isinstance(articles, list):
+            return None
+        by_index[index] = {"company": str(item.get("company") or "N/A"), "article_numbers": articles}
+    if set(by_index) != set(range(1, n + 1)):
+        return None
+    return [json.dumps(by_index[i], ensure_ascii=False) for i in range(1, n + 1)]
+
+
+def _cache_model(image, mode):
+    return f"{gpt_cache_model(image)}|{mode}"
+
+
+def _cached_texts(images, mode):
+    cache = get_cache()
+    if cache is None:
+        return [None] * len(images)
+    return [cache.lookup(image.content_hash, "gpt_vision_ocr_tiled", TILE_PROMPT_VERSION, _cache_model(image, mode),
+                         image.cache_alias)
+            for image in images]
+
+
+def _store(images, texts, mode):
+    cache = get_cache()
+    if cache is None:
+        return
+    for image, text in zip(images, texts):
+        cache.set(image.content_hash, "gpt_vision_ocr_tiled", text, TILE_PROMPT_VERSION, _cache_model(image, mode))
+
+
+# ✅ 이미지 N장 → 이미지별 GPT 원문 (묶음 응답을 못 쓰면 해당 자리는 None → 단일 호출로 처리)
+def gpt_tiled_texts(images, mode: str = DEFAULT_TILE_MODE) -> list:
+    images = [as_prepared(image) for image in images]
+    texts = _cached_texts(images, mode)
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if len(missing) < 2:
+        return texts
+    pending = [images[i] for i in missing]
+    body, tokens = tiled_request(pending, mode)
+    try:
+        result_text = scheduled_call(
+            "openai", lambda: read_json_stream(get_openai_client().chat.completions.create(**body, stream=True)),
+            tokens=tokens, attrs={"bytes": request_bytes(body), "images": len(pending)})
+    except Exception:
+        return texts
+    split = split_tiled_response(result_text, len(pending))
+    if split:
+        _store(pending, split, mode)
+        for i, text in zip(missing, split):
+            texts[i] = text
+    return texts
+
+
+def _prepare_all(images):
+    return [as_prepared(image) for image in images]
+
+
+# 🔹 묶음 요청 본문 + 토큰 추정 + 요청 크기 (격자 합성 / LANCZOS / JPEG / base64 → CPU 작업)
+def _tiled_request_bytes(images, mode):
+    body, tokens = tiled_request(images, mode)
+    return body, tokens, request_bytes(body)
+
+
+# ✅ gpt_tiled_texts 의 asyncio 버전
+# 디코딩 / 요청 본문 생성은 run_prepare 전용 풀, SQLite 는 to_thread → 이벤트 루프는 API 응답 대기만
+async def gpt_tiled_texts_async(images, mode: str = DEFAULT_TILE_MODE) -> list:
+    images = await run_prepare(_prepare_all, images)
+    texts = await asyncio.to_thread(_cached_texts, images, mode)
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if len(missing) < 2:
+        return texts
+    pending = [images[i] for i in missing]
+    body, tokens, nbytes = await run_prepare(_tiled_request_bytes, pending, mode)
+
+    async def call():
+        return await read_json_stream_async(await get_async_openai_client().chat.completions.create(**body, stream=True))
+
+    try:
+        result_text = await scheduled_call_async("openai", call, tokens=tokens,
+                                                 attrs={"bytes": nbytes, "images": len(pending)})
+    except Exception:
+        return texts
+    split = split_tiled_response(result_text, len(pending))
+    if split:
+        await asyncio.to_thread(_store, pending, split, mode)
+        for i, text in zip(missing, split):
+            texts[i] = text
+    return texts
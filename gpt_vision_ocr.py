@@ -1,343 +1,183 @@
-# ocr_engines.py
-import base64
-import io
-import os
-import openai
-import pytesseract
-import re
-from PIL import Image
-from google.cloud import vision
-
-openai.api_key = os.environ.get("OPENAI_API_KEY")
+# gpt_vision_ocr.py
+# ✅ 엔진별 호출 (GPT-4o 이미지 / Google Vision / Tesseract, OCR 캐시 경유) + 통합 스코어링
+# 엔진 조합 / 실행 순서는 engines.py 의 파이프라인 정의에서 결정
+import asyncio
+from engine_clients import async_engine_slot, get_async_openai_client, get_openai_client
+from gpt_structured import ARTICLE_RESPONSE_FORMAT, read_json_stream, read_json_stream_async
+from layout_ocr import dumps_layout, extract_anchored_articles, layout_from_response
+from ocr_cache import cached_call, cached_call_async
+from postprocess import (extract_article_candidates, filter_scored_articles, normalize_company_name,
+                         parse_gpt_response, score_articles)
+from prepared_image import as_prepared, estimate_gpt_image_tokens
+from request_scheduler import scheduled_call, scheduled_call_async
+from telemetry import request_bytes, span
+from tesseract_pool import PREPROCESS, ocr_regions, ocr_regions_async
+from vision_batcher import batched_text_detection, get_vision_batcher
+
+GPT_MODEL = "gpt-4o"
+# 스키마 응답 {"company", "article_numbers"} 은 품번 10개 정도까지 100 토큰 이내 → 여유를 두고 150
+GPT_MAX_TOKENS = 150
+PROMPT_VERSION = "v2"  # 프롬프트 / 응답 형식 변경 시 올려야 캐시가 무효화됨
+
+GPT_PROMPT_TEXT = (
+    "You are an OCR engine, not a reasoning AI.\n"
+    "Extract exactly what is clearly visible.\n"
+    "Return only:\n"
+    "- company (brand name)\n"
+    "- article_numbers (e.g. AB-EX123, 19023, MFA-7678)\n\n"
+    "STRICT RULES:\n"
+    "- Do not infer or guess.\n"
+    "- If partially shown, skip.\n"
+    "- If no brand is visible, use 'N/A' for company; if no article number is visible, use an empty list."
+)
 
 # ✅ Tesseract OCR
-def tesseract_ocr(image: Image.Image) -> str:
-    return pytesseract.image_to_string(image, lang='eng')
-
-# ✅ Google Vision OCR
-def google_vision_ocr(image: Image.Image) -> str:
-    client = vision.ImageAnnotatorClient()
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")
-    content = buffered.getvalue()
-    image_google = vision.Image(content=content)
-    response = client.text_detection(image=image_google)
+def tesseract_ocr(image) -> str:
+    tesseract_image = as_prepared(image).tesseract_image
+    with span("tesseract_ocr", pixels=tesseract_image.width * tesseract_image.height):
+        return ocr_regions(tesseract_image)[0]
+
+# 🔹 Tesseract 원문 캐시의 model 키 (이미지 정책 + 전처리 여부)
+def tesseract_cache_model(image) -> str:
+    return f"{as_prepared(image).policy_key('tesseract')}|preprocess={int(PREPROCESS)}"
+
+# ✅ Tesseract 원문 (OCR 캐시 경유)
+# cache_alias 와 무관하게 항상 이 이미지 기준 → 근접 중복 확인(image_dedup)에 그대로 사용
+def cached_tesseract_ocr(image) -> str:
+    image = as_prepared(image)
+    return cached_call(image.content_hash, "tesseract", lambda: tesseract_ocr(image),
+                       model=tesseract_cache_model(image))
+
+# ✅ Google Vision OCR (다른 워커의 요청과 묶어서 batch_annotate_images 로 전송)
+def google_vision_ocr(image) -> str:
+    return batched_text_detection(as_prepared(image).vision_bytes)
+
+async def google_vision_ocr_async(image) -> str:
+    # 🔹 동시 실행 수 / rate limit 은 배처의 전송 단계(scheduled_call)에서 적용 → 여기서 막으면 배치가 작아짐
+    response = await asyncio.wrap_future(get_vision_batcher().submit(as_prepared(image).vision_bytes))
     texts = response.text_annotations
     return texts[0].description if texts else ""
 
+# ✅ Google Vision OCR + 단어 위치 (layout_ocr 형식 JSON 문자열 → OCR 캐시에 그대로 저장)
+def google_vision_layout(image) -> str:
+    image = as_prepared(image)
+    response = get_vision_batcher().submit(image.vision_bytes).result()
+    return dumps_layout(layout_from_response(response, image.engine_size("vision")))
+
+async def google_vision_layout_async(image) -> str:
+    image = as_prepared(image)
+    response = await asyncio.wrap_future(get_vision_batcher().submit(image.vision_bytes))
+    return dumps_layout(layout_from_response(response, image.engine_size("vision")))
+
 # ✅ GPT OCR (Vision API)
-def gpt_vision_ocr(image: Image.Image, prompt_text: str) -> dict:
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")
-    img_b64 = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt_text},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_b64}"}}
-                ]
-            }
-        ],
-        max_tokens=700,
+def _gpt_messages(image, prompt_text: str) -> list:
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt_text},
+                {"type": "image_url", "image_url": {"url": as_prepared(image).gpt_image_url}}
+            ]
+        }
+    ]
+
+# 🔹 TPM 한도 계산용 요청 토큰 추정 (이미지 타일 + 프롬프트 + 최대 출력)
+def _gpt_request_tokens(image, prompt_text: str, max_tokens: int) -> int:
+    return estimate_gpt_image_tokens(*as_prepared(image).engine_size("gpt")) + len(prompt_text) // 4 + max_tokens
+
+# ✅ chat.completions 요청 본문 (동기 호출 / Batch API JSONL 공용, 응답 형식은 JSON schema 로 고정)
+def gpt_request_body(image, prompt_text: str) -> dict:
+    return {
+        "model": GPT_MODEL,
+        "messages": _gpt_messages(image, prompt_text),
+        "max_tokens": GPT_MAX_TOKENS,
+        "response_format": ARTICLE_RESPONSE_FORMAT,
+    }
+
+# 🔹 GPT 원문 캐시의 model 키 (모델 + 이미지 정책)
+def gpt_cache_model(image) -> str:
+    return f"{GPT_MODEL}|{as_prepared(image).policy_key('gpt')}"
+
+# 🔹 스트리밍으로 받아 JSON 객체가 닫히는 즉시 반환
+def gpt_vision_ocr(image, prompt_text: str) -> str:
+    body = gpt_request_body(image, prompt_text)
+    return scheduled_call(
+        "openai",
+        lambda: read_json_stream(get_openai_client().chat.completions.create(**body, stream=True)),
+        tokens=_gpt_request_tokens(image, prompt_text, GPT_MAX_TOKENS),
+        attrs={"bytes": request_bytes(body)},
     )
 
-    result_text = response.choices[0].message.content.strip()
-    return result_text
-
-# postprocess.py
-import re
-import json
-from typing import List, Tuple
-
-# ✅ 브랜드명 정규화
-def normalize_company_name(name: str) -> str:
-    name = name.strip().upper()
-    replacements = {
-        "HOKKH": "HOKKOH", "HKKH": "HOKKOH", "HKH": "HOKKOH", "HKK": "HOKKOH",
-        "KOMON KOBO": "Uni Textile Co., Ltd.",
-        "UNI TEXTILE": "Uni Textile Co., Ltd.",
-        "OHARAYA": "Ohara Inc.",
-        "OHARA": "Ohara Inc.",
-        "ALLBLUE": "ALLBLUE Inc.",
-        "MATSUBARA": "Matsubara Co., Ltd.",
-        "YAGI": "YAGI",
-        "VANCET": "Vancet"
-    }
-    for key, val in replacements.items():
-        if key in name:
-            return val
-    return name.title().replace("Co.,Ltd.", "Co., Ltd.")
-
-# ✅ 품번 유효성 필터
-def is_valid_article(article: str, company=None) -> bool:
-    article = article.strip().upper()
-
-    if article in ["TEL", "FAX", "HTTP", "WWW", "ARTICLE", "COLOR", "COMPOSITION"]:
-        return False
-    if "OCA" in article and re.match(r"OCA\d{3,}", article):
-        return False
-    if company and article == company.upper():
-        return False
-    if re.fullmatch(r"\d{1,2}", article):
-        return False
-    if re.fullmatch(r"C\d{2,3}%?", article):
-        return False
-    if len(article) < 3:
-        return False
-    if not re.search(r"[A-Z0-9]", article):
-        return False
-    if article.startswith("HTTP") or ".COM" in article:
-        return False
-    if re.fullmatch(r"\d{3}", article):
-        return False
-
-    return bool(re.search(r"[A-Z0-9/\-]{3,}", article)) or bool(re.search(r"\d{3,}", article))
-
-# ✅ 오탐 가능성 높은 품번 감지
-def is_suspicious_article(article: str) -> bool:
-    a = article.upper()
-    if re.search(r"(.)\1{2,}", a):  # 같은 문자 반복 3번 이상 (예: YGUUU003)
-        return True
-    if re.fullmatch(r"\d{2,3}[A-Z]{2,}X+\d{3}", a):  # 비정상 문자 반복 + X 반복
-        return True
-    if len(a) > 20:
-        return True
-    return False
-
-# ✅ GPT 응답 파싱 (Fallback-safe JSON 파서)
-def parse_gpt_response(result_text: str) -> Tuple[str, List[str], bool]:
-    try:
-        result = json.loads(result_text)
-        company = result.get("company", "N/A").strip()
-        article_numbers = result.get("article_numbers", [])
-        return company, [a.strip().upper() for a in article_numbers], False
-    except json.JSONDecodeError:
-        # fallback 정규식 파서
-        company_match = re.search(r'"?company"?\s*:\s*"([^"]+)"', result_text)
-        raw_articles = re.findall(r'"([A-Z0-9/\-]{3,})"', result_text)
-        company = company_match.group(1).strip() if company_match else "N/A"
-        articles = list(set(raw_articles)) if raw_articles else ["N/A"]
-        return company, [a.strip().upper() for a in articles], True
-
-from collections import Counter
-import re
-
-def score_articles(gpt_articles, google_articles, tesseract_articles, crop_articles=None):
-    all_sources = {
-        "GPT": gpt_articles or [],
-        "Google": google_articles or [],
-        "Tesseract": tesseract_articles or [],
-        "Crop": crop_articles or []
-    }
+async def gpt_vision_ocr_async(image, prompt_text: str) -> str:
+    body = gpt_request_body(image, prompt_text)
 
-    article_counts = Counter()
-    article_sources = {}
-
-    for source, articles in all_sources.items():
-        for a in articles:
-            a_clean = a.strip().upper()
-            if not a_clean:
-                continue
-            article_counts[a_clean] += 1
-            article_sources.setdefault(a_clean, set()).add(source)
-
-    scored = []
-    for article, count in article_counts.items():
-        score = 0
-        sources = article_sources[article]
-
-        if "GPT" in sources:
-            score += 3
-        if "Google" in sources:
-            score += 3
-        if "Tesseract" in sources:
-            score += 2
-        if "Crop" in sources:
-            score += 2
-
-        if len(article) >= 6:
-            score += 1
-        if "-" in article or "/" in article:
-            score += 1
-        if re.search(r"[A-Z]{2,}", article):
-            score += 1
-
-        scored.append((article, score))
-
-    # 점수순 정렬
-    scored.sort(key=lambda x: -x[1])
-    return scored
-
-
-import re
-from postprocess import is_valid_article, is_suspicious_article
-
-def filter_scored_articles(scored_articles, company_name, max_return=5):
-    normalized_company = company_name.strip().upper().replace(" ", "")
-    final = []
-
-    for article, score in scored_articles:
-        article_upper = article.upper()
-
-        if not is_valid_article(article_upper, company_name):
-            continue
-        if is_suspicious_article(article_upper):
-            continue
-        if article_upper == normalized_company:
-            continue
-        if normalized_company in article_upper.replace(" ", ""):
-            continue
-        if re.fullmatch(r"(AB[\-/]EX)?00[13]", article_upper):
-            continue
-        if article_upper.startswith("000"):
-            continue
-
-        final.append(article_upper)
-        if len(final) >= max_return:
-            break
-
-    return final if final else ["N/A"]
-
-from PIL import Image
-import io
-import pytesseract
-from google.cloud import vision
-
-# ✅ 이미지 리사이즈
-# ✅ utils.py
-def resize_image(image, max_size=(1600, 1600)):
-    if image.width > max_size[0] or image.height > max_size[1]:
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-    return image
-
-# ✅ Google Vision OCR
-def google_vision_ocr(image: Image.Image) -> str:
-    client = vision.ImageAnnotatorClient()
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")
-    content = buffered.getvalue()
-    image_google = vision.Image(content=content)
-    response = client.text_detection(image=image_google)
-    texts = response.text_annotations
-    return texts[0].description if texts else ""
+    async def call():
+        return await read_json_stream_async(await get_async_openai_client().chat.completions.create(**body, stream=True))
 
-# ✅ Tesseract OCR
-def tesseract_ocr(image: Image.Image) -> str:
-    return pytesseract.image_to_string(image, lang='eng')
-
-# ✅ YAGI 전용 영역 OCR (Item No 위치)
-def extract_yagi_article_crop(img: Image.Image) -> str:
-    cropped = img.crop((480, 38, 950, 155))  # 영역은 필요 시 조정
-    text = pytesseract.image_to_string(cropped, lang='eng')
-    match = re.search(r'Item[#]?\s*[:\-]?\s*([A-Z0-9\-]{6,})', text.upper())
-    return match.group(1) if match else "N/A"
-
-
-import openai
-import base64
-
-openai.api_key = os.environ.get("OPENAI_API_KEY")
-
-# ✅ postprocess.py 에 정의된 함수 이름과 일치
-from postprocess import parse_gpt_response
-
-def call_gpt_ocr(image: Image.Image) -> (dict, bool):
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")
-    img_b64 = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-    prompt_text = (
-        "You are an OCR engine, not a reasoning AI.\n"
-        "Extract exactly what is clearly visible.\n"
-        "Return only:\n"
-        "- company (brand name)\n"
-        "- article_numbers (e.g. AB-EX123, 19023, MFA-7678)\n\n"
-        "STRICT RULES:\n"
-        "- Do not infer or guess.\n"
-        "- If partially shown, skip.\n"
-        "- If nothing visible, return 'N/A'.\n"
-        "- Format: { \"company\": \"...\", \"article_numbers\": [\"...\"] }"
-    )
+    return await scheduled_call_async("openai", call, tokens=_gpt_request_tokens(image, prompt_text, GPT_MAX_TOKENS),
+                                      attrs={"bytes": request_bytes(body)})
+
+# ✅ 기존 호출부 호환: GPT + Vision + Tesseract 통합 스코어링 (cascade_policy 가 있으면 cascade) 파이프라인
+# gpt_text: 이미 받은 GPT 원문 (gpt_tiling 묶음 요청 등) → 주어지면 GPT 호출 생략
+def extract_info_from_image(image, filename=None, fanout_policy=None, cascade_policy=None, gpt_text=None) -> dict:
+    from engines import extract_info
+    return extract_info(image, "cascade" if cascade_policy is not None else "vision", fanout_policy=fanout_policy,
+                        cascade_policy=cascade_policy, gpt_text=gpt_text)
 
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt_text},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_b64}"}}
-                ]
-            }
-        ],
-        max_tokens=700,
+
+async def extract_info_from_image_async(image, filename=None, fanout_policy=None, cascade_policy=None,
+                                        gpt_text=None) -> dict:
+    from engines import extract_info_async
+    return await extract_info_async(image, "cascade" if cascade_policy is not None else "vision",
+                                    fanout_policy=fanout_policy, cascade_policy=cascade_policy, gpt_text=gpt_text)
+
+
+# ✅ 엔진별 원문 결과 → 통합 스코어링 → 최종 결과
+# google_layout: layout_ocr 형식 (전체 텍스트 + 단어 위치), canvas_size: 브랜드 템플릿 영역의 기준 캔버스 크기
+def fuse_engine_results(gpt_result_text: str, google_layout: dict, tesseract_text: str, canvas_size=None) -> dict:
+    with span("postprocess", cpu=True):
+        return _fuse_engine_results(gpt_result_text, google_layout, tesseract_text, canvas_size)
+
+
+def _fuse_engine_results(gpt_result_text, google_layout, tesseract_text, canvas_size):
+    # 🔹 GPT OCR 파싱
+    raw_company, gpt_articles, used_fallback = parse_gpt_response(gpt_result_text)
+    normalized_company = normalize_company_name(raw_company)
+
+    # 🔹 다른 OCR 결과
+    google_articles = extract_article_candidates(google_layout["text"])
+    tesseract_articles = extract_article_candidates(tesseract_text)
+    # 🔹 Vision 단어 위치 기준 라벨(Item No / Art. 등) 옆 품번 (브랜드별 영역 템플릿 적용)
+    layout_articles = extract_anchored_articles(google_layout, normalized_company, canvas_size)
+
+    # ✅ 통합 신뢰도 스코어링
+    scored = score_articles(
+        gpt_articles,
+        google_articles,
+        tesseract_articles,
+        layout_articles
     )
 
-    result_text = response.choices[0].message.content.strip()
-    return parse_gpt_result(result_text)
-
-def extract_info_from_image(image: Image.Image, filename=None) -> dict:
-    try:
-        image = resize_image(image)
-
-        # ✅ prompt_text 선언 누락되었으므로 여기에 추가
-        prompt_text = (
-            "You are an OCR engine, not a reasoning AI.\n"
-            "Extract exactly what is clearly visible.\n"
-            "Return only:\n"
-            "- company (brand name)\n"
-            "- article_numbers (e.g. AB-EX123, 19023, MFA-7678)\n\n"
-            "STRICT RULES:\n"
-            "- Do not infer or guess.\n"
-            "- If partially shown, skip.\n"
-            "- If nothing visible, return 'N/A'.\n"
-            "- Format: { \"company\": \"...\", \"article_numbers\": [\"...\"] }"
-        )
-
-        # 🔹 GPT OCR + 파싱
-        gpt_result_text = gpt_vision_ocr(image, prompt_text)
-        raw_company, gpt_articles, used_fallback = parse_gpt_response(gpt_result_text)
-        normalized_company = normalize_company_name(raw_company)
-
-        # 🔹 다른 OCR 결과
-        google_articles = re.findall(r"[A-Z0-9/\-]{3,}", google_vision_ocr(image))
-        tesseract_articles = re.findall(r"[A-Z0-9/\-]{3,}", tesseract_ocr(image))
-
-        # 🔹 YAGI 전용 보정
-        crop_articles = []
-        if normalized_company == "YAGI":
-            yagi_article = extract_yagi_article_crop(image)
-            if yagi_article != "N/A":
-                crop_articles = [yagi_article]
-
-        # ✅ 통합 신뢰도 스코어링
-        scored = score_articles(
-            gpt_articles,
-            google_articles,
-            tesseract_articles,
-            crop_articles
-        )
-
-        # ✅ 최종 유효 article 필터링
-        filtered_articles = filter_scored_articles(scored, normalized_company)
-
-        return {
-            "company": normalized_company if normalized_company else "N/A",
-            "article_numbers": filtered_articles if filtered_articles else ["N/A"],
-            "used_fallback": used_fallback
-        }
+    # ✅ 최종 유효 article 필터링
+    filtered_articles = filter_scored_articles(scored, normalized_company)
 
-    except Exception as e:
-        return {
-            "company": "[ERROR]",
-            "article_numbers": [f"[ERROR] {str(e)}"],
-            "used_fallback": True
-        }
+    return {
+        "company": normalized_company if normalized_company else "N/A",
+        "article_numbers": filtered_articles if filtered_articles else ["N/A"],
+        "used_fallback": used_fallback
+    }
+
+
+# ✅ Tesseract 는 CPU 작업이므로 전용 프로세스 풀에서 실행 (asyncio 경로)
+async def _tesseract_ocr_async(image):
+    tesseract_image = image.tesseract_image
+    async with async_engine_slot("tesseract"):
+        with span("tesseract_ocr", pixels=tesseract_image.width * tesseract_image.height):
+            return (await ocr_regions_async(tesseract_image))[0]
 
 
+async def cached_tesseract_ocr_async(image) -> str:
+    image = as_prepared(image)
+    return await cached_call_async(image.content_hash, "tesseract", lambda: _tesseract_ocr_async(image),
+                                   model=tesseract_cache_model(image))
@@ -0,0 +1,192 @@
+# image_dedup.py
+# ✅ 업로드 묶음 안의 거의 같은 스와치 사진 찾기 (같은 라벨을 두 번 찍었거나 다시 자른 사진)
+# - 지각 해시(pHash: 32x32 DCT 저주파 / dHash: 9x8 밝기 기울기)를 NumPy 로 묶음 단위 계산
+# - Hamming 거리 검색: 64비트 해시를 (반경+1) 조각으로 나눠 조각별 색인 → 반경 이내 해시는
+#   최소 한 조각이 정확히 같으므로(비둘기집 원리) 그 조각이 같은 후보만 거리 확인
+# - 묶음 안에서 근접 중복을 클러스터로 묶고 대표 이미지만 OCR → 결과를 나머지에 복사
+# - 해시는 OCR 캐시(SQLite)에 함께 저장 → 이전 업로드와 같은 라벨이면 그때의 엔진 원문 캐시를 재사용
+#
+# 주의: 같은 브랜드의 같은 양식 라벨은 품번 글자만 다르고 지각 해시는 사실상 같음 (품번 1글자 차이 → 거리 0~2)
+#       → 해시가 가까운 것은 "중복 후보" 일 뿐, 대표 이미지의 품번이 후보 이미지의 Tesseract 원문에도
+#         보일 때만 중복으로 확정 (confirms_articles). 확인이 안 되면 전체 엔진으로 따로 처리
+import threading
+
+import numpy as np
+from PIL import Image
+
+from brand_registry import compact
+from ocr_cache import get_cache
+
+# 해시별 최대 Hamming 거리 (64비트 중), 두 조건을 모두 만족해야 중복
+DEDUP_POLICY = {"phash": 6, "dhash": 8}
+
+PHASH_SIZE = 32
+HASH_BITS = 8  # 8x8 = 64비트
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+
+
+def _pack_bits(bits: np.ndarray) -> list:
+    packed = np.packbits(bits.reshape(len(bits), -1).astype(np.uint8), axis=1)
+    return [int(v) for v in packed.view(">u8").ravel()]
+
+
+# ✅ 해시 계산용으로 열기: JPEG 는 디코딩 단계에서 흑백 + 1/8 까지 축소 (draft, 원본 해상도 디코딩 생략)
+def open_for_hash(fp) -> Image.Image:
+    image = Image.open(fp)
+    if image.format == "JPEG":
+        image.draft("L", (PHASH_SIZE * 2, PHASH_SIZE * 2))
+    return image
+
+
+def _hash_arrays(image: Image.Image):
+    gray = image.convert("L")
+    return (np.asarray(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.BOX), dtype=np.float64),
+            np.asarray(gray.resize((HASH_BITS + 1, HASH_BITS), Image.Resampling.BOX), dtype=np.int16))
+
+
+def _hashes(arrays) -> list:
+    if not arrays:
+        return []
+    small, tiny = (np.stack(a) for a in zip(*arrays))
+    # 🔹 pHash: 2차원 DCT 를 (N, 32, 32) 묶음에 한 번에 적용 → 좌상단 8x8 저주파, DC 제외 중앙값 기준
+    coeffs = np.einsum("ij,njk,lk->nil", _DCT, small, _DCT)[:, :HASH_BITS, :HASH_BITS]
+    flat = coeffs.reshape(len(arrays), -1)
+    median = np.median(flat[:, 1:], axis=1, keepdims=True)
+    phashes = _pack_bits(flat > median)
+    # 🔹 dHash: 가로로 이웃한 픽셀 밝기 비교
+    dhashes = _pack_bits(tiny[:, :, 1:] > tiny[:, :, :-1])
+    return list(zip(phashes, dhashes))
+
+
+# ✅ 이미지 목록 → [(phash, dhash), ...] (64비트 정수)
+def perceptual_hashes(images) -> list:
+    return _hashes([_hash_arrays(image) for image in images])
+
+
+# ✅ 업로드 파일 목록 → 해시 목록 (열 수 없는 파일은 None, 파일 위치는 처음으로 되돌림)
+def hash_files(files) -> list:
+    arrays = []
+    for f in files:
+        try:
+            arrays.append(_hash_arrays(open_for_hash(f)))
+        except Exception:
+            arrays.append(None)
+        finally:
+            if hasattr(f, "seek"):
+                f.seek(0)
+    hashes = iter(_hashes([a for a in arrays if a is not None]))
+    return [next(hashes) if a is not None else None for a in arrays]
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+# ✅ pHash 반경 검색 색인 (multi-index hashing) + dHash 확인
+class HammingIndex:
+    def __init__(self, policy: dict = None):
+        self.policy = {**DEDUP_POLICY, **(policy or {})}
+        pieces = self.policy["phash"] + 1
+        width = -(-64 // pieces)
+        self._chunks = [(shift, (1 << min(width, 64 - shift)) - 1) for shift in range(0, 64, width)]
+        self._tables = [{} for _ in self._chunks]
+        self._items = []
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, hashes, value):
+        idx = len(self._items)
+        self._items.append((hashes, value))
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table.setdefault((hashes[0] >> shift) & mask, []).append(idx)
+
+    # 두 해시가 모두 반경 이내인 항목을 (pHash 거리, value) 로 반환 (가까운 순)
+    def search(self, hashes) -> list:
+        candidates = set()
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            candidates.update(table.get((hashes[0] >> shift) & mask, ()))
+        found = []
+        for idx in candidates:
+            (phash, dhash), value = self._items[idx]
+            d = hamming(phash, hashes[0])
+            if d <= self.policy["phash"] and hamming(dhash, hashes[1]) <= self.policy["dhash"]:
+                found.append((d, idx, value))
+        found.sort(key=lambda x: (x[0], x[1]))
+        return [(d, value) for d, _, value in found]
+
+
+# ✅ 묶음 안 근접 중복 클러스터: 각 이미지의 대표 이미지 번호 (대표는 자기 자신)
+# 앞에서부터 보면서 기존 대표와 가까우면 그 클러스터에, 아니면 새 대표
+def cluster_duplicates(hashes, policy: dict = None) -> list:
+    index = HammingIndex(policy)
+    representatives = []
+    for i, h in enumerate(hashes):
+        found = index.search(h) if h is not None else []
+        if found:
+            representatives.append(found[0][1])
+        else:
+            representatives.append(i)
+            if h is not None:
+                index.add(h, i)
+    return representatives
+
+
+# ✅ 중복 확정: 대표 이미지에서 찾은 품번이 모두 후보 이미지의 Tesseract 원문에도 있는지 (구두점/공백 무시)
+# 품번이 없는 결과(N/A)는 확인할 근거가 없으므로 중복으로 보지 않음
+def confirms_articles(article_numbers, tesseract_text: str) -> bool:
+    articles = [compact(a) for a in article_numbers or [] if a and a != "N/A" and not a.startswith("[ERROR]")]
+    if not articles:
+        return False
+    text = compact(tesseract_text or "")
+    return all(a in text for a in articles)
+
+
+# ✅ 이전 업로드에서 본 이미지 색인 (OCR 캐시의 image_hashes 테이블에서 한 번만 로드)
+class SeenImages:
+    def __init__(self, cache, policy: dict = None):
+        self._cache = cache
+        self._index = HammingIndex(policy)
+        self._known = set()
+        self._lock = threading.Lock()
+        for content_hash, phash, dhash in cache.image_hashes():
+            self._index.add((phash, dhash), content_hash)
+            self._known.add(content_hash)
+
+    # 가장 가까운 이전 이미지의 content_hash (없으면 None)
+    def find(self, hashes):
+        with self._lock:
+            found = self._index.search(hashes)
+        return found[0][1] if found else None
+
+    def remember(self, content_hash: str, hashes):
+        with self._lock:
+            if content_hash in self._known:
+                return
+            self._known.add(content_hash)
+            self._index.add(hashes, content_hash)
+        self._cache.set_image_hash(content_hash, *hashes)
+
+
+_seen = None
+_seen_lock = threading.Lock()
+
+
+# ✅ 프로세스 공용 (OCR 캐시가 비활성화면 None)
+def get_seen_images():
+    global _seen
+    cache = get_cache()
+    if cache is None:
+        return None
+    with _seen_lock:
+        if _seen is None:
+            _seen = SeenImages(cache)
+    return _seen
@@ -0,0 +1,153 @@
+# layout_ocr.py
+# ✅ Google Vision 단어 위치(bounding box) 기반 품번 추출
+# - Vision 응답 → 단어 + 좌표 (캐시에 JSON 으로 저장 가능한 형태)
+# - "Item No" / "Art." / "Article" 같은 라벨(anchor) 위치를 찾고 바로 오른쪽(없으면 아래) 토큰을 품번으로 사용
+# - 브랜드별 영역 템플릿(brands.json 의 layout)으로 라벨을 찾을 위치를 좁힘 (예: YAGI Item No 영역)
+import json
+import re
+
+from brand_registry import get_registry
+
+# 라벨 표기 (구두점 제거 후 단어 단위 비교)
+DEFAULT_ANCHORS = ["ITEM NO", "ITEM", "ART NO", "ART", "ARTICLE NO", "ARTICLE", "STYLE NO", "QUALITY NO"]
+DEFAULT_VALUE_PATTERN = r"[A-Z0-9/\-]{3,}"
+
+# 라벨과 값 사이에 올 수 있는 토큰
+FILLER_TOKENS = {"", "NO", "NUMBER", "#", ":", "-", "."}
+
+PUNCT_RE = re.compile(r"^[^A-Z0-9]+|[^A-Z0-9]+$")
+
+
+def _vertices_box(vertices):
+    points = [(v.get("x", 0), v.get("y", 0)) if isinstance(v, dict) else (v.x, v.y) for v in vertices]
+    if not points:
+        return [0, 0, 0, 0]
+    xs, ys = zip(*points)
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+# ✅ Vision 응답(AnnotateImageResponse 또는 녹화된 JSON dict) → {"text", "words", "size"}
+# words: [[단어, x0, y0, x1, y1], ...] (Vision 에 보낸 이미지 좌표)
+def layout_from_response(response, size) -> dict:
+    if isinstance(response, dict):
+        annotations = [(a.get("description", ""), a.get("boundingPoly", {}).get("vertices", []))
+                       for a in response.get("textAnnotations", [])]
+    else:
+        annotations = [(a.description, list(a.bounding_poly.vertices)) for a in response.text_annotations]
+    if not annotations:
+        return {"text": "", "words": [], "size": list(size)}
+    words = [[text, *_vertices_box(vertices)] for text, vertices in annotations[1:]]
+    return {"text": annotations[0][0], "words": words, "size": list(size)}
+
+
+def dumps_layout(layout: dict) -> str:
+    return json.dumps(layout, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads_layout(raw: str) -> dict:
+    return json.loads(raw) if raw else {"text": "", "words": [], "size": [1, 1]}
+
+
+def _norm(text: str) -> str:
+    return PUNCT_RE.sub("", text.upper())
+
+
+# ✅ 단어 → 줄 (세로 중심이 겹치는 단어끼리 묶고 x 순 정렬)
+def group_lines(words) -> list:
+    lines = []
+    for word in sorted(words, key=lambda w: (w[2] + w[4]) / 2):
+        cy, h = (word[2] + word[4]) / 2, max(word[4] - word[2], 1)
+        for line in lines:
+            if abs(line["cy"] - cy) <= max(line["h"], h) / 2:
+                line["words"].append(word)
+                break
+        else:
+            lines.append({"cy": cy, "h": h, "words": [word]})
+    for line in lines:
+        line["words"].sort(key=lambda w: w[1])
+    return lines
+
+
+# 붙어 있는 토큰(예: "TXAB" "-" "H062")은 하나로 합침
+def _join_adjacent(words, start, height) -> str:
+    value = words[start][0]
+    for prev, word in zip(words[start:], words[start + 1:]):
+        if word[1] - prev[3] > height * 0.3:
+            break
+        value += word[0]
+    return value.upper()
+
+
+def _match_anchor(tokens, i, anchors):
+    for anchor in anchors:
+        if tokens[i:i + len(anchor)] == anchor:
+            return len(anchor)
+    return 0
+
+
+def _value_right(line, start, height, pattern):
+    words = line["words"]
+    i = start
+    while i < len(words) and _norm(words[i][0]) in FILLER_TOKENS:
+        i += 1
+    if i < len(words) and words[i][1] - words[i - 1][3] <= height * 4:
+        value = _join_adjacent(words, i, height)
+        if pattern.fullmatch(value):
+            return value
+    return None
+
+
+def _value_below(lines, line_index, anchor_box, pattern):
+    x0, x1 = anchor_box[1], anchor_box[3]
+    line = lines[line_index]
+    for below in sorted(lines[line_index + 1:], key=lambda l: l["cy"]):
+        if below["cy"] - line["cy"] > line["h"] * 2.5:
+            break
+        for j, word in enumerate(below["words"]):
+            if word[1] <= x1 and word[3] >= x0:
+                value = _join_adjacent(below["words"], j, below["h"])
+                if pattern.fullmatch(value):
+                    return value
+    return None
+
+
+def _anchored_values(words, anchors, pattern) -> list:
+    lines = sorted(group_lines(words), key=lambda l: l["cy"])
+    values = []
+    for li, line in enumerate(lines):
+        tokens = [_norm(w[0]) for w in line["words"]]
+        i = 0
+        while i < len(tokens):
+            n = _match_anchor(tokens, i, anchors)
+            if not n:
+                i += 1
+                continue
+            anchor_box = line["words"][i]
+            value = _value_right(line, i + n, line["h"], pattern) or _value_below(lines, li, anchor_box, pattern)
+            if value and value not in values:
+                values.append(value)
+            i += n
+    return values
+
+
+# ✅ 레이아웃 → 라벨 옆 품번 목록
+# canvas_size: 템플릿 영역 좌표의 기준 캔버스 크기 (PreparedImage.size)
+def extract_anchored_articles(layout: dict, company: str = None, canvas_size=None) -> list:
+    words = layout.get("words") or []
+    if not words:
+        return []
+    template = get_registry().layout_template(company) if company else {}
+    anchors = sorted((a.split() for a in template.get("anchors", DEFAULT_ANCHORS)), key=len, reverse=True)
+    pattern = re.compile(template.get("value_pattern", DEFAULT_VALUE_PATTERN))
+
+    region = template.get("region")
+    if region and canvas_size:
+        # 🔹 영역 템플릿: 기준 캔버스 좌표 → Vision 이미지 좌표, 단어 중심이 영역 안에 있는 것만 사용
+        sx = layout["size"][0] / canvas_size[0]
+        sy = layout["size"][1] / canvas_size[1]
+        rx0, ry0, rx1, ry1 = region[0] * sx, region[1] * sy, region[2] * sx, region[3] * sy
+        in_region = [w for w in words if rx0 <= (w[1] + w[3]) / 2 <= rx1 and ry0 <= (w[2] + w[4]) / 2 <= ry1]
+        values = _anchored_values(in_region, anchors, pattern)
+        if values:
+            return values
+    return _anchored_values(words, anchors, pattern)
@@ -0,0 +1,210 @@
+# ocr_cache.py
+# ✅ 이미지 해시 + 엔진 + 프롬프트 버전 + 모델 기준의 OCR 원문 결과 캐시 (SQLite)
+# - 엔진이 돌려준 원문(raw text)만 저장하고, 후처리(postprocess 스코어링)는 매번 다시 실행
+#   → 스코어링 규칙이 바뀌어도 API 재호출 없이 캐시된 원문으로 재계산 가능
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from PIL import Image
+
+from telemetry import span
+
+CACHE_PATH = os.environ.get("OCR_CACHE_PATH", ".ocr_cache.sqlite3")
+CACHE_TTL_SECONDS = int(os.environ.get("OCR_CACHE_TTL_SECONDS", 30 * 24 * 3600))
+CACHE_MAX_BYTES = int(os.environ.get("OCR_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+EVICT_EVERY = 100  # set() 호출 N번마다 용량 정리
+
+
+UINT64_MASK = (1 << 64) - 1
+
+
+def _to_signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+# ✅ 정규화된 이미지 바이트 해시 (포맷/메타데이터와 무관하게 픽셀 기준)
+def image_hash(image: Image.Image) -> str:
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    h = hashlib.sha256(f"{image.width}x{image.height}:".encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(content_hash: str, engine: str, prompt_version: str = "", model: str = "") -> str:
+    return hashlib.sha256(f"{content_hash}|{engine}|{prompt_version}|{model}".encode()).hexdigest()
+
+
+class OCRCache:
+    def __init__(self, path=CACHE_PATH, ttl_seconds=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._sets = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS raw_results ("
+            " key TEXT PRIMARY KEY, content_hash TEXT, engine TEXT, prompt_version TEXT, model TEXT,"
+            " text TEXT, size INTEGER, created_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_raw_content ON raw_results(content_hash)")
+        # 🔹 지각 해시 (image_dedup.py: 이전 업로드와 같은 라벨 찾기)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS image_hashes ("
+            " content_hash TEXT PRIMARY KEY, phash INTEGER, dhash INTEGER, created_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, content_hash, engine, prompt_version="", model=""):
+        key = cache_key(content_hash, engine, prompt_version, model)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, created_at FROM raw_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM raw_results WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE raw_results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    # ✅ 조회 전용 별칭(alias: 이전 업로드의 근접 중복 이미지) 먼저, 없으면 이 이미지 기준
+    # 저장은 항상 이 이미지의 content_hash 로만 → 다른 이미지의 캐시 항목을 덮어쓰지 않음
+    def lookup(self, content_hash, engine, prompt_version="", model="", alias=None):
+        if alias and alias != content_hash:
+            text = self.get(alias, engine, prompt_version, model)
+            if text is not None:
+                return text
+        return self.get(content_hash, engine, prompt_version, model)
+
+    def set(self, content_hash, engine, text, prompt_version="", model=""):
+        key = cache_key(content_hash, engine, prompt_version, model)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO raw_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, content_hash, engine, prompt_version, model, text, len(text.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self._sets += 1
+            if self._sets % EVICT_EVERY == 0:
+                self._evict()
+
+    # ✅ 같은 이미지에 대해 저장된 엔진별 원문 (스코어링 재실행용)
+    def raw_texts(self, content_hash):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT engine, prompt_version, model, text FROM raw_results WHERE content_hash = ?",
+                (content_hash,),
+            ).fetchall()
+        return [{"engine": r[0], "prompt_version": r[1], "model": r[2], "text": r[3]} for r in rows]
+
+    # ✅ 지각 해시 저장 / 전체 조회 (SQLite INTEGER 는 부호 있는 64비트라 변환해서 저장)
+    def set_image_hash(self, content_hash, phash, dhash):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_hashes VALUES (?, ?, ?, ?)",
+                (content_hash, _to_signed(phash), _to_signed(dhash), time.time()),
+            )
+            self._conn.commit()
+
+    def image_hashes(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT content_hash, phash, dhash FROM image_hashes WHERE created_at >= ?",
+                (time.time() - self.ttl_seconds,),
+            ).fetchall()
+        return [(c, p & UINT64_MASK, d & UINT64_MASK) for c, p, d in rows]
+
+    # ✅ TTL 만료 항목 삭제 후, 최대 용량을 넘으면 오래 안 쓰인 순서(LRU)로 삭제
+    def _evict(self):
+        self._conn.execute("DELETE FROM raw_results WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._conn.execute("DELETE FROM image_hashes WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM raw_results").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            rows = self._conn.execute("SELECT key, size FROM raw_results ORDER BY accessed_at").fetchall()
+            doomed = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+            self._conn.executemany("DELETE FROM raw_results WHERE key = ?", doomed)
+        self._conn.commit()
+
+    # ✅ 저장된 원문 삭제 (engines 를 주면 해당 엔진만, 벤치마크의 cold 실행 등)
+    def clear(self, engines=None):
+        with self._lock:
+            if engines is None:
+                self._conn.execute("DELETE FROM raw_results")
+            else:
+                self._conn.executemany("DELETE FROM raw_results WHERE engine = ?", [(e,) for e in engines])
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# ✅ 프로세스 공용 캐시 (OCR_CACHE_PATH="" 이면 비활성화)
+def get_cache():
+    global _cache
+    if not CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = OCRCache(CACHE_PATH)
+    return _cache
+
+
+# ✅ 캐시에 있으면 원문 반환, 없으면 엔진 호출 후 저장 (엔진 이름으로 span 기록, cache_hit 포함)
+# alias: 조회만 하는 다른 이미지의 content_hash (PreparedImage.cache_alias), 결과는 content_hash 로 저장
+def cached_call(content_hash, engine, fn, prompt_version="", model="", alias=None):
+    cache = get_cache()
+    with span(engine) as fields:
+        if cache is None:
+            return fn()
+        text = cache.lookup(content_hash, engine, prompt_version, model, alias)
+        fields["cache_hit"] = text is not None
+        if text is not None:
+            return text
+        text = fn()
+        cache.set(content_hash, engine, text, prompt_version, model)
+        return text
+
+
+# ✅ cached_call 의 asyncio 버전 (coro_fn: 인자 없는 coroutine 함수)
+# SQLite 조회 / 저장(WAL 커밋, 용량 정리)은 스레드에서 실행 → 이벤트 루프의 다른 요청을 멈추지 않음
+async def cached_call_async(content_hash, engine, coro_fn, prompt_version="", model="", alias=None):
+    cache = get_cache()
+    with span(engine) as fields:
+        if cache is None:
+            return await coro_fn()
+        text = await asyncio.to_thread(cache.lookup, content_hash, engine, prompt_version, model, alias)
+        fields["cache_hit"] = text is not None
+        if text is not None:
+            return text
+        text = await coro_fn()
+        await asyncio.to_thread(cache.set, content_hash, engine, text, prompt_version, model)
+        return text
@@ -1,60 +1,20 @@
 # ✅ Google Cloud Vision OCR + GPT-4o 분석 기반
 # 정확도 98~99%를 목표로 하는 하이브리드 방식
+# - Vision 원문만 GPT-4o 에 텍스트로 보냄 (이미지 토큰 없음 → GPT 이미지 경로보다 저렴)
+# - Vision 호출 / 브랜드 정규화 / 품번 검증 / 스코어링은 다른 파이프라인과 공용 (engines.py 의 "text" 파이프라인)
 
-import os
-import json
-import io
-import re
-from typing import List
-from PIL import Image
-from google.cloud import vision
-import openai
-
-# 환경변수 필요: GOOGLE_APPLICATION_CREDENTIALS, OPENAI_API_KEY
-openai.api_key = os.environ.get("OPENAI_API_KEY")
-
-# Google Cloud Vision OCR 클라이언트 초기화
-gcv_client = vision.ImageAnnotatorClient()
-
-def normalize_brand(name: str) -> str:
-    name = name.strip().upper()
-    if re.search(r"HKK|HKH|HKKH|HOKKH", name):
-        return "HOKKOH"
-    if "SOJITZ" in name:
-        return "Sojitz Fashion Co., Ltd."
-    if "ALLBLUE" in name:
-        return "ALLBLUE Inc."
-    if "MATSUBARA" in name:
-        return "Matsubara Co., Ltd."
-    if "KOMON" in name:
-        return "KOMON KOBO"
-    if "YAGI" in name:
-        return "YAGI"
-    return name.title()
-
-def is_valid_article(article: str) -> bool:
-    article = article.upper()
-    if any(keyword in article for keyword in ["TEL", "FAX", "HTTP", "WWW", "ARTICLE", "COLOR", "OCA"]):
-        return False
-    if re.fullmatch(r"\d{1,2}", article):
-        return False
-    return bool(re.search(r"\d{3,}", article)) or bool(re.match(r"[A-Z0-9\-/#]{4,}", article))
-
-def extract_text_with_gcv(image: Image.Image) -> str:
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")
-    content = buffered.getvalue()
-
-    image = vision.Image(content=content)
-    response = gcv_client.text_detection(image=image)
-    texts = response.text_annotations
-
-    if not texts:
-        return ""
-    return texts[0].description  # 전체 텍스트 블록 리턴
-
-def extract_info_with_gpt(raw_text: str) -> dict:
-    prompt = f"""
+from engine_clients import get_async_openai_client, get_openai_client
+from gpt_structured import ARTICLE_RESPONSE_FORMAT, read_json_stream, read_json_stream_async
+from ocr_cache import cached_call, cached_call_async, text_hash
+from request_scheduler import scheduled_call, scheduled_call_async
+
+# 환경변수 필요: GOOGLE_APPLICATION_CREDENTIALS, OPENAI_API_KEY (클라이언트는 engine_clients 에서 처음 호출할 때 생성)
+
+GPT_MODEL = "gpt-4o"
+GPT_MAX_TOKENS = 150  # JSON schema 응답 {"company", "article_numbers"} 분량
+PROMPT_VERSION = "v2"  # 프롬프트 / 응답 형식 변경 시 올려야 캐시가 무효화됨
+
+PROMPT_TEMPLATE = """
 Below is OCR text from a fabric swatch image:
 
 \"\"\"
@@ -66,50 +26,58 @@ From this text, extract:
 2. Valid article numbers (e.g. TXAB-H062, OSDC40031, 2916, BD3991)
 
 Ignore unrelated terms like TEL, FAX, HTTP, WWW, COLOR, OCA, Article, URL.
-
-Return in this JSON format:
-{{ "company": "BRAND", "article_numbers": ["CODE1", "CODE2"] }}
-If nothing is found, return:
-{{ "company": "N/A", "article_numbers": ["N/A"] }}
+If no brand is found, use "N/A" for company; if no article number is found, use an empty list.
 """
 
 
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "user", "content": prompt.strip()}
-        ],
-        max_tokens=800
-    )
+def gpt_text_prompt(raw_text: str) -> str:
+    return PROMPT_TEMPLATE.format(raw_text=raw_text).strip()
 
-    result_text = response.choices[0].message.content.strip()
 
-    try:
-        result = json.loads(result_text)
-    except json.JSONDecodeError:
-        company_match = re.search(r'"company"\s*:\s*"([^"]+)"', result_text)
-        article_matches = re.findall(r'"([A-Z0-9\-/#]{4,})"', result_text)
-        result = {
-            "company": company_match.group(1) if company_match else "N/A",
-            "article_numbers": list(set(article_matches)) if article_matches else ["N/A"]
-        }
+# 🔹 TPM 한도 계산용 요청 토큰 추정 (프롬프트 + 최대 출력)
+def gpt_text_request_tokens(raw_text: str) -> int:
+    return len(gpt_text_prompt(raw_text)) // 4 + GPT_MAX_TOKENS
 
-    company = normalize_brand(result.get("company", "N/A"))
-    article_numbers = [a for a in result.get("article_numbers", []) if is_valid_article(a)]
-
-    if not article_numbers:
-        article_numbers = ["N/A"]
 
+# 🔹 응답 형식은 JSON schema 로 고정, 스트리밍으로 받아 객체가 닫히면 바로 반환
+def _request_body(raw_text: str) -> dict:
     return {
-        "company": company,
-        "article_numbers": article_numbers
+        "model": GPT_MODEL,
+        "messages": [{"role": "user", "content": gpt_text_prompt(raw_text)}],
+        "max_tokens": GPT_MAX_TOKENS,
+        "response_format": ARTICLE_RESPONSE_FORMAT,
     }
 
-def extract_info_from_image(image: Image.Image) -> dict:
-    try:
-        raw_text = extract_text_with_gcv(image)
-        if not raw_text.strip():
-            return {"company": "N/A", "article_numbers": ["N/A"]}
-        return extract_info_with_gpt(raw_text)
-    except Exception as e:
-        return {"company": "[ERROR]", "article_numbers": [f"[ERROR] {str(e)}"]}
+
+# ✅ Vision 원문 → GPT 응답 원문 (같은 OCR 원문에 대한 GPT 응답은 캐시 재사용)
+def gpt_text_ocr(raw_text: str) -> str:
+    body = _request_body(raw_text)
+
+    def call_gpt():
+        return scheduled_call(
+            "openai",
+            lambda: read_json_stream(get_openai_client().chat.completions.create(**body, stream=True)),
+            tokens=gpt_text_request_tokens(raw_text),
+            attrs={"bytes": len(body["messages"][0]["content"].encode("utf-8"))},
+        )
+
+    return cached_call(text_hash(raw_text), "gcv_text_gpt", call_gpt, PROMPT_VERSION, GPT_MODEL)
+
+
+async def gpt_text_ocr_async(raw_text: str) -> str:
+    body = _request_body(raw_text)
+
+    async def call():
+        return await read_json_stream_async(await get_async_openai_client().chat.completions.create(**body, stream=True))
+
+    async def call_gpt():
+        return await scheduled_call_async("openai", call, tokens=gpt_text_request_tokens(raw_text),
+                                          attrs={"bytes": len(body["messages"][0]["content"].encode("utf-8"))})
+
+    return await cached_call_async(text_hash(raw_text), "gcv_text_gpt", call_gpt, PROMPT_VERSION, GPT_MODEL)
+
+
+# ✅ 기존 호출부 호환: Vision 원문 → GPT 텍스트 파이프라인 (engines.py)
+def extract_info_from_image(image) -> dict:
+    from engines import extract_info
+    return extract_info(image, "text")
@@ -2,56 +2,119 @@
 
 import re
 import json
+from collections import Counter
 from typing import Tuple, List
 
-# ✅ GPT 응답 파싱 (Fallback-safe JSON 파서)
+from article_rules import get_rules
+from brand_registry import get_registry
+
+# ✅ GPT 응답 파싱 (structured outputs: 응답은 ARTICLE_SCHEMA 형식의 JSON 객체)
+# JSON 이 아니면(max_tokens 잘림 등) GPT 결과는 버리고 다른 엔진 결과로만 스코어링 → used_fallback=True
 def parse_gpt_response(result_text: str) -> Tuple[str, List[str], bool]:
     try:
         result = json.loads(result_text)
-        company = result.get("company", "N/A").strip()
-        article_numbers = result.get("article_numbers", [])
-        return company, [a.strip().upper() for a in article_numbers], False
-    except json.JSONDecodeError:
-        # fallback 정규식 파서
-        company_match = re.search(r'"?company"?\s*:\s*"([^"]+)"', result_text)
-        raw_articles = re.findall(r'"([A-Z0-9/\-]{3,})"', result_text)
-        company = company_match.group(1).strip() if company_match else "N/A"
-        articles = list(set(raw_articles)) if raw_articles else ["N/A"]
-        return company, [a.strip().upper() for a in articles], True
-
-
-# ✅ 품번 유효성 검사
+    except (TypeError, ValueError):
+        return "N/A", [], True
+    if not isinstance(result, dict):
+        return "N/A", [], True
+    company = str(result.get("company") or "N/A").strip()
+    article_numbers = [str(a).strip().upper() for a in result.get("article_numbers") or []]
+    return company, [a for a in article_numbers if a and a != "N/A"], False
+
+
+# ✅ 품번 유효성 검사 (규칙: article_rules.json)
 def is_valid_article(article: str, company=None) -> bool:
     article = article.strip().upper()
-
-    if article in ["TEL", "FAX", "HTTP", "WWW", "ARTICLE", "COLOR", "COMPOSITION"]:
-        return False
-    if "OCA" in article and re.match(r"OCA\d{3,}", article):
-        return False
     if company and article == company.upper():
         return False
-    if re.fullmatch(r"\d{1,2}", article):
-        return False
-    if re.fullmatch(r"C\d{2,3}%?", article):
-        return False
-    if len(article) < 3:
-        return False
-    if not re.search(r"[A-Z0-9]", article):
-        return False
-    if article.startswith("HTTP") or ".COM" in article:
-        return False
-    if re.fullmatch(r"\d{3}", article):
-        return False
-
-    return bool(re.search(r"[A-Z0-9/\-]{3,}", article)) or bool(re.search(r"\d{3,}", article))
+    return get_rules().is_valid(article)
 
 # ✅ 오탐 가능성 높은 품번 감지
 def is_suspicious_article(article: str) -> bool:
-    a = article.upper()
-    if re.search(r"(.)\1{2,}", a):  # 같은 문자 반복 3번 이상 (예: YGUUU003)
-        return True
-    if re.fullmatch(r"\d{2,3}[A-Z]{2,}X+\d{3}", a):  # 비정상 문자 반복 + X 반복
-        return True
-    if len(a) > 20:
-        return True
-    return False
+    return get_rules().is_suspicious(article.upper())
+
+
+# ✅ 브랜드명 정규화 (공용 브랜드 사전: brands.json)
+def normalize_company_name(name: str) -> str:
+    canonical = get_registry().normalize(name)
+    if canonical:
+        return canonical
+    return name.strip().upper().title().replace("Co.,Ltd.", "Co., Ltd.")
+
+
+# ✅ OCR 원문 → 품번 후보 토큰 (브랜드와 무관한 규칙으로 잡음 토큰은 미리 제거)
+def extract_article_candidates(text: str) -> List[str]:
+    return get_rules().extract_candidates(text)
+
+
+SCORE_LETTERS_RE = re.compile(r"[A-Z]{2,}")
+
+def score_articles(gpt_articles, google_articles, tesseract_articles, crop_articles=None):
+    all_sources = {
+        "GPT": gpt_articles or [],
+        "Google": google_articles or [],
+        "Tesseract": tesseract_articles or [],
+        "Crop": crop_articles or []
+    }
+
+    article_counts = Counter()
+    article_sources = {}
+
+    for source, articles in all_sources.items():
+        for a in articles:
+            a_clean = a.strip().upper()
+            if not a_clean:
+                continue
+            article_counts[a_clean] += 1
+            article_sources.setdefault(a_clean, set()).add(source)
+
+    scored = []
+    for article, count in article_counts.items():
+        score = 0
+        sources = article_sources[article]
+
+        if "GPT" in sources:
+            score += 3
+        if "Google" in sources:
+            score += 3
+        if "Tesseract" in sources:
+            score += 2
+        if "Crop" in sources:
+            score += 2
+
+        if len(article) >= 6:
+            score += 1
+        if "-" in article or "/" in article:
+            score += 1
+        if SCORE_LETTERS_RE.search(article):
+            score += 1
+
+        scored.append((article, score))
+
+    # 점수순 정렬
+    scored.sort(key=lambda x: -x[1])
+    return scored
+
+
+# ✅ 최종 품번 필터 (유효성 + 의심 + 제외 규칙을 토큰당 정규식 1회로 판정)
+def filter_scored_articles(scored_articles, company_name, max_return=5):
+    normalized_company = company_name.strip().upper().replace(" ", "")
+    company_upper = company_name.upper()
+    is_candidate = get_rules().candidate_re_for(company_name).match
+    final = []
+
+    for article, score in scored_articles:
+        article_upper = article.strip().upper()
+
+        if article_upper == company_upper or article_upper == normalized_company:
+            continue
+        if normalized_company in article_upper.replace(" ", ""):
+            continue
+        if not is_candidate(article_upper):
+            continue
+
+        final.append(article_upper)
+        if len(final) >= max_return:
+            break
+
+    return final if final else ["N/A"]
@@ -0,0 +1,61 @@
+# precomputed.py
+# ✅ 빌드 시점에 미리 만든 브랜드 사전 / 품번 규칙 (Docker 이미지 빌드에서 `python precomputed.py` 실행)
+# - brands.json → BrandRegistry (Aho-Corasick 오토마톤, bigram 색인), article_rules.json → ArticleRuleSet
+#   을 pickle 로 저장 → 컨테이너 첫 요청에서 JSON 파싱 / 오토마톤 구성을 건너뜀
+# - 원본 JSON 과 만드는 모듈 소스의 sha256 을 함께 저장 → 둘 중 하나라도 바뀌면 무시하고 원본에서 다시 만듦
+#   (배포 후 JSON 만 수정하거나 코드가 바뀌어도 오래된 스냅샷을 쓰지 않음)
+# - 정규식은 pickle 에 패턴 문자열로 들어가므로 로드할 때 다시 컴파일됨 (re 내부 캐시 사용)
+import hashlib
+import os
+import pickle
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PRECOMPUTED_DIR = os.environ.get("PRECOMPUTED_DIR", os.path.join(ROOT, "precomputed"))
+
+
+def _fingerprint(*paths) -> str:
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def snapshot_path(name: str) -> str:
+    return os.path.join(PRECOMPUTED_DIR, f"{name}.pickle")
+
+
+# ✅ 스냅샷이 원본과 일치하면 객체, 없거나 오래됐으면 None
+def load_snapshot(name: str, *sources):
+    try:
+        with open(snapshot_path(name), "rb") as f:
+            fingerprint, obj = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    return obj if fingerprint == _fingerprint(*sources) else None
+
+
+def save_snapshot(name: str, obj, *sources):
+    os.makedirs(PRECOMPUTED_DIR, exist_ok=True)
+    tmp_path = snapshot_path(name) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump((_fingerprint(*sources), obj), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path(name))
+
+
+def main():
+    import article_rules
+    import brand_registry
+
+    targets = [
+        ("brands", brand_registry.load_registry(), brand_registry.BRANDS_PATH, brand_registry.__file__),
+        ("article_rules", article_rules.load_rules(), article_rules.RULES_PATH, article_rules.__file__),
+    ]
+    for name, obj, *sources in targets:
+        save_snapshot(name, obj, *sources)
+        print(f"{snapshot_path(name)} ({os.path.getsize(snapshot_path(name))} bytes)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
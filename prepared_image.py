@@ -0,0 +1,315 @@
+# prepared_image.py
+# ✅ 이미지 준비 단계 (스와치 1장당 한 번)
+# - 디코딩 1회 + resize_image 1회
+# - 엔진별로 필요한 해상도/포맷은 처음 요청될 때 한 번만 만들고 재사용 (ENGINE_IMAGE_POLICY)
+#     GPT: JPEG data URL / Vision: JPEG 바이트 / Tesseract: 흑백 이미지 / 화면: 썸네일
+# - 메모리: JPEG 는 디코딩 단계에서 SOURCE_MAX_SIZE 근처까지 축소 (draft)
+#           엔진 입력을 인코딩하면 encode_payloads() 로 픽셀 버퍼 해제 → API 응답 대기 중에는 인코딩 바이트만 유지
+#           동시에 디코딩 / 인코딩 중인 이미지의 버퍼 총량은 MemoryBudget 으로 제한 (업로드 수백 장 → 메모리 한도 초과 방지)
+import asyncio
+import base64
+import concurrent.futures
+import contextlib
+import contextvars
+import io
+import math
+import os
+import threading
+from functools import cached_property
+
+from PIL import Image
+
+from ocr_cache import image_hash
+from telemetry import span
+
+THUMBNAIL_SIZE = (300, 300)
+SOURCE_MAX_SIZE = (3200, 3200)  # 디코딩 직후 원본 상한 (엔진별 이미지는 여기서 파생)
+# 동시에 디코딩 / 인코딩 중인 이미지 버퍼 추정치 합계 상한 (estimate_image_bytes 기준)
+# 12MP 폰 사진 1장 ≈ 105MB (2장 동시), 2MP 사진 1장 ≈ 20MB (12장 동시) → Streamlit 포함 Cloud Run 512MiB 안쪽
+# API 응답을 기다리는 이미지는 encode_payloads() 뒤라 인코딩 바이트 + Tesseract 이미지(최대 약 6MB)만 차지
+# (benchmarks/bench_memory.py 로 측정)
+MAX_IN_FLIGHT_BYTES = 256 * 1024 * 1024
+
+# ✅ 엔진별 해상도/포맷 정책
+# - gpt: GPT-4o(high detail)는 긴 변 2048 → 짧은 변 768 로 줄인 뒤 512px 타일 단위로 과금
+#        → 그보다 큰 이미지는 업로드 크기만 늘고 토큰/정확도 이득 없음
+#        그 크기에서 min_tile_scale 배까지만 더 줄여 타일 수가 가장 적어지는 가장 큰 크기로 맞춤
+#        (예: 3:2 1152x768 6타일 → 1024x683 4타일, 16:9 1365x768 → 1024x576, 4:3 1024x768 은 그대로)
+# - vision: 작은 글씨 인식을 위해 더 높은 해상도 유지
+# - tesseract: 흑백 + 작은 이미지는 확대 (글자 높이가 너무 작으면 인식률 급감)
+ENGINE_IMAGE_POLICY = {
+    "gpt": {"max_side": 2048, "max_short_side": 768, "tile": 512, "min_tile_scale": 0.75, "format": "JPEG",
+            "quality": 85},
+    "vision": {"max_side": 2400, "format": "JPEG", "quality": 92},
+    "tesseract": {"max_side": 2400, "min_side": 2000, "max_upscale": 2.0, "mode": "L"},
+}
+
+
+# ✅ GPT-4o 이미지 입력 토큰 추정 (high detail 기준)
+def estimate_gpt_image_tokens(width: int, height: int) -> int:
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+# ✅ 이미지 리사이즈
+def resize_image(image, max_size=(1600, 1600)):
+    if image.width > max_size[0] or image.height > max_size[1]:
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return image
+
+
+# ✅ 정책에 맞는 배율 계산 (축소 우선, 확대는 max_upscale 까지)
+def _policy_scale(size, rule) -> float:
+    long_side, short_side = max(size), min(size)
+    scale = 1.0
+    if "min_side" in rule and long_side < rule["min_side"]:
+        scale = min(rule["min_side"] / long_side, rule.get("max_upscale", 1.0))
+    if "max_side" in rule:
+        scale = min(scale, rule["max_side"] / long_side)
+    if "max_short_side" in rule:
+        scale = min(scale, rule["max_short_side"] / short_side)
+    if "tile" in rule:
+        scale = _tile_scale(size, scale, rule["tile"], rule.get("min_tile_scale", 1.0))
+    return scale
+
+
+def _tile_count(size, scale: float, tile: int) -> int:
+    return math.ceil(max(1, round(size[0] * scale)) / tile) * math.ceil(max(1, round(size[1] * scale)) / tile)
+
+
+# 🔹 scale ~ scale * min_scale 중 타일 수가 가장 적은 가장 큰 배율 (타일 격자마다 그 격자에 꼭 맞는 배율을 후보로)
+def _tile_scale(size, scale: float, tile: int, min_scale: float) -> float:
+    best, best_tiles = scale, _tile_count(size, scale, tile)
+    for cols in range(1, math.ceil(size[0] * scale / tile) + 1):
+        for rows in range(1, math.ceil(size[1] * scale / tile) + 1):
+            candidate = min(scale, cols * tile / size[0], rows * tile / size[1])
+            if candidate < scale * min_scale:
+                continue
+            tiles = _tile_count(size, candidate, tile)
+            if tiles < best_tiles or (tiles == best_tiles and candidate > best):
+                best, best_tiles = candidate, tiles
+    return best
+
+
+# ✅ 디코딩 없이 열기: JPEG 는 DCT 단계에서 1/2·1/4·1/8 로 축소해 디코딩 (SOURCE_MAX_SIZE 보다 작아지지 않는 만큼만)
+# → 48MP 사진도 원본 해상도 RGB 버퍼(약 145MB)를 만들지 않음. 반환된 이미지의 size 는 디코딩될 크기
+def open_image(fp, max_size=SOURCE_MAX_SIZE) -> Image.Image:
+    image = Image.open(fp)
+    if image.format == "JPEG":
+        scale = min(1.0, max_size[0] / image.width, max_size[1] / image.height)
+        image.draft("RGB", (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+    return image
+
+
+def _scaled_pixels(size, scale: float) -> int:
+    return max(1, round(size[0] * scale)) * max(1, round(size[1] * scale))
+
+
+# ✅ 디코딩 크기(open_image 의 size) → 분석 중 이미지 1장이 차지하는 버퍼 추정 (바이트)
+# 디코딩 버퍼 + 원본 상한 축소본 + 기준 캔버스 + 엔진별 이미지 (PIL 은 RGB 를 픽셀당 4바이트로 저장)
+# 작은 이미지는 Tesseract 확대 / 캔버스 복사 때문에 픽셀당 비용이 더 큼 → 픽셀 수가 아니라 정책으로 계산
+def estimate_image_bytes(size, max_size=(1600, 1600), policy=None) -> int:
+    policy = {**ENGINE_IMAGE_POLICY, **(policy or {})}
+    total = size[0] * size[1] * 4
+    scale = min(1.0, SOURCE_MAX_SIZE[0] / size[0], SOURCE_MAX_SIZE[1] / size[1])
+    if scale < 1.0:
+        total += _scaled_pixels(size, scale) * 4
+    source = (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+    canvas_scale = min(1.0, max_size[0] / source[0], max_size[1] / source[1])
+    if canvas_scale < 1.0:
+        total += _scaled_pixels(source, canvas_scale) * 4
+    for rule in policy.values():
+        engine_scale = _policy_scale(source, rule)
+        if engine_scale != 1.0 or rule.get("mode"):
+            total += _scaled_pixels(source, engine_scale) * (1 if rule.get("mode") == "L" else 4)
+    return total
+
+
+# 디코딩 / 인코딩 전용 풀: CPU 작업이라 코어 수보다 많이 돌려도 처리량은 그대로이고 스레드별 할당 버퍼만 늘어남
+PREPARE_WORKERS = os.cpu_count() or 1
+_prepare_executor = concurrent.futures.ThreadPoolExecutor(max_workers=PREPARE_WORKERS, thread_name_prefix="image-prepare")
+
+
+# ✅ 이미지 준비 작업을 이벤트 루프 밖(전용 풀)에서 실행 (telemetry span 등 컨텍스트 변수 전달)
+async def run_prepare(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_prepare_executor, contextvars.copy_context().run, fn, *args)
+
+
+# ✅ 메모리 기준 역압 (asyncio): 한도가 차면 앞의 이미지가 인코딩을 마치고 픽셀을 해제할 때까지 디코딩 대기
+# 한도보다 큰 이미지 1장은 다른 이미지가 모두 끝난 뒤 혼자 처리
+class MemoryBudget:
+    def __init__(self, limit: int = MAX_IN_FLIGHT_BYTES):
+        self.limit = limit
+        self.used = 0
+        self._cond = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def hold(self, nbytes: int):
+        nbytes = min(nbytes, self.limit)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.used + nbytes <= self.limit)
+            self.used += nbytes
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.used -= nbytes
+                self._cond.notify_all()
+
+
+def _encode(image: Image.Image, fmt: str, **params) -> bytes:
+    buffered = io.BytesIO()
+    image.save(buffered, format=fmt, **params)
+    return buffered.getvalue()
+
+
+class PreparedImage:
+    def __init__(self, image: Image.Image, name=None, max_size=(1600, 1600), policy=None):
+        self.policy = {**ENGINE_IMAGE_POLICY, **(policy or {})}
+        with span("decode", cpu=True, pixels=image.width * image.height):
+            source = resize_image(image, SOURCE_MAX_SIZE)
+            if source.mode != "RGB":
+                source = source.convert("RGB")
+            source.load()  # 여러 엔진 스레드가 동시에 읽기 전에 디코딩 완료
+            self.source = source
+            # 기준 캔버스: 캐시 해시와 영역 좌표(브랜드별 레이아웃 템플릿 등)의 기준
+            if source.width > max_size[0] or source.height > max_size[1]:
+                self.image = resize_image(source.copy(), max_size)
+            else:
+                self.image = source
+        self._size = self.image.size
+        self._source_size = self.source.size
+        self.name = name
+        # image_dedup: 이전에 본 근접 중복 이미지의 content_hash (그 이미지의 OCR 캐시를 조회만 함)
+        # 캐시에 없는 엔진은 이 이미지로 실행하고 이 이미지의 content_hash 로 저장 (ocr_cache.OCRCache.lookup)
+        self.cache_alias = None
+        self._engine_images = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, fp, name=None, max_size=(1600, 1600), policy=None):
+        return cls(open_image(fp), name=name or getattr(fp, "name", None), max_size=max_size, policy=policy)
+
+    @property
+    def size(self):
+        return self._size
+
+    @cached_property
+    def content_hash(self) -> str:
+        return image_hash(self.image)
+
+    # ✅ 엔진 정책에 맞춘 이미지 (원본에서 한 번만 파생)
+    def engine_image(self, engine: str) -> Image.Image:
+        with self._lock:
+            return self._engine_image(engine)
+
+    def _engine_image(self, engine: str) -> Image.Image:
+        if engine not in self._engine_images:
+            if self.source is None:
+                raise RuntimeError(f"{self.name or 'image'}: pixel buffers already released")
+            rule = self.policy[engine]
+            with span(f"prepare.{engine}", cpu=True):
+                image = self.source
+                if rule.get("mode") and image.mode != rule["mode"]:
+                    image = image.convert(rule["mode"])
+                size = self.engine_size(engine)
+                if size != image.size:
+                    image = image.resize(size, Image.Resampling.LANCZOS)
+            self._engine_images[engine] = image
+        return self._engine_images[engine]
+
+    # ✅ 엔진 이미지 크기 (픽셀 버퍼 없이 계산 → 해제 후에도 좌표 변환 / 토큰 추정에 사용)
+    def engine_size(self, engine: str):
+        scale = _policy_scale(self._source_size, self.policy[engine])
+        if scale == 1.0:
+            return self._source_size
+        return (max(1, round(self._source_size[0] * scale)), max(1, round(self._source_size[1] * scale)))
+
+    # ✅ 엔진 정책 식별자 (정책이 바뀌면 OCR 캐시도 달라지도록 캐시 키에 포함)
+    def policy_key(self, engine: str) -> str:
+        return ",".join(f"{k}={v}" for k, v in sorted(self.policy[engine].items()))
+
+    # ✅ 기준 캔버스 좌표 → 엔진 이미지 좌표
+    def scale_region(self, region, engine: str):
+        if region is None:
+            return None
+        scale = self.engine_size(engine)[0] / self.size[0]
+        return tuple(round(v * scale) for v in region)
+
+    def _encode_for(self, engine: str) -> bytes:
+        rule = self.policy[engine]
+        params = {"quality": rule["quality"]} if "quality" in rule else {}
+        image = self.engine_image(engine)
+        with span(f"encode.{engine}", cpu=True) as fields:
+            data = _encode(image, rule.get("format", "PNG"), **params)
+            fields["bytes"] = len(data)
+        return data
+
+    # 🔹 GPT-4o 용 data URL
+    @cached_property
+    def gpt_image_bytes(self) -> bytes:
+        return self._encode_for("gpt")
+
+    @cached_property
+    def gpt_image_url(self) -> str:
+        mime = "image/" + self.policy["gpt"].get("format", "PNG").lower()
+        return f"data:{mime};base64," + base64.b64encode(self.gpt_image_bytes).decode("utf-8")
+
+    # 🔹 Google Vision 용 바이트
+    @cached_property
+    def vision_bytes(self) -> bytes:
+        return self._encode_for("vision")
+
+    # 🔹 Tesseract 용 흑백 이미지
+    @property
+    def tesseract_image(self) -> Image.Image:
+        return self.engine_image("tesseract")
+
+    # 🔹 결과 화면용 썸네일 (OCR 에는 사용하지 않음)
+    @cached_property
+    def thumbnail_bytes(self) -> bytes:
+        with span("encode.thumbnail", cpu=True):
+            thumb = self.image.copy()
+            thumb.thumbnail(THUMBNAIL_SIZE)
+            return _encode(thumb, "PNG")
+
+    # ✅ 엔진 입력을 미리 인코딩하고 픽셀 버퍼 해제 (API 응답을 기다리는 동안에는 인코딩 바이트만 유지)
+    # Tesseract 는 로컬에서 픽셀을 읽으므로 keep 엔진 이미지는 남겨 둠
+    # 캐시 히트 / cascade 로 쓰이지 않는 인코딩도 만들어지지만, 해제 뒤에는 다시 만들 수 없으므로 모두 준비
+    def encode_payloads(self, keep=("tesseract",)):
+        self.content_hash
+        self.gpt_image_url
+        self.vision_bytes
+        with self._lock:
+            kept = {engine: self._engine_image(engine) for engine in keep}
+            self.source = self.image = None
+            self._engine_images = kept
+            self.__dict__.pop("gpt_image_bytes", None)  # data URL 에 포함됨
+
+    # ✅ 엔진 호출이 끝난 뒤 픽셀 버퍼 / 인코딩 바이트 해제 (content_hash, size, name, cache_alias 는 유지)
+    # 엔진 스레드 / VisionBatcher 가 아직 참조하더라도 이 객체가 붙잡고 있지는 않음
+    def release(self):
+        self.content_hash  # 해제 후에도 캐시 키로 쓰이므로 먼저 계산
+        with self._lock:
+            self.source = self.image = None
+            self._engine_images.clear()
+            for name in ("gpt_image_bytes", "gpt_image_url", "vision_bytes", "thumbnail_bytes"):
+                self.__dict__.pop(name, None)
+
+    # ✅ 엔진별 전송 크기 / GPT 토큰 추정 (벤치마크용)
+    def payload_stats(self) -> dict:
+        return {
+            "gpt_bytes": len(self.gpt_image_bytes),
+            "gpt_tokens": estimate_gpt_image_tokens(*self.engine_size("gpt")),
+            "vision_bytes": len(self.vision_bytes),
+            "tesseract_pixels": self.tesseract_image.width * self.tesseract_image.height,
+        }
+
+
+# ✅ PIL 이미지 / PreparedImage 모두 받을 수 있게
+def as_prepared(image) -> PreparedImage:
+    return image if isinstance(image, PreparedImage) else PreparedImage(image)
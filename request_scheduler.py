@@ -0,0 +1,303 @@
+# request_scheduler.py
+# ✅ 엔진별 API 호출 스케줄러 (OpenAI / Google Vision 공용)
+# - token bucket: 분당 요청 수(rpm) + GPT-4o 분당 토큰 수(tpm) 한도 안에서만 호출
+# - 우선순위: Streamlit 화면 요청(interactive)이 배치 작업(batch)보다 먼저 나감
+# - 재시도: 429/5xx/연결 오류는 jitter 를 준 지수 백오프로 재시도, Retry-After 헤더 우선
+# - circuit breaker: 연속 실패가 쌓이면 잠시 호출을 막고 바로 실패 처리 (장애 시 대기열이 쌓이지 않게)
+# - 동시 실행 수 제한(engine_slot)도 여기서 적용
+import asyncio
+import contextvars
+import email.utils
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from engine_clients import async_engine_slot, engine_slot
+from telemetry import record, span
+
+# 엔진별 한도 (계정 tier 에 맞춰 환경변수로 조정)
+RATE_LIMITS = {
+    "openai": {"rpm": float(os.environ.get("OPENAI_RPM", 500)), "tpm": float(os.environ.get("OPENAI_TPM", 30000))},
+    "vision": {"rpm": float(os.environ.get("VISION_RPM", 1800))},
+}
+BURST_SECONDS = 10.0  # 버킷 용량 = 한도의 10초 분량
+
+RETRY_POLICY = {"max_retries": 5, "base_delay": 0.5, "max_delay": 30.0}
+BREAKER_POLICY = {"failure_threshold": 5, "reset_timeout": 30.0}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "ServiceUnavailable", "DeadlineExceeded",
+                    "TooManyRequests", "InternalServerError", "ResourceExhausted", "ConnectError",
+                    "ReadTimeout", "TimeoutError", "ConnectionError"}
+
+PRIORITIES = {"interactive": 0, "batch": 10}
+POLL_SECONDS = 0.05
+
+_priority = contextvars.ContextVar("request_priority", default=PRIORITIES["interactive"])
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+# ✅ 현재 컨텍스트(스레드 / asyncio task)의 요청 우선순위 지정 ("interactive" / "batch" 또는 숫자, 작을수록 먼저)
+def set_priority(priority):
+    return _priority.set(PRIORITIES.get(priority, priority))
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+@contextmanager
+def request_priority(priority):
+    token = set_priority(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate * BURST_SECONDS, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # amount 만큼 쓸 수 있을 때까지 남은 시간 (0 이면 바로 가능)
+    def delay(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        wait = max(self.paused_until - now, 0.0)
+        if self.tokens < amount:
+            wait = max(wait, (amount - self.tokens) / self.rate)
+        return wait
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    # 429 + Retry-After: 해당 시간까지 이 엔진의 모든 요청 보류
+    def pause_until(self, until: float):
+        self.paused_until = max(self.paused_until, until)
+
+
+# ✅ 예외 → (재시도 가능 여부, Retry-After 초)
+def classify_error(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None and isinstance(getattr(exc, "code", None), int):
+        status = exc.code  # google.api_core 예외
+    retryable = status in RETRYABLE_STATUS or type(exc).__name__ in RETRYABLE_ERRORS
+    return retryable, _retry_after(exc)
+
+
+def _retry_after(exc):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(parsed.timestamp() - time.time(), 0.0) if parsed else None
+
+
+class EngineScheduler:
+    def __init__(self, name: str, limits: dict = None, retry_policy=None, breaker_policy=None):
+        self.name = name
+        self.buckets = {unit: TokenBucket(per_minute) for unit, per_minute in (limits or {}).items()}
+        self.retry = {**RETRY_POLICY, **(retry_policy or {})}
+        self.breaker = {**BREAKER_POLICY, **(breaker_policy or {})}
+        self._cond = threading.Condition()
+        self._queue = []  # (priority, seq)
+        self._seq = itertools.count()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "rejected": 0}
+
+    # 🔹 circuit breaker: 열려 있으면 바로 실패, 대기 시간이 지나면 시험 호출 1건만 허용 (half-open)
+    def _check_breaker(self, now):
+        if self._opened_at is None:
+            return
+        if now - self._opened_at < self.breaker["reset_timeout"] or self._trial_in_flight:
+            self.stats["rejected"] += 1
+            record(self.name, error="CircuitOpenError")
+            raise CircuitOpenError(f"{self.name} circuit open after {self._failures} consecutive failures")
+        self._trial_in_flight = True
+
+    def _enqueue(self, priority):
+        with self._cond:
+            self._check_breaker(time.monotonic())
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            return ticket
+
+    def _leave(self, ticket):
+        with self._cond:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    # 대기열 맨 앞이고 버킷에 여유가 있으면 소비하고 0, 아니면 기다릴 시간
+    def _try_admit(self, ticket, cost) -> float:
+        if self._queue[0] != ticket:
+            return POLL_SECONDS
+        now = time.monotonic()
+        wait = max((self.buckets[unit].delay(amount, now) for unit, amount in cost.items() if unit in self.buckets),
+                   default=0.0)
+        if wait > 0:
+            return wait
+        for unit, amount in cost.items():
+            if unit in self.buckets:
+                self.buckets[unit].take(amount)
+        heapq.heappop(self._queue)
+        self._cond.notify_all()
+        return 0.0
+
+    def acquire(self, cost: dict, priority: int):
+        ticket = self._enqueue(priority)
+        try:
+            with self._cond:
+                while True:
+                    wait = self._try_admit(ticket, cost)
+                    if wait <= 0:
+                        return
+                    self._cond.wait(wait)
+        except BaseException:
+            self._leave(ticket)
+            raise
+
+    async def acquire_async(self, cost: dict, priority: int):
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_admit(ticket, cost)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._leave(ticket)
+            raise
+
+    def _record(self, exc=None):
+        with self._cond:
+            self._trial_in_flight = False
+            if exc is None:
+                self._failures = 0
+                self._opened_at = None
+                return None
+            retryable, retry_after = classify_error(exc)
+            self.stats["failures"] += 1
+            if retryable:
+                self._failures += 1
+                if self._failures >= self.breaker["failure_threshold"]:
+                    self._opened_at = time.monotonic()
+                if retry_after is not None and getattr(exc, "status_code", getattr(exc, "code", None)) == 429:
+                    for bucket in self.buckets.values():
+                        bucket.pause_until(time.monotonic() + retry_after)
+            return retryable, retry_after
+
+    def _backoff(self, attempt: int, retry_after) -> float:
+        # full jitter: 0 ~ min(max_delay, base * 2^attempt)
+        delay = random.uniform(0, min(self.retry["max_delay"], self.retry["base_delay"] * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    # 🔹 호출 1회 계측 (wait_ms = rate limit 대기열 + 동시 실행 슬롯 대기)
+    # attrs 의 op 가 있으면 단계 이름을 "<엔진>.<op>" 로 구분 (예: openai.batches.retrieve)
+    def _span(self, cost, attempt, queued_at, attrs):
+        fields = {"attempt": attempt, "wait_ms": round((time.perf_counter() - queued_at) * 1000, 3),
+                  "units": cost.get("rpm", 1), **(attrs or {})}
+        if cost.get("tpm"):
+            fields["tokens_est"] = cost["tpm"]
+        op = fields.pop("op", None)
+        return span(f"{self.name}.{op}" if op else self.name, **fields)
+
+    # ✅ fn: 인자 없는 함수 (실제 API 호출), cost: {"rpm": 요청 수, "tpm": 토큰 수}
+    # attrs: 계측 이벤트에 붙일 항목 (예: {"bytes": 요청 크기})
+    def call(self, fn, cost: dict = None, attrs: dict = None):
+        cost = cost or {"rpm": 1}
+        priority = _priority.get()
+        for attempt in range(self.retry["max_retries"] + 1):
+            queued_at = time.perf_counter()
+            self.acquire(cost, priority)
+            self.stats["calls"] += 1
+            try:
+                with engine_slot(self.name), self._span(cost, attempt, queued_at, attrs):
+                    result = fn()
+            except Exception as e:
+                retryable, retry_after = self._record(e)
+                if not retryable or attempt == self.retry["max_retries"]:
+                    raise
+                self.stats["retries"] += 1
+                time.sleep(self._backoff(attempt, retry_after))
+                continue
+            self._record()
+            return result
+
+    # ✅ call 의 asyncio 버전 (fn: 인자 없는 coroutine 함수)
+    async def call_async(self, fn, cost: dict = None, attrs: dict = None):
+        cost = cost or {"rpm": 1}
+        priority = _priority.get()
+        for attempt in range(self.retry["max_retries"] + 1):
+            queued_at = time.perf_counter()
+            await self.acquire_async(cost, priority)
+            self.stats["calls"] += 1
+            try:
+                async with async_engine_slot(self.name):
+                    with self._span(cost, attempt, queued_at, attrs):
+                        result = await fn()
+            except Exception as e:
+                retryable, retry_after = self._record(e)
+                if not retryable or attempt == self.retry["max_retries"]:
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+                continue
+            self._record()
+            return result
+
+
+_schedulers = {}
+_lock = threading.Lock()
+
+
+def get_scheduler(name: str) -> EngineScheduler:
+    with _lock:
+        if name not in _schedulers:
+            _schedulers[name] = EngineScheduler(name, RATE_LIMITS.get(name))
+        return _schedulers[name]
+
+
+# ✅ 테스트 / 설정 변경 시 스케줄러 초기화
+def reset_schedulers():
+    with _lock:
+        _schedulers.clear()
+
+
+def scheduled_call(engine: str, fn, tokens: int = 0, units: int = 1, attrs: dict = None):
+    cost = {"rpm": units, "tpm": tokens} if tokens else {"rpm": units}
+    return get_scheduler(engine).call(fn, cost, attrs)
+
+
+async def scheduled_call_async(engine: str, fn, tokens: int = 0, units: int = 1, attrs: dict = None):
+    cost = {"rpm": units, "tpm": tokens} if tokens else {"rpm": units}
+    return await get_scheduler(engine).call_async(fn, cost, attrs)
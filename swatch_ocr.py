@@ -0,0 +1,250 @@
+# swatch_ocr.py
+# ✅ Streamlit 없이 실행하는 배치 CLI (야간 벤더 스와치 스캔 처리용)
+#
+#   python -m swatch_ocr batch <이미지 폴더 | zip 파일> [-o 결과파일] [--format csv|jsonl] [--concurrency N]
+#                              [--cascade | --gpt-batch [--poll-interval 초] | --tile N [--tile-mode parts|grid]]
+#                              [--pipeline vision|text|cascade | --max-tokens N --max-latency-ms MS]
+#                              [--trace trace.jsonl] [--metrics metrics.prom]
+#
+# - 이미지 1장이 끝날 때마다 결과를 파일에 바로 기록 (CSV / JSONL)
+# - 중간에 죽어도 다시 실행하면 이미 기록된 파일은 건너뜀 (resume)
+# - 동시에 메모리에 올라가는 이미지는 최대 N장 (배치 크기와 무관하게 메모리 일정)
+# - --cascade: Tesseract → Google Vision → GPT-4o 순으로 필요한 엔진만 실행 (JSONL 에 tier 기록, --pipeline cascade 와 같음)
+# - --pipeline: engines.py 의 파이프라인 (vision: GPT 이미지 + Vision + Tesseract / text: Vision 원문 → GPT 텍스트)
+# - --max-tokens / --max-latency-ms: 이미지마다 목표(요청 토큰 / 지연)를 만족하는 파이프라인 선택 (JSONL 에 pipeline 기록)
+# - --gpt-batch: GPT-4o 요청을 OpenAI Batch API 로 먼저 일괄 처리한 뒤 (gpt_batch.py) 결과 기록
+# - --tile N: 스와치 N장을 GPT-4o 요청 1건으로 묶음 (gpt_tiling.py, 작은 라벨 사진용)
+# - --trace / --metrics: 단계별 소요 시간 / 전송 바이트 / 토큰 / 캐시 적중 / 오류 기록 (telemetry.py)
+import argparse
+import asyncio
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import zipfile
+
+from dotenv import load_dotenv
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+CSV_COLUMNS = ["파일명", "브랜드명", "품번"]
+
+
+# ✅ 입력 소스: (파일 키, 바이트를 읽는 함수) 를 하나씩 생성 (전체 목록을 메모리에 올리지 않음)
+def iter_sources(path):
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                name = info.filename
+                if info.is_dir() or name.startswith("__MACOSX/") or not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                yield name, (lambda n=name: zf.read(n))
+        return
+
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for filename in sorted(files):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            full_path = os.path.join(root, filename)
+            key = os.path.relpath(full_path, path)
+
+            def read(p=full_path):
+                with open(p, "rb") as f:
+                    return f.read()
+
+            yield key, read
+
+
+# ✅ 이미 기록된 파일 목록 (resume 용, [ERROR] 로 끝난 파일은 다시 처리)
+def load_done(output_path, fmt):
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8-sig", newline="") as f:
+        if fmt == "jsonl":
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # 마지막 줄이 쓰다 만 상태일 수 있음
+                if row.get("file") and row.get("company") != "[ERROR]":
+                    done.add(row["file"])
+        else:
+            for row in csv.DictReader(f):
+                if row.get("파일명") and row.get("브랜드명") != "[ERROR]":
+                    done.add(row["파일명"])
+    return done
+
+
+class ResultWriter:
+    def __init__(self, output_path, fmt):
+        self.fmt = fmt
+        is_new = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        encoding = "utf-8-sig" if fmt == "csv" and is_new else "utf-8"
+        if not is_new:
+            with open(output_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                partial_line = f.read(1) != b"\n"
+        self._file = open(output_path, "a", encoding=encoding, newline="")
+        if not is_new and partial_line:
+            self._file.write("\n")  # 비정상 종료로 쓰다 만 마지막 줄 정리
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.writer(self._file)
+            if is_new:
+                self._csv.writerow(CSV_COLUMNS)
+
+    def write(self, key, result):
+        if self.fmt == "jsonl":
+            self._file.write(json.dumps({"file": key, **result}, ensure_ascii=False) + "\n")
+        else:
+            self._csv.writerow([key, result.get("company", "N/A"), ", ".join(result.get("article_numbers", []))])
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _error_result(e):
+    return {"company": "[ERROR]", "article_numbers": [f"[ERROR] {str(e)}"], "used_fallback": True}
+
+
+# tile > 1: 이미지 tile 장의 GPT 요청을 1건으로 묶음 (gpt_tiling.py, tile_mode: parts / grid)
+# pipeline: engines.PIPELINES 이름 (None 이면 targets 로 이미지마다 선택, cascade_policy 가 있으면 cascade)
+async def run_batch(source_path, output_path, fmt="csv", concurrency=16, cascade_policy=None,
+                    tile=1, tile_mode="parts", pipeline=None, targets=None):
+    from engines import DEFAULT_PIPELINE, extract_info_async
+    from gpt_tiling import gpt_tiled_texts_async
+    from prepared_image import PreparedImage, run_prepare
+    from request_scheduler import set_priority
+
+    # 🔹 배치 요청은 Streamlit 화면 요청보다 뒤로 (rate limit 대기열 우선순위)
+    set_priority("batch")
+
+    done = load_done(output_path, fmt)
+    writer = ResultWriter(output_path, fmt)
+    sources = (s for s in iter_sources(source_path) if s[0] not in done)
+    counts = {"processed": 0, "skipped": len(done)}
+    if cascade_policy is not None:
+        pipeline = "cascade"
+    elif pipeline is None and not targets:
+        pipeline = DEFAULT_PIPELINE
+
+    # 🔹 파일 읽기 → 디코딩 → 엔진별 인코딩 → 원본 픽셀 해제 (CPU 작업, run_prepare 전용 풀에서 실행)
+    # grid 묶음은 격자 합성에 GPT 엔진 이미지가 필요하므로 함께 남겨 둠
+    keep = ("tesseract", "gpt") if tile > 1 and tile_mode == "grid" else ("tesseract",)
+
+    def prepare_source(key, read):
+        image = PreparedImage.open(io.BytesIO(read()), name=key)
+        image.encode_payloads(keep)
+        return image
+
+    async def run_group(group):
+        images, results = {}, {}
+        for key, read in group:
+            try:
+                images[key] = await run_prepare(prepare_source, key, read)
+            except Exception as e:
+                results[key] = _error_result(e)
+        # 🔹 묶음 응답을 못 쓴 이미지(None)는 extract_info 안에서 단일 GPT 호출
+        gpt_texts = [None] * len(images)
+        if tile > 1 and len(images) > 1:
+            gpt_texts = await gpt_tiled_texts_async(list(images.values()), tile_mode)
+        outputs = await asyncio.gather(*(
+            extract_info_async(image, pipeline, targets, cascade_policy=cascade_policy, gpt_text=gpt_text)
+            for image, gpt_text in zip(images.values(), gpt_texts)))
+        results.update(zip(images, outputs))
+        return results
+
+    async def worker():
+        # 🔹 공유 generator 에서 tile 장씩 꺼내 처리 → 동시에 최대 concurrency × tile 장만 메모리에 존재
+        while True:
+            group = list(itertools.islice(sources, tile))
+            if not group:
+                return
+            try:
+                results = await run_group(group)
+            except Exception as e:
+                results = {key: _error_result(e) for key, _ in group}
+            for key, _ in group:
+                writer.write(key, results[key])
+                counts["processed"] += 1
+                if counts["processed"] % 50 == 0:
+                    print(f"processed {counts['processed']} (skipped {counts['skipped']})", file=sys.stderr)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        writer.close()
+    return counts
+
+
+# ✅ 아직 기록되지 않은 파일의 GPT 결과를 Batch API 로 받아 OCR 캐시에 저장 (run_batch 전에 실행)
+def prefill_gpt_batch(source_path, output_path, fmt="csv", poll_interval=None):
+    from gpt_batch import POLL_INTERVAL, run_gpt_batch
+    from request_scheduler import set_priority
+
+    set_priority("batch")
+    done = load_done(output_path, fmt)
+    sources = (s for s in iter_sources(source_path) if s[0] not in done)
+    return run_gpt_batch(sources, output_path + ".gpt_batch.json", poll_interval=poll_interval or POLL_INTERVAL)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="swatch_ocr", description="Object Swatch OCR batch runner")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    batch = sub.add_parser("batch", help="이미지 폴더 또는 zip 일괄 처리")
+    batch.add_argument("source", help="이미지 폴더 또는 zip 파일")
+    batch.add_argument("-o", "--output", default=None, help="결과 파일 (기본: swatch_ocr_results.csv/.jsonl)")
+    batch.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    batch.add_argument("--concurrency", type=int, default=16, help="동시에 처리할 이미지 수")
+    mode = batch.add_mutually_exclusive_group()
+    mode.add_argument("--cascade", action="store_true", help="저렴한 엔진부터 실행하고 확실하면 GPT 생략")
+    mode.add_argument("--gpt-batch", action="store_true", help="GPT-4o 요청을 OpenAI Batch API 로 일괄 처리 (최대 24시간)")
+    mode.add_argument("--tile", type=int, default=1, help="GPT-4o 요청 1건에 묶을 스와치 수 (작은 라벨 사진용)")
+    batch.add_argument("--poll-interval", type=float, default=None, help="--gpt-batch 상태 확인 간격 (초)")
+    batch.add_argument("--tile-mode", choices=["parts", "grid"], default="parts",
+                       help="parts: 이미지 여러 장 첨부 / grid: 번호 붙인 격자 1장으로 합성")
+    batch.add_argument("--pipeline", choices=["vision", "text", "cascade"], default=None,
+                       help="엔진 파이프라인 (기본: vision, engines.py)")
+    batch.add_argument("--max-tokens", type=int, default=None, help="이미지당 GPT 요청 토큰 목표 (파이프라인 자동 선택)")
+    batch.add_argument("--max-latency-ms", type=float, default=None, help="이미지당 지연 목표 (파이프라인 자동 선택)")
+    batch.add_argument("--trace", default=None, help="단계별 계측 이벤트를 기록할 JSONL 파일")
+    batch.add_argument("--metrics", default=None, help="끝난 뒤 단계별 집계를 Prometheus text 형식으로 저장할 파일")
+
+    args = parser.parse_args(argv)
+    load_dotenv()
+
+    if args.command == "batch":
+        targets = {k: v for k, v in (("max_tokens", args.max_tokens), ("max_latency_ms", args.max_latency_ms))
+                   if v is not None}
+        pipeline = "cascade" if args.cascade else args.pipeline
+        if args.cascade and args.pipeline not in (None, "cascade"):
+            parser.error("--cascade conflicts with --pipeline")
+        if targets and pipeline:
+            parser.error("--max-tokens / --max-latency-ms choose the pipeline per image; drop --pipeline / --cascade")
+        if (args.gpt_batch or args.tile > 1) and (targets or pipeline not in (None, "vision")):
+            parser.error("--gpt-batch / --tile only apply to the vision pipeline")
+
+        from telemetry import JSONLSink, add_sink, get_metrics
+
+        if args.trace:
+            add_sink(JSONLSink(args.trace))
+        output = args.output or f"swatch_ocr_results.{args.format}"
+        cascade_policy = {} if args.cascade else None
+        if args.gpt_batch:
+            gpt_counts = prefill_gpt_batch(args.source, output, args.format, args.poll_interval)
+            print(f"✅ gpt batch: {gpt_counts['stored']} results cached, {gpt_counts['failed']} failed",
+                  file=sys.stderr)
+        counts = asyncio.run(run_batch(args.source, output, args.format, args.concurrency, cascade_policy,
+                                       max(args.tile, 1), args.tile_mode, pipeline, targets))
+        print(f"✅ done: {counts['processed']} processed, {counts['skipped']} already in {output}", file=sys.stderr)
+        if args.metrics:
+            get_metrics().write_prometheus(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
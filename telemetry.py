@@ -0,0 +1,303 @@
+# telemetry.py
+# ✅ OCR 파이프라인 계측 (단계별 소요 시간 / 전송 바이트 / GPT 토큰 / 캐시 적중 / 엔진별 오류)
+# - span(stage, **fields): with 블록 소요 시간을 재서 이벤트 1건으로 기록 (예외는 error 로 기록 후 그대로 발생)
+# - 이벤트는 sink 로 전달: JSONL trace 파일 / 메모리 집계(MetricsSink → Prometheus text, Streamlit 요약표)
+# - 이미지 이름 같은 공통 속성과 실행 단위 sink(collect) 는 contextvars 로 전달
+#   → engine_fanout 의 엔진 스레드 / asyncio task 에도 그대로 따라감
+# - OCR_TRACE_PATH 를 지정하면 모든 이벤트를 JSONL 로 기록
+# - 계측 실패(sink 오류)는 OCR 결과에 영향을 주지 않음
+#
+# 주요 단계 이름
+#   extract                       이미지 1장 전체 (pipeline: engines.py 파이프라인, tier: cascade 종료 단계)
+#   gpt_vision_ocr / google_vision_layout / tesseract / gpt_vision_ocr_tiled / gcv_text_gpt
+#                                 엔진별 원문 (OCR 캐시 포함, cache_hit)
+#   openai / vision               실제 API 호출 1회 (wait_ms: rate limit + 동시 실행 대기, attempt, bytes, tokens_est)
+#   openai.stream                 스트리밍 응답 (completion_tokens_est, closed_early)
+#   openai.batch                  Batch API 결과 (prompt_tokens / completion_tokens: response.usage)
+#   tesseract_ocr                 Tesseract 프로세스 풀 (pixels)
+#   prepare.<engine> / encode.<engine> / decode   이미지 준비
+#   postprocess                   파싱 + 통합 스코어링
+#   fanout.<engine>               타임아웃 / 실패로 결과에서 빠진 엔진
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_PATH = os.environ.get("OCR_TRACE_PATH", "")
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+RESERVOIR_SIZE = 2000  # 단계별 p50 / p95 계산용 최근 표본 수
+METRIC_PREFIX = "swatch_ocr"
+SUM_FIELDS = ("bytes", "prompt_tokens", "completion_tokens", "completion_tokens_est", "tokens_est", "cpu_ms")
+
+_attrs = contextvars.ContextVar("telemetry_attrs", default={})
+_scoped_sinks = contextvars.ContextVar("telemetry_sinks", default=())
+_current_span = contextvars.ContextVar("telemetry_span", default=None)
+
+
+class TelemetrySink(ABC):
+    @abstractmethod
+    def emit(self, event: dict):
+        ...
+
+
+# ✅ 이벤트 1건 = JSON 1줄 (trace 파일, 나중에 pandas / jq 로 분석)
+class JSONLSink(TelemetrySink):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def emit(self, event):
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ✅ 단계별 집계 (건수 / 소요 시간 분포 / 오류 / 캐시 적중 / 바이트 / 토큰)
+class MetricsSink(TelemetrySink):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def _stage(self, stage):
+        if stage not in self._stages:
+            self._stages[stage] = {
+                "count": 0, "timed": 0, "sum_ms": 0.0, "max_ms": 0.0,
+                "buckets": [0] * len(LATENCY_BUCKETS_MS), "recent": deque(maxlen=RESERVOIR_SIZE),
+                "errors": {}, "cache_hits": 0, "cache_lookups": 0, "sums": dict.fromkeys(SUM_FIELDS, 0),
+            }
+        return self._stages[stage]
+
+    def emit(self, event):
+        with self._lock:
+            s = self._stage(event["stage"])
+            s["count"] += 1
+            ms = event.get("ms")
+            if ms is not None:
+                s["timed"] += 1
+                s["sum_ms"] += ms
+                s["max_ms"] = max(s["max_ms"], ms)
+                s["recent"].append(ms)
+                for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                    if ms <= bound:
+                        s["buckets"][i] += 1
+            if event.get("error"):
+                s["errors"][event["error"]] = s["errors"].get(event["error"], 0) + 1
+            if "cache_hit" in event:
+                s["cache_lookups"] += 1
+                s["cache_hits"] += bool(event["cache_hit"])
+            for field in SUM_FIELDS:
+                if event.get(field):
+                    s["sums"][field] += event[field]
+
+    # 🔹 Streamlit / 로그용 요약 (단계 이름순)
+    def summary(self) -> list:
+        rows = []
+        with self._lock:
+            for stage, s in sorted(self._stages.items()):
+                rows.append({
+                    "stage": stage,
+                    "count": s["count"],
+                    "mean_ms": round(s["sum_ms"] / s["timed"], 1) if s["timed"] else None,
+                    "p50_ms": round(_percentile(s["recent"], 0.50), 1) if s["timed"] else None,
+                    "p95_ms": round(_percentile(s["recent"], 0.95), 1) if s["timed"] else None,
+                    "max_ms": round(s["max_ms"], 1) if s["timed"] else None,
+                    "errors": sum(s["errors"].values()),
+                    "cache_hit_rate": round(s["cache_hits"] / s["cache_lookups"], 3) if s["cache_lookups"] else None,
+                    "cpu_ms": round(s["sums"]["cpu_ms"], 1),
+                    "kb": round(s["sums"]["bytes"] / 1024, 1),
+                    "tokens": s["sums"]["prompt_tokens"] + s["sums"]["completion_tokens"]
+                              or s["sums"]["tokens_est"] + s["sums"]["completion_tokens_est"],
+                })
+        return rows
+
+    # ✅ Prometheus text exposition 형식 (node_exporter textfile collector 등에 그대로 사용)
+    def prometheus_text(self) -> str:
+        p = METRIC_PREFIX
+        lines = [f"# TYPE {p}_stage_seconds histogram"]
+        counters = {"errors": [], "cache_hits": [], "cache_lookups": [], "payload_bytes": [], "tokens": [],
+                    "cpu_seconds": []}
+        with self._lock:
+            for stage, s in sorted(self._stages.items()):
+                label = f'stage="{_label(stage)}"'
+                if s["timed"]:
+                    for bound, n in zip(LATENCY_BUCKETS_MS, s["buckets"]):
+                        lines.append(f'{p}_stage_seconds_bucket{{{label},le="{bound / 1000:g}"}} {n}')
+                    lines.append(f'{p}_stage_seconds_bucket{{{label},le="+Inf"}} {s["timed"]}')
+                    lines.append(f"{p}_stage_seconds_sum{{{label}}} {s['sum_ms'] / 1000:.6f}")
+                    lines.append(f"{p}_stage_seconds_count{{{label}}} {s['timed']}")
+                for error, n in sorted(s["errors"].items()):
+                    counters["errors"].append(f'{{{label},error="{_label(error)}"}} {n}')
+                if s["cache_lookups"]:
+                    counters["cache_hits"].append(f"{{{label}}} {s['cache_hits']}")
+                    counters["cache_lookups"].append(f"{{{label}}} {s['cache_lookups']}")
+                if s["sums"]["bytes"]:
+                    counters["payload_bytes"].append(f"{{{label}}} {s['sums']['bytes']}")
+                if s["sums"]["cpu_ms"]:
+                    counters["cpu_seconds"].append(f"{{{label}}} {s['sums']['cpu_ms'] / 1000:.6f}")
+                for field in ("prompt_tokens", "completion_tokens", "completion_tokens_est", "tokens_est"):
+                    if s["sums"][field]:
+                        counters["tokens"].append(f'{{{label},kind="{field}"}} {s["sums"][field]}')
+        for name, samples in counters.items():
+            if samples:
+                lines.append(f"# TYPE {p}_{name}_total counter")
+                lines.extend(f"{p}_{name}_total{sample}" for sample in samples)
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+_metrics = MetricsSink()
+_sinks = None
+_sinks_lock = threading.Lock()
+
+
+# ✅ 프로세스 공용 집계 (모든 이벤트)
+def get_metrics() -> MetricsSink:
+    return _metrics
+
+
+def _global_sinks():
+    global _sinks
+    if _sinks is None:
+        with _sinks_lock:
+            if _sinks is None:
+                _sinks = [_metrics] + ([JSONLSink(TRACE_PATH)] if TRACE_PATH else [])
+    return _sinks
+
+
+def add_sink(sink: TelemetrySink) -> TelemetrySink:
+    sinks = _global_sinks()
+    with _sinks_lock:
+        sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink: TelemetrySink):
+    sinks = _global_sinks()
+    with _sinks_lock:
+        if sink in sinks:
+            sinks.remove(sink)
+
+
+# ✅ 이벤트 1건 기록 (현재 컨텍스트의 공통 속성 포함)
+def record(stage: str, **fields):
+    event = {"ts": round(time.time(), 3), "stage": stage, **_attrs.get(), **fields}
+    for sink in (*_global_sinks(), *_scoped_sinks.get()):
+        try:
+            sink.emit(event)
+        except Exception:
+            pass
+
+
+def _error_fields(exc) -> dict:
+    return {"error": type(exc).__name__, "error_message": str(exc)[:200]}
+
+
+# cpu=True: 블록 동안 현재 스레드의 CPU 시간도 기록 (await 가 없는 CPU 작업에만 사용)
+@contextmanager
+def span(stage: str, cpu: bool = False, **fields):
+    token = _current_span.set(fields)
+    start = time.perf_counter()
+    cpu_start = time.thread_time() if cpu else None
+    try:
+        yield fields
+    except BaseException as e:
+        fields.update(_error_fields(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        if cpu:
+            fields["cpu_ms"] = round((time.thread_time() - cpu_start) * 1000, 3)
+        record(stage, ms=round((time.perf_counter() - start) * 1000, 3), **fields)
+
+
+# ✅ 예외를 결과로 바꿔 삼키는 곳([ERROR] 결과)에서 현재 span 에 오류 기록
+def mark_error(exc):
+    fields = _current_span.get()
+    if fields is not None:
+        fields.update(_error_fields(exc))
+
+
+# ✅ 블록 안의 모든 이벤트에 공통 속성 추가 (예: image=파일명)
+@contextmanager
+def trace_scope(**attrs):
+    token = _attrs.set({**_attrs.get(), **attrs})
+    try:
+        yield
+    finally:
+        _attrs.reset(token)
+
+
+# ✅ 블록 안에서 발생한 이벤트만 따로 집계 (Streamlit 실행 1회 요약 등)
+@contextmanager
+def collect(sink: TelemetrySink = None):
+    sink = sink or MetricsSink()
+    token = _scoped_sinks.set((*_scoped_sinks.get(), sink))
+    try:
+        yield sink
+    finally:
+        _scoped_sinks.reset(token)
+
+
+def _image_label(image):
+    return getattr(image, "name", None) or getattr(image, "filename", None) or None
+
+
+def _traced_fields(fields, result):
+    if isinstance(result, dict):
+        for key in ("pipeline", "tier"):
+            if result.get(key):
+                fields[key] = result[key]
+
+
+# ✅ 이미지 1장 처리 함수 전체를 span 으로 (첫 인자 이미지의 이름을 이벤트에 붙임, sync / async 공용)
+def traced(stage: str):
+    def wrap(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(image, *args, **kwargs):
+                with trace_scope(image=_image_label(image)), span(stage) as fields:
+                    result = await fn(image, *args, **kwargs)
+                    _traced_fields(fields, result)
+                    return result
+            return run_async
+
+        @functools.wraps(fn)
+        def run(image, *args, **kwargs):
+            with trace_scope(image=_image_label(image)), span(stage) as fields:
+                result = fn(image, *args, **kwargs)
+                _traced_fields(fields, result)
+                return result
+        return run
+    return wrap
+
+
+# ✅ 요청 본문 JSON 크기 (전송 바이트 기록용)
+def request_bytes(body) -> int:
+    return len(json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
@@ -0,0 +1,131 @@
+# tesseract_pool.py
+# ✅ Tesseract 전용 프로세스 풀
+# - CPU 코어 수만큼 오래 살아있는 워커 프로세스를 두고, 워커마다 eng 언어 모델을 한 번만 로드
+#   (tesserocr 가 설치되어 있으면 PyTessBaseAPI 재사용, 없으면 pytesseract 로 대체)
+# - 이미지는 임시 PNG 파일 대신 공유 메모리의 raw 픽셀 버퍼로 전달
+# - 한 번의 호출로 여러 영역을 OCR
+# - 워커 안에서 NumPy 전처리(이진화 / 기울기 보정 / 글자 줄 검출) 후 글자가 있는 줄만 OCR (tesseract_preprocess.py)
+import asyncio
+import concurrent.futures
+import os
+import threading
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+from tesseract_preprocess import preprocess_image
+
+POOL_SIZE = int(os.environ.get("TESSERACT_MAX_CONCURRENCY", os.cpu_count() or 2))
+TESSERACT_LANG = "eng"
+PREPROCESS = os.environ.get("TESSERACT_PREPROCESS", "1") != "0"
+
+# 워커 프로세스 전역 (워커마다 1개)
+_api = None
+
+
+# 🔹 tesserocr 는 워커 프로세스에서만 로드 (앱 프로세스 import 시간 / 메모리 절약)
+def _init_worker():
+    global _api
+    try:
+        import tesserocr
+    except ImportError:  # pragma: no cover - 컨테이너에 libtesseract-dev 가 없을 때
+        return
+    _api = tesserocr.PyTessBaseAPI(lang=TESSERACT_LANG)
+
+
+# 영역 목록 [(left, top, right, bottom) | None] → 영역별 텍스트
+def _ocr_rects(image, rects):
+    texts = []
+    if _api is not None:
+        _api.SetImage(image)
+        for rect in rects:
+            left, top, right, bottom = rect or (0, 0, image.width, image.height)
+            _api.SetRectangle(left, top, right - left, bottom - top)
+            texts.append(_api.GetUTF8Text())
+    else:
+        import pytesseract
+        for rect in rects:
+            target = image if rect is None else image.crop(rect)
+            texts.append(pytesseract.image_to_string(target, lang=TESSERACT_LANG))
+    return texts
+
+
+def _ocr_shared_image(shm_name, mode, size, regions, preprocess=PREPROCESS):
+    # 공유 메모리 해제(unlink)는 부모 프로세스 담당
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        nbytes = size[0] * size[1] * len(mode)
+        with shm.buf[:nbytes] as view:
+            image = Image.frombytes(mode, size, view)
+        if not preprocess:
+            return _ocr_rects(image, regions)
+
+        # 🔹 이진화 페이지 + 글자 줄 (지정 영역이 있으면 좌표 유지를 위해 기울기 보정 생략)
+        page, strips = preprocess_image(image, deskew=all(r is None for r in regions))
+        if not strips:
+            return _ocr_rects(image, regions)  # 글자 줄을 못 찾으면 원본 그대로
+        texts = []
+        for region in regions:
+            if region is None:
+                # 전체 이미지 대신 글자가 있는 줄만 OCR
+                rects = [(0, top, page.width, bottom) for top, bottom in strips]
+                texts.append("\n".join(t.rstrip() for t in _ocr_rects(page, rects)))
+            else:
+                texts.extend(_ocr_rects(page, [region]))
+        return texts
+    except Exception as e:
+        # pytesseract 예외 중 일부는 pickle 이 안 되어 풀 전체가 깨지므로 일반 예외로 변환
+        raise RuntimeError(f"Tesseract OCR failed: {e}") from None
+    finally:
+        shm.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ProcessPoolExecutor(max_workers=POOL_SIZE, initializer=_init_worker)
+    return _pool
+
+
+# ✅ 영역 좌표를 이미지 범위 안으로 보정 (crop 과 동일한 (left, top, right, bottom) 형식)
+def _clip_region(region, size):
+    if region is None:
+        return None
+    left, top, right, bottom = region
+    right, bottom = min(right, size[0]), min(bottom, size[1])
+    if right <= left or bottom <= top:
+        return (0, 0, 1, 1)
+    return (max(left, 0), max(top, 0), right, bottom)
+
+
+# ✅ 이미지 1장 + 여러 영역 → Future[list[str]] (regions 의 None 은 전체 이미지)
+def submit_regions(image: Image.Image, regions=(None,)) -> concurrent.futures.Future:
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    data = image.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    shm.buf[:len(data)] = data
+    del data
+
+    regions = [_clip_region(r, image.size) for r in regions]
+    future = _get_pool().submit(_ocr_shared_image, shm.name, image.mode, image.size, regions)
+
+    def _release(_):
+        shm.close()
+        shm.unlink()
+
+    future.add_done_callback(_release)
+    return future
+
+
+def ocr_regions(image: Image.Image, regions=(None,)) -> list:
+    return submit_regions(image, regions).result()
+
+
+async def ocr_regions_async(image: Image.Image, regions=(None,)) -> list:
+    return await asyncio.wrap_future(submit_regions(image, regions))
@@ -0,0 +1,130 @@
+# tesseract_preprocess.py
+# ✅ Tesseract 입력 전처리 (NumPy 벡터 연산, 픽셀 단위 Python 루프 없음)
+# - 흑백 변환 → 적응형 이진화(integral image 기반 지역 평균/표준편차) → 기울기 보정 → 텍스트 줄 영역 검출
+# - 원단 위 저대비 라벨에서 Tesseract 인식률을 높이고, 글자가 있는 줄(strip)만 OCR 해서 CPU 시간 절약
+# - 같은 크기 이미지는 (N, H, W) 배열로 묶어 한 번에 처리 (preprocess_batch)
+import numpy as np
+from PIL import Image
+
+MIN_BLOCK = 15            # 적응형 이진화 지역 창 최소 크기 (px, 홀수)
+SAUVOLA_K = 0.25          # 클수록 글자 판정이 엄격 (지역 대비가 낮은 곳은 배경으로)
+SAUVOLA_R = 128           # 표준편차 정규화 기준 (uint8 동적 범위의 절반)
+DARK_PAGE_MEAN = 100      # 평균 밝기가 이보다 낮으면 어두운 바탕 라벨로 보고 반전
+MAX_SKEW_DEGREES = 5.0
+SKEW_STEP_DEGREES = 0.25
+MAX_SKEW_POINTS = 50000   # 기울기 추정에 쓰는 글자 픽셀 표본 수
+ROW_INK_RATIO = 0.005     # 글자 줄로 볼 최소 잉크 비율 (행 기준)
+MIN_STRIP_HEIGHT = 8
+STRIP_PADDING = 4
+
+
+# ✅ (N, H, W, 3) 또는 (N, H, W) uint8 → (N, H, W) uint8 흑백
+def to_grayscale(batch: np.ndarray) -> np.ndarray:
+    if batch.ndim == 3:
+        return batch
+    weights = np.array([299, 587, 114], dtype=np.uint32)
+    return ((batch.astype(np.uint32) * weights).sum(axis=-1) // 1000).astype(np.uint8)
+
+
+def _block_size(shape) -> int:
+    block = max(MIN_BLOCK, min(shape) // 50)
+    return block | 1
+
+
+def _window_sums(values: np.ndarray, block: int) -> np.ndarray:
+    r = block // 2
+    padded = np.pad(values, ((0, 0), (r + 1, r), (r + 1, r)), mode="edge")
+    integral = padded.cumsum(axis=1).cumsum(axis=2)
+    return (integral[:, block:, block:] - integral[:, :-block, block:]
+            - integral[:, block:, :-block] + integral[:, :-block, :-block])
+
+
+# ✅ 지역 평균/표준편차 기반 적응형 이진화 (Sauvola) → (N, H, W) bool (True = 글자)
+# - 배경 밝기가 위치마다 달라도(원단 무늬, 조명) 글자만 분리
+# - 지역 표준편차가 작은 곳(무늬 잡음)은 임계값이 평균보다 크게 낮아져 글자로 잡히지 않음
+# - integral image 로 창 합계를 구하므로 창 크기와 무관하게 픽셀당 O(1)
+def adaptive_threshold(gray: np.ndarray, block: int = None, k: float = SAUVOLA_K) -> np.ndarray:
+    block = block or _block_size(gray.shape[1:])
+    values = gray.astype(np.int64)
+    # 🔹 어두운 바탕에 밝은 글자인 경우 반전 (Tesseract 는 흰 바탕 검은 글자 기준)
+    dark_page = values.mean(axis=(1, 2)) < DARK_PAGE_MEAN
+    values[dark_page] = 255 - values[dark_page]
+
+    area = block * block
+    mean = _window_sums(values, block) / area
+    var = np.maximum(_window_sums(values * values, block) / area - mean * mean, 0)
+    threshold = mean * (1 + k * (np.sqrt(var) / SAUVOLA_R - 1))
+    return values < threshold
+
+
+# ✅ 투영 프로파일 기울기 추정: 글자 픽셀을 각도별로 기울여 행 히스토그램이 가장 뾰족한 각도 선택
+def estimate_skew(ink: np.ndarray) -> float:
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > MAX_SKEW_POINTS:
+        pick = np.random.default_rng(0).choice(len(ys), MAX_SKEW_POINTS, replace=False)
+        ys, xs = ys[pick], xs[pick]
+
+    angles = np.arange(-MAX_SKEW_DEGREES, MAX_SKEW_DEGREES + SKEW_STEP_DEGREES / 2, SKEW_STEP_DEGREES)
+    slopes = np.tan(np.deg2rad(angles))
+    rows = np.rint(ys[None, :] - xs[None, :] * slopes[:, None]).astype(np.int64)
+    rows -= rows.min()
+    span = rows.max() + 1
+    # 각도별 bincount 를 한 번에: 각도마다 행 번호를 span 만큼 밀어서 1차원으로 합침
+    hist = np.bincount((rows + np.arange(len(angles))[:, None] * span).ravel(),
+                       minlength=len(angles) * span).reshape(len(angles), span)
+    sharpness = (hist.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[int(np.argmax(sharpness))])
+
+
+# ✅ 행 투영 프로파일 → 글자가 있는 가로 띠 [(top, bottom), ...]
+def text_strips(ink: np.ndarray, gap: int = None) -> list:
+    height, width = ink.shape
+    gap = gap or _block_size(ink.shape) // 2
+    has_ink = ink.sum(axis=1) > max(1, width * ROW_INK_RATIO)
+    if not has_ink.any():
+        return []
+    # 연속 구간 시작/끝 (diff 로 경계 검출)
+    edges = np.diff(np.concatenate(([0], has_ink.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    strips = []
+    for top, bottom in zip(starts, ends):
+        if strips and top - strips[-1][1] <= gap:
+            strips[-1][1] = bottom
+        else:
+            strips.append([top, bottom])
+    return [(max(0, int(t) - STRIP_PADDING), min(height, int(b) + STRIP_PADDING))
+            for t, b in strips if b - t >= MIN_STRIP_HEIGHT]
+
+
+def _deskew(ink: np.ndarray) -> np.ndarray:
+    angle = estimate_skew(ink)
+    if abs(angle) < SKEW_STEP_DEGREES:
+        return ink
+    page = Image.fromarray(ink.astype(np.uint8) * 255, "L")
+    rotated = page.rotate(angle, resample=Image.Resampling.NEAREST, fillcolor=0)
+    return np.asarray(rotated) > 127
+
+
+# ✅ 같은 크기 이미지 배열 묶음 → [(이진화 PIL 이미지, 글자 띠 목록), ...]
+# deskew=False 면 좌표가 바뀌지 않으므로 호출자가 지정한 영역을 그대로 쓸 수 있음
+def preprocess_batch(arrays, deskew: bool = True) -> list:
+    results = [None] * len(arrays)
+    by_shape = {}
+    for i, array in enumerate(arrays):
+        by_shape.setdefault(array.shape, []).append(i)
+
+    for indices in by_shape.values():
+        ink_batch = adaptive_threshold(to_grayscale(np.stack([arrays[i] for i in indices])))
+        for i, ink in zip(indices, ink_batch):
+            if deskew:
+                ink = _deskew(ink)
+            page = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8), "L")
+            results[i] = (page, text_strips(ink))
+    return results
+
+
+def preprocess_image(image: Image.Image, deskew: bool = True):
+    return preprocess_batch([np.asarray(image)], deskew)[0]
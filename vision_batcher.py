@@ -0,0 +1,119 @@
+# vision_batcher.py
+# ✅ Google Vision 요청 배칭
+# 여러 워커 스레드의 text_detection 요청을 모아 batch_annotate_images 한 번으로 전송
+# - 최대 16장(Vision API 한도) 또는 linger 시간이 지나면 flush
+# - 호출자마다 자신의 Future 를 받음 (결과: AnnotateImageResponse)
+import concurrent.futures
+import threading
+import time
+
+from engine_clients import ENGINE_CONCURRENCY, get_vision_client
+from request_scheduler import current_priority, request_priority, scheduled_call
+
+MAX_BATCH_SIZE = 16
+MAX_BATCH_BYTES = 8 * 1024 * 1024  # 요청 크기 한도(10MB) 이하로 유지
+LINGER_MS = 50
+
+
+class VisionBatcher:
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, linger_ms=LINGER_MS, max_batch_bytes=MAX_BATCH_BYTES):
+        self.max_batch_size = max_batch_size
+        self.linger = linger_ms / 1000.0
+        self.max_batch_bytes = max_batch_bytes
+        self._pending = []  # (enqueued_at, content, future, priority)
+        self._pending_bytes = 0
+        self._cond = threading.Condition()
+        self._sender = concurrent.futures.ThreadPoolExecutor(
+            max_workers=ENGINE_CONCURRENCY["vision"], thread_name_prefix="vision-batch"
+        )
+        threading.Thread(target=self._run, name="vision-batcher", daemon=True).start()
+
+    def submit(self, content: bytes) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        with self._cond:
+            self._pending.append((time.monotonic(), content, future, current_priority()))
+            self._pending_bytes += len(content)
+            self._cond.notify()
+        return future
+
+    def _full(self):
+        return len(self._pending) >= self.max_batch_size or self._pending_bytes >= self.max_batch_bytes
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # 🔹 가장 오래된 요청 기준으로 linger 시간까지 더 모음
+                deadline = self._pending[0][0] + self.linger
+                while not self._full():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take_batch()
+            self._sender.submit(self._send, batch)
+
+    def _take_batch(self):
+        batch, size = [], 0
+        while self._pending and len(batch) < self.max_batch_size:
+            content = self._pending[0][1]
+            if batch and size + len(content) > self.max_batch_bytes:
+                break
+            batch.append(self._pending.pop(0))
+            size += len(content)
+        self._pending_bytes -= size
+        return batch
+
+    def _send(self, batch):
+        from google.cloud import vision  # 첫 요청 때 로드 (import 시간 단축)
+
+        requests = [
+            vision.AnnotateImageRequest(
+                image=vision.Image(content=content),
+                features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)],
+            )
+            for _, content, _, _ in batch
+        ]
+        try:
+            # 🔹 rate limit / 재시도 / circuit breaker (배치 안에서 가장 급한 요청의 우선순위 적용)
+            with request_priority(min(item[3] for item in batch)):
+                response = scheduled_call(
+                    "vision",
+                    lambda: get_vision_client().batch_annotate_images(requests=requests, retry=None),
+                    units=len(requests),
+                    attrs={"bytes": sum(len(item[1]) for item in batch)},
+                )
+        except Exception as e:
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, _, future, _), result in zip(batch, response.responses):
+            if result.error.message:
+                future.set_exception(RuntimeError(f"Vision error: {result.error.message}"))
+            else:
+                future.set_result(result)
+        # 🔹 응답 수가 요청보다 적으면 남은 호출자가 .result() 에서 영원히 기다리지 않도록 오류로 끝냄
+        for _, _, future, _ in batch[len(response.responses):]:
+            future.set_exception(RuntimeError(
+                f"Vision batch returned {len(response.responses)} responses for {len(batch)} images"))
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_vision_batcher() -> VisionBatcher:
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = VisionBatcher()
+    return _batcher
+
+
+# ✅ 이미지 바이트 → 전체 텍스트 (배칭 경유)
+def batched_text_detection(content: bytes) -> str:
+    response = get_vision_batcher().submit(content).result()
+    texts = response.text_annotations
+    return texts[0].description if texts else ""